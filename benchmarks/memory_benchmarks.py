@@ -0,0 +1,133 @@
+"""
+Memoria por caja de los modelos en memoria
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.memory_benchmarks                 # 400 libros de 25 cajas
+    python -m benchmarks.memory_benchmarks --libros 2000
+
+Compara los bytes por caja de los modelos actuales (slots, textos internados
+en CajaProcessorService, ceros y huella del archivo compartidos) con el
+formato anterior: dataclasses con __dict__ por instancia y un objeto propio
+por caja para cada texto, cero y huella. La memoria se mide con
+tracemalloc sobre la lista de cajas retenida (incluye los textos y números de
+cada caja, no los temporales del parseo). El resultado se escribe en
+benchmarks/results/memoria_<fecha>.json.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+from datetime import datetime
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.services.caja_processor_service import CajaProcessorService
+from src.excel_bigquery.core.utils.id_utils import fingerprint
+from src.infrastructure.excel.read_only_engine import leer_hoja
+from benchmarks.parser_benchmarks import N_CAJAS, RESULTS_DIR, _crear_libro
+
+# Campos que antes quedaban como un objeto propio por caja
+_COPIAS_POR_CAJA = ("nombre_caja", "codigo_container", "codigo_trazabilidad", "nombre_hacienda",
+                    "temperatura", "peso_bruto_kg")
+CAJAS_PROYECCION = 3_000_000
+
+
+def _post_init_anterior(self):
+    # Cada caja calculaba (y guardaba) su propia huella de id_archivo
+    self.fp_caja = fingerprint(self.id_caja)
+    self.fp_archivo = fingerprint(self.id_archivo)
+
+
+def _caja_sin_slots():
+    """CajaModel con __dict__ por instancia (formato anterior)"""
+    campos = [(f.name, f.type, field(init=f.init)) for f in fields(CajaModel)]
+    return make_dataclass("CajaModelSinSlots", campos, namespace={"__post_init__": _post_init_anterior})
+
+
+def _copia(valor):
+    # Un objeto nuevo con el mismo valor, como el que dejaba el parseo sin interning ni ceros compartidos
+    if isinstance(valor, str):
+        return (valor + " ")[:-1]
+    return valor + 0.0
+
+
+def _medir(construir) -> tuple:
+    tracemalloc.start()
+    try:
+        inicio = tracemalloc.get_traced_memory()[0]
+        objetos = construir()
+        return objetos, tracemalloc.get_traced_memory()[0] - inicio
+    finally:
+        tracemalloc.stop()
+
+
+def _archivo(i: int) -> ArchivoModel:
+    return ArchivoModel(id_archivo=f"KOBE_2025_WK26 F{i}.xlsx_N{i}", archivo=f"WK26 F{i}.xlsx", warehouse="KOBE",
+                        puerto="KOBE", buque="BUQUE", annio=2025, semana=26, spec=30, tipo="CGC")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bytes por caja de los modelos en memoria")
+    parser.add_argument("--libros", type=int, default=400, help=f"Libros procesados ({N_CAJAS} cajas cada uno)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "日通 WK26 MEM.xlsx")
+        _crear_libro(ruta)
+        hoja = leer_hoja(ruta)
+
+    processor = CajaProcessorService()
+    archivos = [_archivo(i) for i in range(args.libros)]
+    # Calentamiento: la tabla de calendario de trazabilidad y los textos internados se crean una sola vez
+    processor.process_cajas_from_sheet(hoja, _archivo(-1))
+
+    def _actual():
+        cajas = []
+        for archivo in archivos:
+            cajas.extend(processor.process_cajas_from_sheet(hoja, archivo))
+        return cajas
+
+    cajas, bytes_actual = _medir(_actual)
+    del cajas
+
+    CajaSinSlots = _caja_sin_slots()
+    campos = [f.name for f in fields(CajaModel) if f.init]
+
+    def _anterior():
+        # Se parsea igual y cada caja se pasa al formato anterior dentro de la medición
+        anteriores = []
+        for archivo in archivos:
+            for caja in processor.process_cajas_from_sheet(hoja, archivo):
+                anteriores.append(CajaSinSlots(**{
+                    campo: _copia(getattr(caja, campo)) if campo in _COPIAS_POR_CAJA else getattr(caja, campo)
+                    for campo in campos
+                }))
+        return anteriores
+
+    cajas, bytes_anterior = _medir(_anterior)
+
+    resultados = {}
+    for nombre, total in (("anterior", bytes_anterior), ("actual", bytes_actual)):
+        por_caja = total / len(cajas)
+        resultados[nombre] = {
+            "bytes_por_caja": round(por_caja, 1),
+            f"mb_{CAJAS_PROYECCION}_cajas": round(por_caja * CAJAS_PROYECCION / 1024 ** 2),
+        }
+        print(f"{nombre:10s} {por_caja:8.1f} bytes/caja  "
+              f"~{por_caja * CAJAS_PROYECCION / 1024 ** 3:.2f} GB para {CAJAS_PROYECCION:,} cajas")
+    print(f"Reducción: {1 - bytes_actual / bytes_anterior:.0%} ({len(cajas)} cajas medidas)")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    archivo_resultados = os.path.join(RESULTS_DIR, "memoria_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    with open(archivo_resultados, "w", encoding="utf-8") as f:
+        json.dump({"fecha": datetime.now().isoformat(timespec="seconds"), "cajas": len(cajas),
+                   "resultados": resultados}, f, indent=2)
+    print(f"Resultados en {archivo_resultados}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
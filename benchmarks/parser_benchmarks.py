@@ -0,0 +1,259 @@
+"""
+Micro-benchmarks de los caminos calientes del parser
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.parser_benchmarks                      # mide y compara con la baseline
+    python -m benchmarks.parser_benchmarks --guardar-baseline   # mide y guarda la baseline de esta máquina
+    python -m benchmarks.parser_benchmarks --umbral 0.1 --solo peso
+
+Cada ejecución escribe benchmarks/results/<fecha>.json. Cada benchmark se
+compara con benchmarks/baselines.json (versionada) como múltiplo de una carga
+de referencia de Python puro medida intercalada con él, así la comparación no
+depende de la velocidad de la máquina. Un benchmark cuya
+relación con la referencia supera la de la baseline x (1 + umbral) es una
+regresión y el proceso termina con código 1. Tras una optimización (o un
+cambio de intérprete) se actualiza con --guardar-baseline y se versiona.
+
+En CI se ejecutan con pytest (tests/test_benchmarks.py), que falla si hay
+regresiones contra la baseline o si el decodificador en lote de trazabilidad
+deja de ser más rápido que el escalar:
+    python -m pytest tests/test_benchmarks.py
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from openpyxl import Workbook, load_workbook
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+from src.excel_bigquery.core.utils.date_utils import decode_trazabilidad_batch, extract_week_and_year_from_trazabilidad
+from src.infrastructure.bigquery.bigquery_client import BigQueryClient
+from src.infrastructure.bigquery.caja_bigquery_client import CajaBigQueryClient
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(DIRECTORIO, "baselines.json")
+RESULTS_DIR = os.path.join(DIRECTORIO, "results")
+UMBRAL_DEFAULT = 0.20
+
+N_CAJAS = 25
+N_ARCHIVOS = 200
+# Códigos de trazabilidad de un lote grande (el decodificador en lote recorre la columna completa)
+N_CODIGOS = 5000
+
+
+def _crear_libro(ruta: str):
+    """Libro estándar: cabecera completa y N_CAJAS cajas con todos los pesos"""
+    wb = Workbook()
+    ws = wb.active
+    ws["B1"], ws["G1"], ws["Q1"], ws["T1"], ws["A2"] = "BUQUE", "kobe", "N1", 26, "Year 2025"
+    for i in range(N_CAJAS):
+        columna = 2 + 2 * i
+        ws.cell(row=2, column=columna, value=f"Caja {i + 1}")
+        ws.cell(row=3, column=columna, value=f"CONT{i % 3}")
+        ws.cell(row=4, column=columna, value=100 + i % 4)
+        ws.cell(row=5, column=columna, value=f"020214{i % 28 + 1:02d}0625")
+        ws.cell(row=6, column=columna, value=f"hacienda {i % 4}")
+        for fila in range(8, 8 + settings.spec_value):
+            ws.cell(row=fila, column=columna, value=500 + (fila * 7 + i * 13) % 300 + 0.25)
+    wb.save(ruta)
+
+
+def _cliente_sin_conexion(clase):
+    # Los métodos medidos no usan la conexión: se evita crear bigquery.Client (credenciales)
+    cliente = clase.__new__(clase)
+    cliente.dataset_id = settings.dataset_id
+    cliente.table_id = "T1_ARCHIVOS" if clase is BigQueryClient else "T2_CAJAS"
+    return cliente
+
+
+def construir_benchmarks(directorio: str) -> Dict[str, Callable[[], object]]:
+    """
+    Prepara los datos y retorna {nombre: función sin argumentos a medir}
+
+    Args:
+        directorio: Carpeta temporal para el libro de prueba
+    """
+    ruta = os.path.join(directorio, "日通 WK26 BENCH.xlsx")
+    _crear_libro(ruta)
+
+    processor = ExcelProcessorService()
+    caja_processor = processor.caja_processor
+    sheet_obj = load_workbook(ruta).active
+    archivo_model, cajas = processor.process_workbook("WK26 BENCH.xlsx", ruta, "KOBE")[0]
+
+    archivos = [
+        ArchivoModel(id_archivo=f"KOBE_2025_WK26 F{i}.xlsx_N{i}", archivo=f"WK26 F{i}.xlsx", warehouse="KOBE",
+                     puerto="KOBE", buque="BUQUE", annio=2025, semana=26, spec=settings.spec_value, tipo="CGC")
+        for i in range(N_ARCHIVOS)
+    ]
+    codigos = [cajas[i % len(cajas)].codigo_trazabilidad for i in range(N_CODIGOS)]
+    archivo_client = _cliente_sin_conexion(BigQueryClient)
+    caja_client = _cliente_sin_conexion(CajaBigQueryClient)
+
+    def _trazabilidad_escalar():
+        for codigo in codigos:
+            extract_week_and_year_from_trazabilidad(codigo)
+
+    return {
+        # Por caja
+        "peso_columna": lambda: caja_processor._extract_peso_data_from_column(sheet_obj, 2, archivo_model),
+        "caja_columna": lambda: caja_processor._extract_caja_data_from_column(sheet_obj, 2, archivo_model),
+        # Por lote: el camino que usa el parser y la referencia escalar
+        f"trazabilidad_lote_x{N_CODIGOS}": lambda: decode_trazabilidad_batch(codigos),
+        f"trazabilidad_escalar_x{N_CODIGOS}": _trazabilidad_escalar,
+        # Por libro
+        "archivo_libro": lambda: processor.process_workbook("WK26 BENCH.xlsx", ruta, "KOBE", include_cajas=False),
+        # Por lote
+        f"dataframe_archivos_x{N_ARCHIVOS}": lambda: archivo_client._models_to_dataframe(archivos),
+        f"dataframe_cajas_x{len(cajas)}": lambda: caja_client._models_to_dataframe(cajas),
+        f"query_duplicados_x{N_ARCHIVOS}": lambda: archivo_client._build_existing_query(archivos),
+    }
+
+
+def _referencia():
+    """Carga fija de Python puro (strings, dicts, enteros) que normaliza los tiempos entre máquinas"""
+    conteo = {}
+    for i in range(2000):
+        clave = f"{i % 97:02d}{i % 12:02d}25"
+        conteo[clave] = conteo.get(clave, 0) + int(clave[-2:]) * i
+    return sorted(conteo.values())
+
+
+def medir(funcion: Callable[[], object], repeticiones: int,
+          referencia: Optional[Callable[[], object]] = None) -> dict:
+    """
+    Mide una función con timeit
+
+    Se usa el mínimo de las repeticiones (el menos afectado por el resto del
+    sistema) como valor a comparar con la baseline. Con referencia, cada
+    repetición mide también la carga de referencia justo antes, así la
+    relación ("relativo") compara tiempos tomados en las mismas condiciones.
+
+    Returns:
+        Diccionario con segundos por llamada (min, mediana), llamadas por repetición y relativo
+    """
+    timer = timeit.Timer(funcion)
+    numero, _ = timer.autorange()
+    timer_referencia = timeit.Timer(referencia) if referencia else None
+    numero_referencia = timer_referencia.autorange()[0] if timer_referencia else 0
+
+    tiempos, tiempos_referencia = [], []
+    for _ in range(repeticiones):
+        if timer_referencia:
+            tiempos_referencia.append(timer_referencia.timeit(numero_referencia) / numero_referencia)
+        tiempos.append(timer.timeit(numero) / numero)
+
+    tiempos.sort()
+    resultado = {"min": tiempos[0], "mediana": tiempos[len(tiempos) // 2], "llamadas": numero}
+    if tiempos_referencia:
+        resultado["relativo"] = tiempos[0] / min(tiempos_referencia)
+    return resultado
+
+
+def comparar(resultados: Dict[str, dict], baseline: Dict[str, dict], umbral: float) -> List[str]:
+    """
+    Agrega a cada resultado la relación con la baseline y retorna las regresiones
+
+    Se comparan los tiempos relativos a la referencia; una baseline antigua sin
+    "relativo" se compara en segundos. Un umbral por benchmark en la baseline
+    ("umbral": 0.3) tiene prioridad sobre el global.
+    """
+    regresiones = []
+    for nombre, resultado in resultados.items():
+        referencia = baseline.get(nombre)
+        if not referencia:
+            resultado["estado"] = "sin baseline"
+            continue
+
+        limite = referencia.get("umbral", umbral)
+        if "relativo" in referencia and "relativo" in resultado:
+            relacion = resultado["relativo"] / referencia["relativo"]
+        else:
+            relacion = resultado["min"] / referencia["min"]
+        resultado["relacion"] = round(relacion, 3)
+        resultado["estado"] = "regresión" if relacion > 1 + limite else "ok"
+        if resultado["estado"] == "regresión":
+            regresiones.append(f"{nombre}: {relacion:.2f}x la baseline (límite {1 + limite:.2f}x)")
+    return regresiones
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del parser con umbrales de regresión")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_DEFAULT,
+                        help="Regresión tolerada sobre la baseline (0.2 = 20%% más lento)")
+    parser.add_argument("--repeticiones", type=int, default=7, help="Repeticiones de timeit por benchmark")
+    parser.add_argument("--solo", default=None, help="Ejecutar solo los benchmarks que contienen este texto")
+    parser.add_argument("--guardar-baseline", action="store_true",
+                        help="Guardar los resultados como baseline de esta máquina")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        benchmarks = construir_benchmarks(directorio)
+        if args.solo:
+            benchmarks = {nombre: f for nombre, f in benchmarks.items() if args.solo in nombre}
+
+        resultados = {}
+        for nombre, funcion in benchmarks.items():
+            resultados[nombre] = medir(funcion, args.repeticiones, _referencia)
+        for nombre, resultado in resultados.items():
+            print(f"{nombre:32s} {resultado['min'] * 1e6:12.1f} µs {resultado['relativo']:10.4f}x ref")
+
+        baseline = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, encoding="utf-8") as f:
+                baseline = json.load(f)
+        regresiones = comparar(resultados, baseline, args.umbral)
+
+        if regresiones and not args.guardar_baseline:
+            # Una interrupción del sistema puede afectar una medición: la regresión se confirma midiendo otra vez
+            for nombre in [n for n, r in resultados.items() if r["estado"] == "regresión"]:
+                repeticion = medir(benchmarks[nombre], args.repeticiones, _referencia)
+                print(f"{nombre:32s} {repeticion['min'] * 1e6:12.1f} µs {repeticion['relativo']:10.4f}x ref "
+                      f"(repetición)")
+                if repeticion["relativo"] < resultados[nombre]["relativo"]:
+                    resultados[nombre] = repeticion
+            regresiones = comparar(resultados, baseline, args.umbral)
+
+    ejecucion = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "umbral": args.umbral,
+        "resultados": resultados,
+        "regresiones": regresiones,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    archivo_resultados = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    with open(archivo_resultados, "w", encoding="utf-8") as f:
+        json.dump(ejecucion, f, indent=2, ensure_ascii=False)
+    print(f"Resultados en {archivo_resultados}")
+
+    if args.guardar_baseline:
+        # Se conservan los umbrales por benchmark ya configurados
+        nueva = {nombre: {"min": r["min"], "relativo": float(f"{r['relativo']:.4g}"),
+                          **({"umbral": baseline[nombre]["umbral"]} if "umbral" in baseline.get(nombre, {}) else {})}
+                 for nombre, r in resultados.items()}
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **nueva}, f, indent=2)
+        print(f"Baseline guardada en {BASELINE_FILE}")
+        return 0
+
+    if not baseline:
+        print("No hay baseline: ejecute con --guardar-baseline para crearla")
+        return 0
+
+    for regresion in regresiones:
+        print(f"❌ {regresion}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
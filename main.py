@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 from typing import Dict, Optional
@@ -202,7 +203,9 @@ class MenuPrincipal:
             exitos = 0
             for warehouse in warehouses_procesados:
                 print(f"\n⏳ Procesando {warehouse['nombre']}...")
-                exito = self.upload_service.process_and_upload_excel_files(warehouse['path'], include_cajas=True)
+                # Con LOAD_CONSOLIDATE=true todos los warehouses se cargan juntos al final
+                exito = self.upload_service.process_and_upload_excel_files(warehouse['path'], include_cajas=True,
+                                                                          diferir_carga=True)
 
                 if exito:
                     print(f"   ✅ {warehouse['nombre']} completado")
@@ -210,6 +213,12 @@ class MenuPrincipal:
                 else:
                     print(f"   ❌ Error en {warehouse['nombre']}")
 
+            if self.upload_service.consolidated_load is not None:
+                print(f"\n⏳ Cargando los warehouses a BigQuery en una sola carga...")
+                if not self.upload_service.flush_loads():
+                    print(f"   ❌ Error en la carga consolidada (queda en {settings.load_staging_path} para reintentarla)")
+                    exitos = 0
+
             print(f"\n🎉 Proceso completado: {exitos}/{len(warehouses_procesados)} warehouses exitosos")
         else:
             print("❌ Operación cancelada")
@@ -279,8 +288,237 @@ class MenuPrincipal:
             print("Por favor verifica tu configuración en el archivo .env")
 
 
+def _crear_parser() -> argparse.ArgumentParser:
+    """Crea el parser de línea de comandos (sin comando se abre el menú interactivo)"""
+    parser = argparse.ArgumentParser(description="Sistema de carga de archivos banana a BigQuery")
+    parser.add_argument("--perfil", action="store_true",
+                        help="Perfilar con cProfile y tracemalloc por etapa (resultados en PROFILE_DIR)")
+    subparsers = parser.add_subparsers(dest="comando")
+
+    servidor = subparsers.add_parser("servidor", help="Servicio HTTP de ingesta con cargas en micro-lotes")
+    servidor.add_argument("--host", default=None, help="Interfaz donde escuchar (por defecto HTTP_HOST)")
+    servidor.add_argument("--port", type=int, default=None, help="Puerto donde escuchar (por defecto HTTP_PORT)")
+
+    vigilar = subparsers.add_parser("vigilar", help="Vigila NITTSU_PATH, KOBE_PATH y HAKATA_PATH y carga los archivos nuevos")
+    vigilar.add_argument("--incluir-existentes", action="store_true",
+                         help="Procesar también los archivos que ya están en las carpetas")
+
+    subparsers.add_parser("rellenar-fingerprints",
+                          help="Agrega y rellena fp_archivo/fp_caja en las filas históricas de T1 y T2")
+
+    subparsers.add_parser("migrar-dimensional",
+                          help="Copia el histórico de T2_CAJAS a T2_CAJAS_FACT y las dimensiones")
+
+    resumen = subparsers.add_parser("reconstruir-resumen",
+                                    help="Recalcula T3_RESUMEN_SEMANAL para un warehouse y rango de semanas")
+    resumen.add_argument("--warehouse", required=True, help="NITTSU, KOBE o HAKATA")
+    resumen.add_argument("--annio", type=int, required=True, help="Año de las semanas a recalcular")
+    resumen.add_argument("--desde", type=int, default=1, help="Semana inicial (incluida)")
+    resumen.add_argument("--hasta", type=int, default=53, help="Semana final (incluida)")
+    resumen.add_argument("--desde-cajas", action="store_true",
+                         help="Recalcular antes T3_TOTALES_ARCHIVO desde T1/T2 (recorre T2_CAJAS; "
+                              "para el histórico o si falló el registro de totales)")
+
+    consulta = subparsers.add_parser("consulta", help="Consulta la copia local Parquet (LOCAL_STORE_PATH)")
+    consulta.add_argument("--warehouse", default=None, help="NITTSU, KOBE o HAKATA")
+    consulta.add_argument("--annio", type=int, default=None, help="Año")
+    consulta.add_argument("--semana", type=int, default=None, help="Semana")
+    consulta.add_argument("--hacienda", default=None, help="Nombre de la hacienda")
+    consulta.add_argument("--sql", default=None,
+                          help="SQL sobre las vistas 'archivos' y 'cajas' (requiere duckdb)")
+
+    backfill = subparsers.add_parser("backfill",
+                                     help="Recarga un rango de semanas reemplazándolas completas (idempotente)")
+    backfill.add_argument("--warehouse", required=True, help="NITTSU, KOBE o HAKATA (usa su ruta del .env)")
+    backfill.add_argument("--annio", type=int, required=True, help="Año a recargar")
+    backfill.add_argument("--desde", type=int, default=1, help="Semana inicial (incluida)")
+    backfill.add_argument("--hasta", type=int, default=53, help="Semana final (incluida)")
+    backfill.add_argument("--ruta", default=None, help="Carpeta o .zip a usar en lugar de la ruta del .env")
+    backfill.add_argument("--workers", type=int, default=None, help="Procesos (por defecto INGEST_WORKERS)")
+    backfill.add_argument("--dry-run", action="store_true", help="Solo procesar y reportar, sin tocar BigQuery")
+
+    programar = subparsers.add_parser("programar",
+                                      help="Procesa y carga varias carpetas con límite de memoria y de jobs")
+    programar.add_argument("--ruta", action="append", default=None,
+                           help="Carpeta o .zip a cargar (repetible; por defecto todas las del .env)")
+    programar.add_argument("--workers", type=int, default=None, help="Procesos (por defecto INGEST_WORKERS)")
+    programar.add_argument("--memoria-mb", type=int, default=None,
+                           help="Memoria para libros abiertos a la vez (por defecto SCHEDULER_MEMORY_MB)")
+    programar.add_argument("--leases", default=None,
+                           help="Carpeta compartida para repartir los libros entre máquinas (por defecto LEASE_DIR)")
+    programar.add_argument("--nodo", default=None, help="Nombre de este nodo (por defecto NODE_ID o host-pid)")
+
+    comparar = subparsers.add_parser("comparar-motores",
+                                     help="Compara campo a campo dos motores de extracción (falla si difieren)")
+    comparar.add_argument("--ruta", action="append", default=[],
+                          help="Carpeta o .zip con libros reales (repetible)")
+    comparar.add_argument("--sinteticos", type=int, default=50, help="Libros sintéticos a generar (0 = ninguno)")
+    comparar.add_argument("--semilla", type=int, default=0, help="Semilla del corpus sintético")
+    comparar.add_argument("--motor-a", default="openpyxl", help="Motor de referencia")
+    comparar.add_argument("--motor-b", default="read_only", help="Motor candidato")
+
+    costos = subparsers.add_parser("costos", help="Totales del log de costos de BigQuery (COST_LOG_FILE)")
+    costos.add_argument("--archivo", default=None, help="Archivo JSONL a resumir (por defecto COST_LOG_FILE)")
+
+    return parser
+
+
 def main():
     """Función principal del programa"""
+    args = _crear_parser().parse_args()
+
+    if args.perfil:
+        from src.infrastructure.profiling.stage_profiler import stage_profiler
+
+        # El reporte se escribe al terminar el proceso
+        stage_profiler.enable()
+
+    if args.comando == "servidor":
+        from src.infrastructure.http.ingestion_server import run_server
+
+        settings.validate()
+        run_server(args.host, args.port)
+        return
+
+    if args.comando == "vigilar":
+        from src.infrastructure.watch.directory_watcher import WatchIngestionDaemon, get_carpetas_vigiladas
+
+        settings.validate()
+        carpetas = get_carpetas_vigiladas()
+        if not carpetas:
+            print("❌ No hay warehouses configurados o las rutas no existen.")
+            return
+        WatchIngestionDaemon(carpetas, incluir_existentes=args.incluir_existentes).run()
+        return
+
+    if args.comando == "rellenar-fingerprints":
+        from src.infrastructure.bigquery.bigquery_client import BigQueryClient
+        from src.infrastructure.bigquery.caja_bigquery_client import CajaBigQueryClient
+
+        settings.validate()
+        filas_archivos = BigQueryClient().backfill_fingerprints()
+        filas_cajas = CajaBigQueryClient().backfill_fingerprints()
+        print(f"✅ Fingerprints rellenados: {filas_archivos} archivos, {filas_cajas} cajas")
+        return
+
+    if args.comando == "migrar-dimensional":
+        from src.infrastructure.bigquery.caja_bigquery_client import CajaBigQueryClient
+
+        settings.validate()
+        caja_client = CajaBigQueryClient()
+        caja_client.create_table_if_not_exists()  # asegura fp_caja/fp_archivo en T2_CAJAS
+        filas = caja_client.dimensional_client.migrate_from_flat_table()
+        print(f"✅ Migradas {filas} cajas al modelo dimensional")
+        return
+
+    if args.comando == "reconstruir-resumen":
+        from src.infrastructure.bigquery.rollup_bigquery_client import RollupBigQueryClient
+
+        settings.validate()
+        semanas = [(args.warehouse.upper(), args.annio, semana) for semana in range(args.desde, args.hasta + 1)]
+        rollup_client = RollupBigQueryClient()
+        exito = not args.desde_cajas or rollup_client.rebuild_file_totals(semanas)
+        exito = exito and rollup_client.rebuild_weeks(semanas)
+        print("✅ Resumen semanal reconstruido" if exito else "❌ Error reconstruyendo el resumen semanal")
+        return
+
+    if args.comando == "consulta":
+        from src.infrastructure.local_store.parquet_store import LocalParquetStore
+
+        store = LocalParquetStore()
+        if not store.enabled:
+            print("❌ LOCAL_STORE_PATH no está configurado en el archivo .env")
+            return
+
+        if args.sql:
+            resultado = store.sql(args.sql)
+        else:
+            resultado = store.summary(args.warehouse, args.annio, args.semana, args.hacienda)
+
+        print(resultado.to_string(index=False) if not resultado.empty else "Sin resultados")
+        return
+
+    if args.comando == "backfill":
+        from src.excel_bigquery.core.services.backfill_service import BackfillService
+
+        ruta = args.ruta or settings.get_available_paths().get(args.warehouse.lower())
+        if not ruta:
+            print(f"❌ No hay ruta configurada para {args.warehouse}")
+            return
+
+        if not args.dry_run:
+            settings.validate()
+        resultado = BackfillService(args.workers).run(ruta, args.annio, args.desde, args.hasta, args.dry_run)
+        estado = "✅" if resultado["exito"] else "❌"
+        print(f"{estado} Backfill {resultado['warehouse']} {args.annio} semanas {args.desde}-{args.hasta}: "
+              f"{resultado['archivos']} archivos, {resultado['cajas']} cajas en {resultado['segundos']}s")
+        if resultado["archivos_en_cuarentena"]:
+            print(f"⚠️  {resultado['archivos_en_cuarentena']} archivos y {resultado['cajas_en_cuarentena']} cajas "
+                  f"en cuarentena (ver {settings.quarantine_path})")
+        for nombre in resultado["errores"]:
+            print(f"   ❌ {nombre}")
+        return
+
+    if args.comando == "programar":
+        from src.excel_bigquery.core.services.ingestion_scheduler import IngestionScheduler
+
+        settings.validate()
+        rutas = args.ruta or list(settings.get_available_paths().values())
+        if not rutas:
+            print("❌ No hay warehouses configurados o las rutas no existen.")
+            return
+
+        leases = None
+        if args.leases or settings.lease_dir:
+            from src.infrastructure.coordination.lease_queue import FileLeaseQueue
+
+            leases = FileLeaseQueue(args.leases, args.nodo)
+
+        scheduler = IngestionScheduler(workers=args.workers, memory_mb=args.memoria_mb, leases=leases)
+        for ruta in rutas:
+            scheduler.add_path(ruta)
+        resultado = scheduler.run()
+        print(f"✅ {resultado['procesados']} libros procesados en {resultado['segundos']}s "
+              f"({resultado['lotes_subidos']} lotes subidos, {resultado['lotes_fallidos']} fallidos)")
+        if leases:
+            print(f"   {resultado['de_otros_nodos']} libros cargados por otros nodos")
+        for nombre in resultado["errores"]:
+            print(f"   ❌ {nombre}")
+        return
+
+    if args.comando == "comparar-motores":
+        import tempfile
+        from src.excel_bigquery.core.services.engine_comparison import compare_engines, fuentes_de_rutas
+        from src.infrastructure.excel.synthetic_workbooks import generar_corpus
+
+        with tempfile.TemporaryDirectory() as directorio:
+            fuentes = fuentes_de_rutas(args.ruta)
+            if args.sinteticos:
+                sinteticos = os.path.join(directorio, "KOBE")
+                generar_corpus(sinteticos, args.sinteticos, args.semilla)
+                fuentes += fuentes_de_rutas([sinteticos])
+
+            reporte = compare_engines(fuentes, args.motor_a, args.motor_b)
+
+        print(reporte.resumen())
+        if not reporte.ok:
+            print(f"❌ {args.motor_b} no es equivalente a {args.motor_a}")
+            sys.exit(1)
+        print(f"✅ {args.motor_b} produce exactamente lo mismo que {args.motor_a}")
+        return
+
+    if args.comando == "costos":
+        from src.infrastructure.bigquery.cost_log import resumir_costos
+
+        totales = resumir_costos(args.archivo)
+        if not totales:
+            print("Sin registros de costos")
+            return
+        for total in totales:
+            print(f"{total['etiqueta']}: {total['jobs']} jobs, {total['bytes_procesados'] / 1024 ** 3:.3f} GB procesados, "
+                  f"{total['bytes_facturados'] / 1024 ** 3:.3f} GB facturados, {total['slot_ms'] / 1000:.1f} slot s")
+        return
+
     menu = MenuPrincipal()
     menu.ejecutar()
 
@@ -0,0 +1,192 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+# Atributos estándar de LogRecord; el resto son campos agregados con extra={...}
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON (fecha, nivel, logger, mensaje, proceso y extras)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "fecha": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+            "proceso": record.process,
+            "hilo": record.threadName,
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_RECORD:
+                registro[clave] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            registro["excepcion"] = record.exc_text
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class RepeatedMessageFilter(logging.Filter):
+    """
+    Limita los warnings repetidos (misma plantilla del mismo logger)
+
+    Se dejan pasar `limite` registros por plantilla en cada ventana de
+    `segundos`; los demás se descartan y se cuentan. El primer registro de la
+    ventana siguiente lleva la cantidad suprimida (campo `suprimidos`) y al
+    cerrar el logging se emite un resumen de lo que quedó pendiente. Con
+    mensajes en estilo %-format (logger.warning("... %s", valor)) la plantilla
+    es la misma aunque cambien los valores.
+    """
+
+    def __init__(self, limite: int, segundos: float, nivel: int = logging.WARNING):
+        super().__init__()
+        self.limite = limite
+        self.segundos = segundos
+        self.nivel = nivel
+        self._ventanas: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != self.nivel or self.limite <= 0:
+            return True
+
+        clave = (record.name, str(record.msg))
+        ahora = time.monotonic()
+
+        with self._lock:
+            # [inicio de la ventana, registros emitidos, registros suprimidos]
+            ventana = self._ventanas.get(clave)
+            if ventana is None or ahora - ventana[0] >= self.segundos:
+                suprimidos = ventana[2] if ventana else 0
+                self._ventanas[clave] = [ahora, 1, 0]
+                if suprimidos:
+                    record.suprimidos = suprimidos
+                    record.msg = f"{record.msg} (+{suprimidos} similares suprimidos)"
+                return True
+
+            if ventana[1] < self.limite:
+                ventana[1] += 1
+                return True
+
+            ventana[2] += 1
+            return False
+
+    def pendientes(self) -> List[Tuple[str, str, int]]:
+        """Plantillas con registros suprimidos aún no reportados: (logger, plantilla, cantidad)"""
+        with self._lock:
+            pendientes = [(nombre, plantilla, ventana[2])
+                          for (nombre, plantilla), ventana in self._ventanas.items() if ventana[2]]
+            for ventana in self._ventanas.values():
+                ventana[2] = 0
+        return pendientes
+
+
+class ProcessAwareQueueHandler(QueueHandler):
+    """
+    QueueHandler que sigue escribiendo en los procesos hijos
+
+    En un proceso creado con fork el hilo del QueueListener no existe, así que
+    los registros del hijo se escriben directo en los handlers de destino
+    (como antes de usar la cola) en lugar de quedar en una cola que nadie lee.
+    """
+
+    def __init__(self, cola: queue.SimpleQueue, handlers: List[logging.Handler]):
+        super().__init__(cola)
+        self._pid = os.getpid()
+        self._handlers = handlers
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El mensaje se formatea en el hilo del listener (msg/args se conservan);
+        # solo la excepción se formatea aquí para no retener los frames del traceback
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        if os.getpid() == self._pid:
+            super().emit(record)
+            return
+
+        for handler in self._handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_listener: Optional[QueueListener] = None
+_filtro: Optional[RepeatedMessageFilter] = None
+_pid: Optional[int] = None
+
+
+def setup_logging(level: str, log_file: str, log_format: str = "json",
+                  repeat_limit: int = 5, repeat_seconds: float = 60.0):
+    """
+    Configura el logging con escritura en segundo plano
+
+    Los loggers solo encolan el registro (QueueHandler) y un hilo
+    (QueueListener) lo formatea y lo escribe en el archivo (JSON o texto) y en
+    consola (texto), así el parseo nunca espera la E/S del log.
+
+    Args:
+        level: Nivel de log (INFO, WARNING, ...)
+        log_file: Archivo del log
+        log_format: json o text para el archivo
+        repeat_limit: Avisos iguales permitidos por ventana (0 = sin límite)
+        repeat_seconds: Duración de la ventana de avisos repetidos
+    """
+    global _listener, _filtro, _pid
+
+    if _listener is not None:
+        return
+
+    # Crear directorio de logs si no existe
+    directorio = os.path.dirname(log_file)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+
+    archivo = logging.FileHandler(log_file)
+    archivo.setFormatter(JsonFormatter() if log_format.lower() == "json" else logging.Formatter(TEXT_FORMAT))
+    consola = logging.StreamHandler()
+    consola.setFormatter(logging.Formatter(TEXT_FORMAT))
+    destinos = [archivo, consola]
+
+    cola = queue.SimpleQueue()
+    handler = ProcessAwareQueueHandler(cola, destinos)
+    _filtro = RepeatedMessageFilter(repeat_limit, repeat_seconds)
+    handler.addFilter(_filtro)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper()))
+    root.addHandler(handler)
+
+    _listener = QueueListener(cola, *destinos, respect_handler_level=True)
+    _listener.start()
+    _pid = os.getpid()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Reporta los avisos suprimidos pendientes y vacía la cola del log"""
+    global _listener
+
+    if _listener is None or os.getpid() != _pid:
+        return
+
+    logger = logging.getLogger(__name__)
+    for nombre, plantilla, cantidad in _filtro.pendientes():
+        logger.warning("%d avisos suprimidos de %s: %s", cantidad, nombre, plantilla)
+
+    _listener.stop()
+    _listener = None
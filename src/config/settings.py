@@ -1,5 +1,4 @@
 import os
-import logging
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
@@ -13,22 +12,90 @@ class Settings:
     project_id: str = os.getenv('PROJECT_ID', '')
     dataset_id: str = os.getenv('DATASET_ID', 'bd_banano')
     location: str = os.getenv('LOCATION', 'US')
+    # Lotes de hasta estas filas van por el Storage Write API (0 = siempre load jobs)
+    storage_write_max_rows: int = int(os.getenv('STORAGE_WRITE_MAX_ROWS', '5000'))
+    storage_write_stream: str = os.getenv('STORAGE_WRITE_STREAM', 'pending')
+    # Jobs que modifican una misma tabla permitidos por ventana (límite de BigQuery: 5 cada 10 s)
+    job_rate_jobs: int = int(os.getenv('JOB_RATE_JOBS', '5'))
+    job_rate_seconds: float = float(os.getenv('JOB_RATE_SECONDS', '10'))
+    # Costo de los jobs: archivo JSONL (vacío = solo log), dry run previo y límite de bytes (0 = sin límite)
+    cost_log_file: str = os.getenv('COST_LOG_FILE', 'logs/bigquery_costos.jsonl')
+    query_dry_run: bool = os.getenv('QUERY_DRY_RUN', 'false').lower() == 'true'
+    query_max_bytes: int = int(os.getenv('QUERY_MAX_BYTES', '0'))
 
     # Paths Configuration
     base_path: str = os.getenv('BASE_PATH', '')
     nittsu_path: str = os.getenv('NITTSU_PATH', '')
     kobe_path: str = os.getenv('KOBE_PATH', '')
     hakata_path: str = os.getenv('HAKATA_PATH', '')
+    # Copia local Parquet de lo subido (vacío = deshabilitada)
+    local_store_path: str = os.getenv('LOCAL_STORE_PATH', '')
 
     # Processing Configuration
     spec_value: int = int(os.getenv('SPEC_VALUE', '30'))
     tipo_default: str = os.getenv('TIPO_DEFAULT', 'CGC')
     uw_threshold: int = int(os.getenv('UW_THRESHOLD', '560'))
     ow_threshold: int = int(os.getenv('OW_THRESHOLD', '725'))
+    # Libros con varias hojas: desde cuántas hojas se reparten entre procesos y cuántos (0 = CPUs)
+    sheet_parallel_min: int = int(os.getenv('SHEET_PARALLEL_MIN', '4'))
+    sheet_workers: int = int(os.getenv('SHEET_WORKERS', '0'))
+    # Si True las cajas se guardan en T2_CAJAS_FACT + dimensiones (vista V_T2_CAJAS)
+    cajas_dimensional: bool = os.getenv('CAJAS_DIMENSIONAL', 'false').lower() == 'true'
+    # Si True cada carga actualiza T3_RESUMEN_SEMANAL con los totales de las semanas tocadas
+    rollup_enabled: bool = os.getenv('ROLLUP_ENABLED', 'true').lower() == 'true'
+    # Calidad de datos: archivos con filas que fallan las reglas se registran en cuarentena (y no se cargan si
+    # DQ_EXCLUIR=true; por defecto solo se reportan hasta calibrar las reglas)
+    dq_enabled: bool = os.getenv('DQ_ENABLED', 'true').lower() == 'true'
+    dq_excluir: bool = os.getenv('DQ_EXCLUIR', 'false').lower() == 'true'
+    dq_peso_min: float = float(os.getenv('DQ_PESO_MIN', '300'))
+    dq_peso_max: float = float(os.getenv('DQ_PESO_MAX', '1500'))
+    dq_semana_tolerancia: int = int(os.getenv('DQ_SEMANA_TOLERANCIA', '1'))
+    quarantine_path: str = os.getenv('QUARANTINE_PATH', 'logs/cuarentena')
+    quarantine_bigquery: bool = os.getenv('QUARANTINE_BIGQUERY', 'false').lower() == 'true'
+    # Cargas consolidadas: los lotes se guardan en Parquet local y cada ventana se carga con un job por tabla
+    load_consolidate: bool = os.getenv('LOAD_CONSOLIDATE', 'false').lower() == 'true'
+    load_staging_path: str = os.getenv('LOAD_STAGING_PATH', 'logs/staging_cargas')
+    load_window_seconds: float = float(os.getenv('LOAD_WINDOW_SECONDS', '900'))
+    load_window_max_cajas: int = int(os.getenv('LOAD_WINDOW_MAX_CAJAS', '500000'))
+    # Bucket GCS para la carga multi-archivo de cada ventana (vacío = un Parquet concatenado por tabla)
+    load_staging_bucket: str = os.getenv('LOAD_STAGING_BUCKET', '')
+
+    # Ingestion Service Configuration
+    http_host: str = os.getenv('HTTP_HOST', '127.0.0.1')
+    http_port: int = int(os.getenv('HTTP_PORT', '8080'))
+    http_max_upload_mb: int = int(os.getenv('HTTP_MAX_UPLOAD_MB', '50'))
+    ingest_workers: int = int(os.getenv('INGEST_WORKERS', str(os.cpu_count() or 2)))
+    batch_max_archivos: int = int(os.getenv('BATCH_MAX_ARCHIVOS', '50'))
+    batch_max_cajas: int = int(os.getenv('BATCH_MAX_CAJAS', '5000'))
+    batch_max_seconds: float = float(os.getenv('BATCH_MAX_SECONDS', '60'))
+    # Lotes que fallan: espera máxima entre reintentos y carpeta donde quedan si el proceso se detiene
+    batch_retry_max_seconds: float = float(os.getenv('BATCH_RETRY_MAX_SECONDS', '600'))
+    batch_spool_path: str = os.getenv('BATCH_SPOOL_PATH', 'logs/lotes_sin_cargar')
+    # Un lote guardado tomado por un proceso que no lo toca hace este tiempo se considera abandonado
+    batch_spool_stale_seconds: float = float(os.getenv('BATCH_SPOOL_STALE_SECONDS', '3600'))
+    watch_settle_seconds: float = float(os.getenv('WATCH_SETTLE_SECONDS', '10'))
+    watch_poll_seconds: float = float(os.getenv('WATCH_POLL_SECONDS', '5'))
+    # Memoria para libros abiertos a la vez y estimación (tamaño del archivo x factor)
+    scheduler_memory_mb: int = int(os.getenv('SCHEDULER_MEMORY_MB', '2048'))
+    scheduler_memory_factor: float = float(os.getenv('SCHEDULER_MEMORY_FACTOR', '40'))
+    # Varias máquinas: carpeta compartida de leases (vacío = un solo nodo), identificador del nodo y tiempos
+    lease_dir: str = os.getenv('LEASE_DIR', '')
+    node_id: str = os.getenv('NODE_ID', '')
+    lease_ttl_seconds: float = float(os.getenv('LEASE_TTL_SECONDS', '300'))
+    lease_heartbeat_seconds: float = float(os.getenv('LEASE_HEARTBEAT_SECONDS', '30'))
 
     # Logging Configuration
     log_level: str = os.getenv('LOG_LEVEL', 'INFO')
     log_file: str = os.getenv('LOG_FILE', 'logs/app.log')
+    # Formato del archivo de log: json (un registro por línea) o text
+    log_format: str = os.getenv('LOG_FORMAT', 'json')
+    # Avisos iguales permitidos por ventana antes de suprimirlos (0 = sin límite)
+    log_repeat_limit: int = int(os.getenv('LOG_REPEAT_LIMIT', '5'))
+    log_repeat_seconds: float = float(os.getenv('LOG_REPEAT_SECONDS', '60'))
+    # Perfilado opcional (cProfile + tracemalloc por etapa), también con python main.py --perfil
+    profile_enabled: bool = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+    profile_dir: str = os.getenv('PROFILE_DIR', 'logs/perfiles')
+    profile_top_n: int = int(os.getenv('PROFILE_TOP_N', '10'))
 
     def get_available_paths(self) -> dict:
         """Retorna las rutas disponibles para procesar"""
@@ -48,19 +115,11 @@ class Settings:
             raise ValueError("GOOGLE_APPLICATION_CREDENTIALS es requerido")
 
     def setup_logging(self):
-        """Configura el sistema de logging"""
-        # Crear directorio de logs si no existe
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-
-        logging.basicConfig(
-            level=getattr(logging, self.log_level.upper()),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file),
-                logging.StreamHandler()
-            ]
-        )
+        """Configura el sistema de logging (cola con escritura en segundo plano)"""
+        from src.config.logging_setup import setup_logging
 
+        setup_logging(self.log_level, self.log_file, self.log_format,
+                      self.log_repeat_limit, self.log_repeat_seconds)
 
 settings = Settings()
 settings.setup_logging()
\ No newline at end of file
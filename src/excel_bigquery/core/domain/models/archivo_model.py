@@ -1,7 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+from src.excel_bigquery.core.utils.id_utils import fingerprint
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class ArchivoModel:
     id_archivo: str
     archivo: str
@@ -12,10 +14,15 @@ class ArchivoModel:
     semana: int
     spec: int
     tipo: str
+    # Huella INT64 de id_archivo para duplicados, clustering y joins
+    fp_archivo: int = field(init=False)
 
     def __post_init__(self):
         # Validaciones básicas
         if not self.id_archivo:
             raise ValueError("id_archivo no puede estar vacío")
         if not self.archivo:
-            raise ValueError("archivo no puede estar vacío")
\ No newline at end of file
+            raise ValueError("archivo no puede estar vacío")
+
+        # frozen: el único campo calculado se asigna sin pasar por __setattr__
+        object.__setattr__(self, "fp_archivo", fingerprint(self.id_archivo))
\ No newline at end of file
@@ -1,8 +1,15 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
 
+from src.excel_bigquery.core.utils.id_utils import fingerprint
 
-@dataclass
+# Todas las cajas de un archivo comparten id_archivo: la huella se calcula una vez y el entero se comparte
+_fingerprint_archivo = lru_cache(maxsize=4096)(fingerprint)
+
+
+# slots: sin __dict__ por instancia (no es frozen: week_code/year_code se asignan por archivo)
+@dataclass(slots=True)
 class CajaModel:
     id_caja: str
     id_archivo: str
@@ -23,10 +30,16 @@ class CajaModel:
     spec: int
     uw: int
     ow: int
+    # Huellas INT64 de id_caja e id_archivo para duplicados, clustering y joins
+    fp_caja: int = field(init=False)
+    fp_archivo: int = field(init=False)
 
     def __post_init__(self):
         # Validaciones básicas
         if not self.id_caja:
             raise ValueError("id_caja no puede estar vacío")
         if not self.id_archivo:
-            raise ValueError("id_archivo no puede estar vacío")
\ No newline at end of file
+            raise ValueError("id_archivo no puede estar vacío")
+
+        self.fp_caja = fingerprint(self.id_caja)
+        self.fp_archivo = _fingerprint_archivo(self.id_archivo)
\ No newline at end of file
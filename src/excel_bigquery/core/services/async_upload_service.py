@@ -0,0 +1,253 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.services.rollup_service import WeeklyRollup
+from src.infrastructure.bigquery.async_jobs import run_blocking, await_job
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncUploadService:
+    """
+    Versión asyncio de UploadService
+
+    El parseo con openpyxl se ejecuta en un executor y los jobs de BigQuery se
+    esperan consultando su estado sin bloquear el event loop, de modo que un
+    solo loop puede atender varios warehouses a la vez. Cancelar la tarea o
+    vencer el timeout cancela también los jobs en curso.
+
+    La lógica de cada carga (calidad de datos, rollup, copia local y la carga
+    consolidada con LOAD_CONSOLIDATE=true) es la de UploadService: aquí solo
+    cambia cómo se esperan los jobs.
+    """
+
+    def __init__(self, upload_service=None, executor=None, poll_interval: float = 1.0):
+        """
+        Args:
+            upload_service: UploadService a reutilizar (procesador y clientes)
+            executor: Executor para parseo y llamadas bloqueantes (None = el del loop)
+            poll_interval: Segundos entre consultas de estado de los jobs
+        """
+        if upload_service is None:
+            from src.excel_bigquery.core.services.upload_service import UploadService
+            upload_service = UploadService()
+
+        self.upload_service = upload_service
+        self.excel_processor = upload_service.excel_processor
+        self.bigquery_client = upload_service.bigquery_client
+        self.caja_bigquery_client = upload_service.caja_bigquery_client
+        self.executor = executor
+        self.poll_interval = poll_interval
+
+    async def process_and_upload_excel_files(self, path: str, check_duplicates: bool = True,
+                                             include_cajas: bool = True, diferir_carga: bool = False,
+                                             timeout: Optional[float] = None) -> bool:
+        """
+        Procesa archivos Excel y los sube a BigQuery sin bloquear el event loop
+
+        Args:
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
+            check_duplicates: Si verificar duplicados antes de subir
+            include_cajas: Si procesar y subir también las cajas
+            diferir_carga: Con LOAD_CONSOLIDATE=true, dejar los archivos en la ventana
+                abierta sin cargarla (el llamador hace flush_loads al final)
+            timeout: Segundos máximos para todo el proceso (None = sin límite)
+
+        Returns:
+            True si el proceso fue exitoso
+
+        Raises:
+            asyncio.TimeoutError: Si el proceso supera el timeout
+        """
+        try:
+            return await asyncio.wait_for(
+                self._process_and_upload(path, check_duplicates, include_cajas, diferir_carga), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Tiempo agotado procesando {path} ({timeout}s)")
+            raise
+
+    async def _process_and_upload(self, path: str, check_duplicates: bool, include_cajas: bool,
+                                  diferir_carga: bool) -> bool:
+        try:
+            logger.info(f"Iniciando procesamiento de archivos en: {path}")
+
+            archivos, cajas, rollup = await self._run(self.upload_service.parse_path, path, include_cajas)
+            if not archivos:
+                logger.warning("No se encontraron archivos para procesar")
+                return False
+
+        except Exception as e:
+            logger.error(f"Error en el proceso: {e}")
+            return False
+
+        exito = await self._upload_models(archivos, cajas, check_duplicates, include_cajas, rollup)
+        if exito and not diferir_carga:
+            exito = await self.flush_loads()
+        return exito
+
+    async def upload_models(self, archivos: List[ArchivoModel], cajas: List[CajaModel],
+                            check_duplicates: bool = True, include_cajas: bool = True,
+                            timeout: Optional[float] = None) -> bool:
+        """
+        Sube a BigQuery archivos y cajas ya procesados sin bloquear el event loop
+
+        Args:
+            archivos: Lista de modelos ArchivoModel
+            cajas: Lista de modelos CajaModel de esos archivos
+            check_duplicates: Si verificar duplicados antes de subir
+            include_cajas: Si subir también las cajas
+            timeout: Segundos máximos para la carga (None = sin límite)
+
+        Returns:
+            True si la carga fue exitosa
+        """
+        return await asyncio.wait_for(
+            self._upload_models(archivos, cajas, check_duplicates, include_cajas), timeout
+        )
+
+    async def _upload_models(self, archivos: List[ArchivoModel], cajas: List[CajaModel],
+                             check_duplicates: bool, include_cajas: bool,
+                             rollup: Optional[WeeklyRollup] = None) -> bool:
+        upload_service = self.upload_service
+        if upload_service.consolidated_load is not None:
+            # Solo deja el lote en la ventana abierta (Parquet local): no hay jobs que esperar
+            return await self._run(upload_service.upload_models, archivos, cajas, check_duplicates,
+                                   include_cajas, rollup)
+
+        try:
+            if check_duplicates:
+                archivos = await self.check_existing_files(archivos)
+
+                if not archivos:
+                    logger.info("Todos los archivos ya existen en BigQuery")
+                    return True
+
+            archivos, cajas, rollup = await self._run(upload_service.prepare_models, archivos, cajas,
+                                                      include_cajas, rollup)
+            if not archivos:
+                return True
+
+            if not await self._upload_archivos(archivos):
+                logger.error("Error subiendo archivos")
+                return False
+
+            if cajas and not await self._upload_cajas(cajas):
+                logger.error("Error subiendo cajas")
+                return False
+
+            await self._run(upload_service.finish_models, archivos, cajas, rollup)
+            return True
+
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            raise
+        except Exception as e:
+            logger.error(f"Error subiendo modelos: {e}")
+            return False
+
+    async def flush_loads(self) -> bool:
+        """
+        Versión asíncrona de UploadService.flush_loads (la carga de las ventanas va en el executor)
+
+        Returns:
+            True si no hay carga consolidada, no había nada pendiente o todas las ventanas se cargaron
+        """
+        return await self._run(self.upload_service.flush_loads)
+
+    async def check_existing_files(self, archivos: List[ArchivoModel]) -> List[ArchivoModel]:
+        """
+        Versión asíncrona de BigQueryClient.check_existing_files
+
+        Args:
+            archivos: Lista de archivos a verificar
+
+        Returns:
+            Lista de archivos que no existen en BigQuery
+        """
+        if not archivos:
+            return []
+
+        client = self.bigquery_client
+        query = client._build_existing_query(archivos)
+
+        try:
+            # Migra/crea la tabla antes de consultar: tablas antiguas aún no tienen fp_archivo
+            await self._run(client.create_dataset_if_not_exists)
+            await self._run(client.create_table_if_not_exists)
+
+            job = await self._run(cost_log.start_query, client.client, query, etiqueta=f"duplicados {client.table_id}")
+            try:
+                await await_job(job, self.poll_interval, executor=self.executor)
+            finally:
+                cost_log.record(job, f"duplicados {client.table_id}")
+            results = await self._run(lambda: list(job.result()))
+            return client._filter_existing(archivos, results)
+
+        except Exception as e:
+            # Igual que BigQueryClient.check_existing_files: sin verificación no se carga nada
+            logger.error(f"Error verificando archivos existentes: {e}. Se cancela la carga")
+            raise
+
+    async def _upload_archivos(self, archivos: List[ArchivoModel]) -> bool:
+        client = self.bigquery_client
+        await self._run(client.create_dataset_if_not_exists)
+        await self._run(client.create_table_if_not_exists)
+
+        df = client._models_to_dataframe(archivos)
+        return await self._await_load(client, df, "registros")
+
+    async def _upload_cajas(self, cajas: List[CajaModel]) -> bool:
+        client = self.caja_bigquery_client
+        if settings.cajas_dimensional:
+            # El modelo dimensional encadena MERGEs y un load; se ejecuta completo en el executor
+            return await self._run(client.dimensional_client.upload_cajas, cajas)
+
+        await self._run(client.create_table_if_not_exists)
+
+        df = client._models_to_dataframe(cajas)
+        return await self._await_load(client, df, "cajas")
+
+    async def _await_load(self, client, df, descripcion: str) -> bool:
+        if client._use_storage_write(len(df)):
+            # Lote chico: Storage Write API (con fallback a load job) en el executor
+            return await self._run(client._upload_dataframe, df)
+
+        try:
+            job = await self._run(client._start_upload_dataframe, df)
+            try:
+                await await_job(job, self.poll_interval, executor=self.executor)
+            finally:
+                cost_log.record(job, f"carga {client.table_id}")
+            logger.info(f"Subidos {len(df)} {descripcion} a {client.dataset_id}.{client.table_id}")
+            return True
+
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            raise
+        except Exception as e:
+            logger.error(f"Error subiendo {descripcion} a BigQuery: {e}")
+            return False
+
+    async def get_processing_summary(self, path: str, include_cajas: bool = True,
+                                     timeout: Optional[float] = None) -> dict:
+        """
+        Versión asíncrona de UploadService.get_processing_summary (parseo en el executor)
+
+        Args:
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
+            include_cajas: Si incluir información de cajas en el resumen
+            timeout: Segundos máximos de espera (None = sin límite)
+
+        Returns:
+            Diccionario con resumen del procesamiento
+        """
+        return await asyncio.wait_for(
+            self._run(self.upload_service.get_processing_summary, path, include_cajas), timeout
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        return await run_blocking(func, *args, executor=self.executor, **kwargs)
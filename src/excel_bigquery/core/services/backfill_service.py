@@ -0,0 +1,260 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union, BinaryIO
+
+from openpyxl import load_workbook
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.services.rollup_service import WeeklyRollup
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import excel_reader, abrir_archivo_excel
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+logger = logging.getLogger(__name__)
+
+
+def leer_cabeceras(ruta_archivo: Union[str, BinaryIO], processor=None) -> List[Tuple[int, int]]:
+    """
+    Lee solo el año (A2) y la semana (T1) de las hojas de un libro, en modo read_only
+
+    Las hojas son las mismas que procesa process_workbook (ver seleccionar_hojas):
+    todas las que tienen el formato si son más de una, si no la hoja activa.
+
+    Args:
+        ruta_archivo: Ruta del archivo (o miembro de un .zip)
+        processor: ExcelProcessorService a reutilizar (opcional)
+
+    Returns:
+        Tuplas (annio, semana), una por hoja
+    """
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService, seleccionar_hojas
+
+    processor = processor or ExcelProcessorService()
+    wb_obj = load_workbook(abrir_archivo_excel(ruta_archivo), read_only=True)
+    try:
+        hojas = seleccionar_hojas([(ws.title, ws) for ws in wb_obj.worksheets], wb_obj.active)
+        valores = [(sheet_obj["A2"].value, sheet_obj["T1"].value) for _, sheet_obj in hojas]
+    finally:
+        wb_obj.close()
+
+    return [(processor._extract_year(str(anio_valor) if anio_valor else ""),
+             int(semana_valor) if semana_valor else 0)
+            for anio_valor, semana_valor in valores]
+
+
+def leer_cabecera(ruta_archivo: Union[str, BinaryIO], processor=None) -> Tuple[int, int]:
+    """
+    Año y semana más recientes de las hojas de un libro (ver leer_cabeceras)
+
+    Args:
+        ruta_archivo: Ruta del archivo (o miembro de un .zip)
+        processor: ExcelProcessorService a reutilizar (opcional)
+
+    Returns:
+        Tupla (annio, semana)
+    """
+    return max(leer_cabeceras(ruta_archivo, processor))
+
+
+def procesar_fuente_en_rango(nombre_limpio: str, ruta_archivo: str, warehouse: str, annio: int,
+                             semana_desde: int, semana_hasta: int
+                             ) -> Optional[List[Tuple[ArchivoModel, List[CajaModel]]]]:
+    """
+    Procesa un libro solo si pertenece al año y rango de semanas
+
+    Se ejecuta en un proceso del pool. Las cabeceras de las hojas se leen en
+    modo read_only, así los libros sin ninguna hoja en el rango no se parsean
+    completos. En libros con varias hojas se descartan además las hojas fuera
+    del rango.
+
+    Returns:
+        Tuplas (ArchivoModel, lista de CajaModel) de las hojas en el rango o None si está fuera del rango
+    """
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+
+    processor = ExcelProcessorService()
+    if not any(annio_hoja == annio and semana_desde <= semana_hoja <= semana_hasta
+               for annio_hoja, semana_hoja in leer_cabeceras(ruta_archivo, processor)):
+        return None
+
+    return [
+        (archivo, cajas) for archivo, cajas in processor.process_workbook(nombre_limpio, ruta_archivo, warehouse)
+        if archivo.annio == annio and semana_desde <= archivo.semana <= semana_hasta
+    ]
+
+
+def _procesar_fuente_segura(args: tuple):
+    """
+    Envoltura para el pool: un libro dañado no detiene la recarga
+
+    El resultado viaja como bytes Arrow IPC (ParsedBatch.to_ipc), no como CajaModel.
+    """
+    nombre_limpio = args[0]
+    try:
+        resultados = procesar_fuente_en_rango(*args)
+        if not resultados:
+            return nombre_limpio, None, None
+        return nombre_limpio, ParsedBatch.from_results(resultados).to_ipc(), None
+    except Exception as e:
+        return nombre_limpio, None, str(e)
+
+
+class BackfillService:
+    """
+    Recarga idempotente de un rango de semanas
+
+    Lista los libros de la carpeta, los reparte entre procesos (cada uno descarta
+    los que no tienen hojas del año/rango leyendo solo las cabeceras) y reemplaza en BigQuery
+    las semanas completas del warehouse con una transacción. Como se reemplaza
+    en lugar de agregar, volver a ejecutar la misma recarga no duplica filas y no
+    necesita verificación de duplicados.
+    """
+
+    def __init__(self, workers: Optional[int] = None, replace_client=None, rollup_client=None, local_store=None,
+                 data_quality=None):
+        self.workers = workers or settings.ingest_workers
+        self._replace_client = replace_client
+        self._rollup_client = rollup_client
+        self._local_store = local_store
+        self._data_quality = data_quality
+
+    @property
+    def replace_client(self):
+        if self._replace_client is None:
+            from src.infrastructure.bigquery.partition_replace_client import PartitionReplaceClient
+            self._replace_client = PartitionReplaceClient()
+        return self._replace_client
+
+    @property
+    def data_quality(self):
+        if self._data_quality is None:
+            from src.excel_bigquery.core.services.data_quality_service import DataQualityService
+            self._data_quality = DataQualityService()
+        return self._data_quality
+
+    @property
+    def rollup_client(self):
+        if self._rollup_client is None:
+            from src.infrastructure.bigquery.rollup_bigquery_client import RollupBigQueryClient
+            self._rollup_client = RollupBigQueryClient(self.replace_client.client)
+        return self._rollup_client
+
+    @property
+    def local_store(self):
+        if self._local_store is None:
+            from src.infrastructure.local_store.parquet_store import LocalParquetStore
+            self._local_store = LocalParquetStore()
+        return self._local_store
+
+    def plan(self, path: str, annio: int, semana_desde: int, semana_hasta: int
+             ) -> Tuple[str, ParsedBatch, List[str]]:
+        """
+        Procesa en paralelo los libros del rango
+
+        Args:
+            path: Carpeta (o bundle .zip) del warehouse
+            annio: Año a recargar
+            semana_desde: Semana inicial (incluida)
+            semana_hasta: Semana final (incluida)
+
+        Returns:
+            Tupla (warehouse, ParsedBatch con archivos y cajas, nombres de libros con error)
+        """
+        excel_files, warehouse = excel_reader(path)
+        tareas = [(nombre, ruta, warehouse, annio, semana_desde, semana_hasta) for nombre, ruta in excel_files]
+
+        lotes: List[ParsedBatch] = []
+        errores: List[str] = []
+        fps_vistos = set()
+
+        chunksize = max(1, len(tareas) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for nombre_limpio, resultado, error in pool.map(_procesar_fuente_segura, tareas, chunksize=chunksize):
+                if error:
+                    logger.error(f"Error procesando {nombre_limpio}: {error}")
+                    errores.append(nombre_limpio)
+                    continue
+                if resultado is None:
+                    continue
+
+                lote = ParsedBatch.from_ipc(resultado)
+                fps_archivos = lote.fps_archivos()
+                if fps_vistos.intersection(fps_archivos):
+                    # El mismo libro copiado dos veces en la carpeta
+                    logger.warning(f"Archivo repetido en la carpeta, se ignora: {nombre_limpio}")
+                    continue
+
+                fps_vistos.update(fps_archivos)
+                lotes.append(lote)
+
+        batch = ParsedBatch.concat(lotes)
+        logger.info(f"Backfill {warehouse} {annio} semanas {semana_desde}-{semana_hasta}: "
+                    f"{batch.num_archivos} de {len(tareas)} libros en el rango, {batch.num_cajas} cajas")
+        return warehouse, batch, errores
+
+    def run(self, path: str, annio: int, semana_desde: int = 1, semana_hasta: int = 53,
+            dry_run: bool = False) -> dict:
+        """
+        Recarga las semanas indicadas reemplazándolas completas
+
+        Args:
+            path: Carpeta (o bundle .zip) del warehouse
+            annio: Año a recargar
+            semana_desde: Semana inicial (incluida)
+            semana_hasta: Semana final (incluida)
+            dry_run: Solo procesar y reportar, sin tocar BigQuery
+
+        Returns:
+            Diccionario con el resultado (exito, archivos, cajas, errores, segundos)
+        """
+        inicio = time.perf_counter()
+        warehouse, batch, errores = self.plan(path, annio, semana_desde, semana_hasta)
+        # Las filas en cuarentena no se recargan (en dry run solo se reportan)
+        validado = self.data_quality.apply(batch, escribir=not dry_run)
+        resultado = {
+            "warehouse": warehouse,
+            "archivos": validado.num_archivos,
+            "cajas": validado.num_cajas,
+            "archivos_en_cuarentena": batch.num_archivos - validado.num_archivos,
+            "cajas_en_cuarentena": batch.num_cajas - validado.num_cajas,
+            "errores": errores,
+            "exito": True,
+        }
+        batch = validado
+
+        if errores:
+            # Reemplazar con libros faltantes borraría sus filas actuales
+            logger.error(f"Backfill cancelado: {len(errores)} libros con error")
+            resultado["exito"] = False
+        elif resultado["archivos_en_cuarentena"]:
+            # Igual que un libro con error: reemplazar sin esos archivos borraría sus filas actuales
+            logger.error(f"Backfill cancelado: {resultado['archivos_en_cuarentena']} archivos en cuarentena. "
+                         f"Corríjalos (ver {settings.quarantine_path}) o ejecute con DQ_EXCLUIR=false")
+            resultado["exito"] = False
+        elif not batch.num_archivos:
+            logger.warning("No hay libros en el rango; no se reemplaza nada")
+        elif not dry_run:
+            resultado["exito"] = self._replace(warehouse, annio, semana_desde, semana_hasta, batch)
+
+        resultado["segundos"] = round(time.perf_counter() - inicio, 1)
+        return resultado
+
+    def _replace(self, warehouse: str, annio: int, semana_desde: int, semana_hasta: int,
+                 batch: ParsedBatch) -> bool:
+        if not self.replace_client.replace_weeks(warehouse, annio, semana_desde, semana_hasta,
+                                                 batch.archivos_df(), batch.cajas_df()):
+            return False
+
+        if settings.rollup_enabled:
+            semanas = {(warehouse, annio, semana) for semana in range(semana_desde, semana_hasta + 1)}
+            semanas.update(zip(*(batch.archivos.column(c).to_pylist() for c in ("warehouse", "annio", "semana"))))
+            filas = WeeklyRollup.from_batch(batch).file_totals()
+            if not (self.rollup_client.replace_files(warehouse, annio, semana_desde, semana_hasta, filas)
+                    and self.rollup_client.rebuild_weeks(semanas)):
+                logger.error("Los datos se recargaron pero T3_RESUMEN_SEMANAL no se actualizó. "
+                             "Ejecute: python main.py reconstruir-resumen --desde-cajas")
+
+        self.local_store.replace_weeks(warehouse, annio, semana_desde, semana_hasta, batch)
+        return True
@@ -1,65 +1,84 @@
-from typing import List
+from typing import List, Union, BinaryIO
 from openpyxl import load_workbook
 import logging
+import sys
 
 from src.excel_bigquery.core.domain.models.caja_model import CajaModel
 from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
-from src.excel_bigquery.core.utils.date_utils import extract_week_and_year_from_trazabilidad
+from src.excel_bigquery.core.utils.date_utils import decode_trazabilidad_batch
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import abrir_archivo_excel
 from src.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Límite de seguridad de columnas revisadas (B, D, F, ...) y fila donde empiezan los pesos
+MAX_COLUMNAS_CAJAS = 50
+FILA_INICIAL_PESOS = 8
+
 
 class CajaProcessorService:
 
-    def process_cajas_from_file(self, archivo_model: ArchivoModel, ruta_archivo: str) -> List[CajaModel]:
+    def process_cajas_from_file(self, archivo_model: ArchivoModel,
+                                ruta_archivo: Union[str, BinaryIO]) -> List[CajaModel]:
         """
         Procesa las cajas de un archivo Excel específico
 
         Args:
             archivo_model: Modelo del archivo que contiene metadata
-            ruta_archivo: Ruta completa del archivo Excel
+            ruta_archivo: Ruta completa del archivo Excel (o miembro de un .zip)
 
         Returns:
             Lista de modelos CajaModel
         """
         try:
-            wb_obj = load_workbook(ruta_archivo)
-            sheet_obj = wb_obj.active
+            wb_obj = load_workbook(abrir_archivo_excel(ruta_archivo))
+            return self.process_cajas_from_sheet(wb_obj.active, archivo_model)
 
-            cajas = []
+        except Exception as e:
+            logger.error("Error procesando cajas del archivo %s: %s", archivo_model.archivo, e)
+            return []
 
-            # Empezar desde la columna B (columna 2) y revisar cada 2 columnas: B, D, F, H, etc.
-            column = 2  # Columna B
-            max_columns_to_check = 50  # Límite de seguridad
+    def process_cajas_from_sheet(self, sheet_obj, archivo_model: ArchivoModel) -> List[CajaModel]:
+        """
+        Procesa las cajas de una hoja ya abierta
 
-            while column <= max_columns_to_check:
-                try:
-                    # Verificar si hay nombre de caja en la columna actual, fila 2
-                    nombre_caja = sheet_obj.cell(row=2, column=column).value
+        Args:
+            sheet_obj: Hoja de openpyxl (o un objeto con la misma interfaz cell(row, column).value)
+            archivo_model: Modelo del archivo que contiene metadata
 
-                    if nombre_caja and str(nombre_caja).strip():  # Si hay datos válidos
-                        caja_data = self._extract_caja_data_from_column(sheet_obj, column, archivo_model)
-                        if caja_data:
-                            cajas.append(caja_data)
-                    else:
-                        # Si no hay más cajas, salir del bucle
-                        break
+        Returns:
+            Lista de modelos CajaModel
+        """
+        cajas = []
 
-                    # Avanzar a la siguiente columna par (B -> D -> F -> H, etc.)
-                    column += 2
+        # Empezar desde la columna B (columna 2) y revisar cada 2 columnas: B, D, F, H, etc.
+        column = 2  # Columna B
 
-                except Exception as e:
-                    logger.warning(f"Error procesando columna {column} del archivo {archivo_model.archivo}: {e}")
-                    column += 2
-                    continue
+        while column <= MAX_COLUMNAS_CAJAS:
+            try:
+                # Verificar si hay nombre de caja en la columna actual, fila 2
+                nombre_caja = sheet_obj.cell(row=2, column=column).value
+
+                if nombre_caja and str(nombre_caja).strip():  # Si hay datos válidos
+                    caja_data = self._extract_caja_data_from_column(sheet_obj, column, archivo_model)
+                    if caja_data:
+                        cajas.append(caja_data)
+                else:
+                    # Si no hay más cajas, salir del bucle
+                    break
+
+                # Avanzar a la siguiente columna par (B -> D -> F -> H, etc.)
+                column += 2
+
+            except Exception as e:
+                logger.warning("Error procesando columna %d del archivo %s: %s", column, archivo_model.archivo, e)
+                column += 2
+                continue
 
-            logger.info(f"Procesadas {len(cajas)} cajas del archivo {archivo_model.archivo}")
-            return cajas
+        self._assign_week_codes(cajas, archivo_model)
 
-        except Exception as e:
-            logger.error(f"Error procesando cajas del archivo {archivo_model.archivo}: {e}")
-            return []
+        logger.info("Procesadas %d cajas del archivo %s", len(cajas), archivo_model.archivo)
+        return cajas
 
     def _extract_caja_data_from_column(self, sheet_obj, column: int, archivo_model: ArchivoModel) -> CajaModel:
         """
@@ -74,11 +93,12 @@ class CajaProcessorService:
             Modelo CajaModel
         """
         # Extraer datos básicos de la caja según las filas especificadas:
-        nombre_caja = str(sheet_obj.cell(row=2, column=column).value or "").strip()
-        codigo_container = str(sheet_obj.cell(row=3, column=column).value or "").strip()
+        # Textos de baja cardinalidad que se repiten en miles de cajas: se internan para compartir una sola copia
+        nombre_caja = sys.intern(str(sheet_obj.cell(row=2, column=column).value or "").strip())
+        codigo_container = sys.intern(str(sheet_obj.cell(row=3, column=column).value or "").strip())
         codigo_hacienda = self._safe_int(sheet_obj.cell(row=4, column=column).value)
-        codigo_trazabilidad = str(sheet_obj.cell(row=5, column=column).value or "").strip()
-        nombre_hacienda = str(sheet_obj.cell(row=6, column=column).value or "").strip().upper()  # MAYÚSCULAS
+        codigo_trazabilidad = sys.intern(str(sheet_obj.cell(row=5, column=column).value or "").strip())
+        nombre_hacienda = sys.intern(str(sheet_obj.cell(row=6, column=column).value or "").strip().upper())  # MAYÚSCULAS
 
         # Campos que solo pertenecen a NITTSU MATHIAS
         # Para NITTSU, KOBE y HAKATA son 0
@@ -91,9 +111,6 @@ class CajaProcessorService:
         # Procesar pesos desde la fila 8 hacia abajo según spec_value
         peso_data = self._extract_peso_data_from_column(sheet_obj, column, archivo_model)
 
-        # Extraer semana y año del código de trazabilidad
-        week_code, year_code = extract_week_and_year_from_trazabilidad(codigo_trazabilidad)
-
         # Crear ID único para la caja según el formato especificado:
         # warehouse_anio_archivo_caja_codigocontainer_codigohacienda_codigotrazabilidad_nombrehacienda
         id_caja = f"{archivo_model.warehouse}_{archivo_model.annio}_{archivo_model.archivo}_{nombre_caja.replace(' ', '_')}_{codigo_container}_{codigo_hacienda}_{codigo_trazabilidad}_{nombre_hacienda.replace(' ', '_')}"
@@ -106,20 +123,37 @@ class CajaProcessorService:
             codigo_hacienda=codigo_hacienda,
             codigo_trazabilidad=codigo_trazabilidad,
             nombre_hacienda=nombre_hacienda,
-            temperatura=round(temperatura, 2),
+            temperatura=temperatura,  # constantes 0.0 compartidas: round() crearía un float por caja
             dedos_totales=dedos_totales,
-            peso_bruto_kg=round(peso_bruto_kg, 2),
+            peso_bruto_kg=peso_bruto_kg,
             peso_total_kg=round(peso_data['peso_total'], 2),
             cantidad_observaciones=cantidad_observaciones,
             dedos_afectados_totales=dedos_afectados_totales,
             peso_promedio=round(peso_data['peso_promedio'], 2),
-            week_code=week_code,
-            year_code=year_code,
+            week_code=0,  # se asignan para todo el archivo en _assign_week_codes
+            year_code=0,
             spec=archivo_model.spec,
             uw=peso_data['uw'],
             ow=peso_data['ow']
         )
 
+    def _assign_week_codes(self, cajas: List[CajaModel], archivo_model: ArchivoModel):
+        """
+        Asigna semana y año del código de trazabilidad a todas las cajas del archivo
+
+        Los códigos se decodifican juntos con la tabla de calendario precalculada;
+        los malformados quedan con 0 y se reportan en una sola línea.
+        """
+        decodificados = decode_trazabilidad_batch([caja.codigo_trazabilidad for caja in cajas])
+
+        for caja, week_code, year_code in zip(cajas, decodificados.semanas, decodificados.annios):
+            caja.week_code = week_code
+            caja.year_code = year_code
+
+        if decodificados.malformados:
+            logger.warning("%d códigos de trazabilidad inválidos en %s: %s",
+                           decodificados.cantidad_malformados, archivo_model.archivo, decodificados.resumen())
+
     def _extract_peso_data_from_column(self, sheet_obj, column: int, archivo_model: ArchivoModel) -> dict:
         """
         Extrae los datos de peso de una columna desde la fila 8 hacia abajo
@@ -137,7 +171,7 @@ class CajaProcessorService:
         ow_count = 0
 
         # Leer desde la fila 8 hasta fila 8 + spec_value
-        fila_inicial = 8
+        fila_inicial = FILA_INICIAL_PESOS
         fila_final = fila_inicial + settings.spec_value  # Por ejemplo: 8 + 30 = 38
 
         for fila in range(fila_inicial, fila_final):
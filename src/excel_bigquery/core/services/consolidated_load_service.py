@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from src.config.settings import settings
+from src.excel_bigquery.core.services.rollup_service import WeeklyRollup
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+from src.infrastructure.local_store.load_staging import LoadStagingArea
+
+logger = logging.getLogger(__name__)
+
+
+class ConsolidatedLoadService:
+    """
+    Capa de acumulación entre los parsers y la carga a BigQuery (LOAD_CONSOLIDATE=true)
+
+    Cada lote, ya sin duplicados y validado, se guarda en Parquet local
+    (LoadStagingArea) en vez de cargarse. flush() cierra la ventana abierta y
+    carga cada ventana pendiente con un load job por tabla y una transacción
+    (ConsolidatedLoadClient): todos los lotes de la ventana quedan cargados o
+    ninguno. Así los warehouses de la opción 4 y los micro-lotes de vigilar,
+    servidor y programar terminan en pocas cargas grandes. Cada ventana se
+    toma antes de cargarla (LoadStagingArea.claim), así dos procesos que
+    comparten la carpeta no la cargan dos veces. Una ventana que falla (o que
+    quedó de una ejecución interrumpida) se reintenta en el próximo flush,
+    también desde otra ejecución.
+    """
+
+    def __init__(self, upload_service, area: Optional[LoadStagingArea] = None, client=None):
+        self.upload_service = upload_service
+        self.area = area or LoadStagingArea()
+        self._client = client
+        self.window_seconds = settings.load_window_seconds
+        self.max_cajas = settings.load_window_max_cajas
+
+        # Lote -> (al_cargar, archivos del lote): se avisa cuando se carga su ventana
+        self._avisos: Dict[str, Tuple[Callable[[ParsedBatch, bool], None], ParsedBatch]] = {}
+        self._cajas = 0
+        self._inicio: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self.ventanas_cargadas = 0
+        self.ventanas_fallidas = 0
+
+    @property
+    def client(self):
+        """Cliente de la carga consolidada, creado a demanda"""
+        if self._client is None:
+            from src.infrastructure.bigquery.consolidated_load_client import ConsolidatedLoadClient
+            self._client = ConsolidatedLoadClient()
+        return self._client
+
+    def stage(self, batch: ParsedBatch, check_duplicates: bool = True,
+              al_cargar: Optional[Callable[[ParsedBatch, bool], None]] = None) -> bool:
+        """
+        Deja un lote en la ventana abierta
+
+        Args:
+            batch: Archivos y cajas parseados
+            check_duplicates: Si quitar antes los archivos que ya están en BigQuery
+            al_cargar: Se llama con (lote, exito) cuando se carga la ventana del lote
+
+        Returns:
+            True si el lote quedó guardado (o no había nada nuevo que guardar)
+        """
+        original = ParsedBatch(batch.archivos, batch.cajas.slice(0, 0))
+
+        if check_duplicates:
+            existentes = self.upload_service.bigquery_client.check_existing_fingerprints(batch.fps_archivos())
+            batch = batch.exclude_archivos(existentes)
+
+        batch = self.upload_service.data_quality.apply(batch)
+        if not batch.num_archivos:
+            logger.info("Ningún archivo nuevo para la ventana de carga")
+            if al_cargar:
+                al_cargar(original, True)
+            return True
+
+        lote = self.area.stage(batch)
+        if lote is None:
+            return False
+
+        with self._lock:
+            if al_cargar:
+                self._avisos[lote] = (al_cargar, original)
+            if self._inicio is None:
+                self._inicio = time.monotonic()
+            self._cajas += batch.num_cajas
+
+        logger.info("Lote %s en espera de carga: %d archivos, %d cajas", lote, batch.num_archivos, batch.num_cajas)
+        return True
+
+    def due(self) -> bool:
+        """True si la ventana abierta superó LOAD_WINDOW_SECONDS o LOAD_WINDOW_MAX_CAJAS"""
+        with self._lock:
+            return self._inicio is not None and (
+                time.monotonic() - self._inicio >= self.window_seconds or self._cajas >= self.max_cajas
+            )
+
+    def pending(self) -> dict:
+        """Lotes, archivos y cajas que esperan carga (en disco, de todas las ejecuciones)"""
+        return self.area.pending()
+
+    def flush(self) -> bool:
+        """
+        Cierra la ventana abierta y carga todas las ventanas pendientes
+
+        Returns:
+            True si no había nada pendiente o todas las ventanas se cargaron
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._cajas = 0
+                self._inicio = None
+            exito = True
+            try:
+                self.area.seal()
+                self.area.recover()
+                ventanas = self.area.windows()
+            except OSError as e:
+                logger.error(f"Error leyendo las ventanas de {self.area.root}: {e}")
+                return False
+
+            for ventana in ventanas:
+                tomada = self.area.claim(ventana)
+                if tomada is None:
+                    continue  # la tomó otro proceso
+                try:
+                    if not self._load(tomada):
+                        exito = False
+                except Exception as e:
+                    logger.error(f"Error inesperado cargando la ventana {os.path.basename(ventana)}: {e}")
+                    self.area.release(tomada)
+                    exito = False
+            return exito
+
+    def _load(self, ventana: str) -> bool:
+        nombre = os.path.basename(ventana)
+        try:
+            lotes = self.area.batches(ventana)
+        except FileNotFoundError:
+            logger.warning(f"La ventana {nombre} ya no existe; se omite")
+            return True
+        nuevos = self.client.load_window(nombre, self.area.files(ventana, "archivos"),
+                                         self.area.files(ventana, "cajas"))
+        exito = nuevos is not None
+
+        if exito:
+            self.ventanas_cargadas += 1
+            if nuevos:
+                self._after_load(ventana, nuevos)
+            self.area.discard(ventana)
+        else:
+            self.ventanas_fallidas += 1
+            self.area.release(ventana)
+            logger.error(f"La ventana {nombre} ({len(lotes)} lotes) queda en {self.area.root} para reintentarla")
+
+        for lote in lotes:
+            with self._lock:
+                aviso = self._avisos.pop(lote, None)
+            if aviso:
+                al_cargar, archivos = aviso
+                al_cargar(archivos, exito)
+        return exito
+
+    def _after_load(self, ventana: str, nuevos: set):
+        """Resumen semanal y copia local de los archivos que la ventana agregó a T1/T2"""
+        if not settings.rollup_enabled and not self.upload_service.local_store.enabled:
+            return
+
+        # Un archivo que llegó en dos lotes de la ventana se insertó una sola vez: se cuenta una vez
+        partes, vistos = [], set()
+        for lote in self.area.batches(ventana):
+            parte = self.area.read_batch(ventana, lote)
+            fps = set(parte.fps_archivos())
+            partes.append(parte.exclude_archivos(fps - (nuevos - vistos)))
+            vistos |= fps & nuevos
+        batch = ParsedBatch.concat(partes)
+
+        if settings.rollup_enabled and batch.num_cajas:
+            self.upload_service._update_rollup(WeeklyRollup.from_batch(batch), nuevos)
+
+        # La copia local es auxiliar: un error se registra pero no invalida la carga
+        self.upload_service.local_store.append_batch(batch)
@@ -0,0 +1,228 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+logger = logging.getLogger(__name__)
+
+SEPARADOR_MOTIVOS = "; "
+
+
+def _sin_nulos(mascara: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.fill_null(mascara, False)
+
+
+def _motivos(reglas: List[Tuple[str, pa.ChunkedArray]], filas: int) -> pa.ChunkedArray:
+    """Columna con los motivos de cada fila separados por '; ' ('' si pasa todas las reglas)"""
+    motivos = pa.chunked_array([pa.array([""] * filas, pa.string())]) if filas else pa.chunked_array([], pa.string())
+    for motivo, mascara in reglas:
+        etiqueta = pc.if_else(_sin_nulos(mascara), motivo + SEPARADOR_MOTIVOS, "")
+        motivos = pc.binary_join_element_wise(motivos, etiqueta, "")
+    return pc.utf8_rtrim(motivos, characters=SEPARADOR_MOTIVOS)
+
+
+def _distancia_semanas(a: pa.ChunkedArray, b: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Circular: la semana 52/53 y la semana 1 son vecinas (el código guarda el año calendario, no el ISO)
+    diferencia = pc.abs(pc.subtract(a, b))
+    return pc.min_element_wise(diferencia, pc.abs(pc.subtract(diferencia, 52)), pc.abs(pc.subtract(diferencia, 53)))
+
+
+def _con_motivos(tabla: pa.Table, motivos: pa.ChunkedArray, fallidas: pa.ChunkedArray,
+                 fecha: datetime) -> pa.Table:
+    cuarentena = tabla.filter(fallidas)
+    cuarentena = cuarentena.append_column("motivos", motivos.filter(fallidas))
+    return cuarentena.append_column(
+        "fecha_cuarentena", pa.array([fecha] * cuarentena.num_rows, pa.timestamp("us", tz="UTC"))
+    )
+
+
+@dataclass
+class DataQualityResult:
+    """Lote separado en filas válidas y filas en cuarentena (con la columna motivos)"""
+    limpio: ParsedBatch
+    archivos_cuarentena: pa.Table
+    cajas_cuarentena: pa.Table
+
+    @property
+    def cantidad(self) -> int:
+        return self.archivos_cuarentena.num_rows + self.cajas_cuarentena.num_rows
+
+    def conteo_motivos(self) -> Dict[str, int]:
+        """Filas en cuarentena por motivo (una fila con varios motivos cuenta en cada uno)"""
+        conteo: Dict[str, int] = {}
+        for tabla in (self.archivos_cuarentena, self.cajas_cuarentena):
+            if not tabla.num_rows:
+                continue
+            motivos = pc.list_flatten(pc.split_pattern(tabla.column("motivos"), SEPARADOR_MOTIVOS))
+            for fila in pc.value_counts(motivos).to_pylist():
+                conteo[fila["values"]] = conteo.get(fila["values"], 0) + fila["counts"]
+        return conteo
+
+    def resumen(self) -> str:
+        detalle = ", ".join(f"{motivo}: {n}" for motivo, n in sorted(self.conteo_motivos().items()))
+        return (f"{self.archivos_cuarentena.num_rows} archivos y {self.cajas_cuarentena.num_rows} cajas "
+                f"en cuarentena ({detalle})")
+
+
+def validate_batch(batch: ParsedBatch, peso_min: Optional[float] = None, peso_max: Optional[float] = None,
+                   tolerancia_semanas: Optional[int] = None) -> DataQualityResult:
+    """
+    Valida un lote completo con operaciones columnares de Arrow
+
+    Reglas de cajas: peso promedio fuera del rango físico, sin pesos legibles,
+    container vacío, código de hacienda 0, trazabilidad inválida (semana o año 0)
+    y semana de trazabilidad distinta de la semana del archivo.
+    Reglas de archivos: año 0, semana fuera de 1..53 y alguna caja en cuarentena.
+    Un archivo en cuarentena arrastra a todas sus cajas ("archivo en cuarentena"):
+    un archivo se carga completo o no se carga.
+
+    Args:
+        batch: Lote a validar
+        peso_min: Peso promedio mínimo admitido (default DQ_PESO_MIN)
+        peso_max: Peso promedio máximo admitido (default DQ_PESO_MAX)
+        tolerancia_semanas: Semanas de diferencia admitidas entre trazabilidad y archivo
+
+    Returns:
+        DataQualityResult con el lote limpio y las filas en cuarentena
+    """
+    peso_min = settings.dq_peso_min if peso_min is None else peso_min
+    peso_max = settings.dq_peso_max if peso_max is None else peso_max
+    tolerancia_semanas = settings.dq_semana_tolerancia if tolerancia_semanas is None else tolerancia_semanas
+    fecha = datetime.now(timezone.utc)
+
+    archivos, cajas = batch.archivos, batch.cajas
+    annio, semana = archivos.column("annio"), archivos.column("semana")
+
+    # Semana de archivo de cada caja (join por posición con index_in)
+    posicion = pc.index_in(cajas.column("fp_archivo"), value_set=archivos.column("fp_archivo"))
+    semana_archivo = pc.take(semana, posicion)
+
+    peso_promedio = cajas.column("peso_promedio")
+    week_code = cajas.column("week_code")
+    trazabilidad_valida = pc.and_(pc.greater(week_code, 0), pc.greater(cajas.column("year_code"), 0))
+    reglas_cajas = [
+        ("sin pesos legibles", pc.equal(peso_promedio, 0)),
+        ("peso fuera de rango", pc.and_(pc.greater(peso_promedio, 0),
+                                        pc.or_(pc.less(peso_promedio, peso_min),
+                                               pc.greater(peso_promedio, peso_max)))),
+        ("container vacío", pc.equal(pc.utf8_length(cajas.column("codigo_container")), 0)),
+        ("hacienda 0", pc.equal(cajas.column("codigo_hacienda"), 0)),
+        ("trazabilidad inválida", pc.invert(trazabilidad_valida)),
+        ("semana de trazabilidad distinta", pc.and_(
+            trazabilidad_valida,
+            pc.greater(_distancia_semanas(week_code, semana_archivo), tolerancia_semanas)
+        )),
+    ]
+    cajas_propias_fallidas = pc.not_equal(_motivos(reglas_cajas, cajas.num_rows), "")
+    fps_con_cajas_fallidas = cajas.column("fp_archivo").filter(cajas_propias_fallidas)
+
+    motivos_archivos = _motivos([
+        ("año 0", pc.equal(annio, 0)),
+        ("semana fuera de rango", pc.or_(pc.less(semana, 1), pc.greater(semana, 53))),
+        ("cajas en cuarentena", pc.is_in(archivos.column("fp_archivo"), value_set=fps_con_cajas_fallidas)),
+    ], archivos.num_rows)
+    archivos_fallidos = pc.not_equal(motivos_archivos, "")
+
+    motivos_cajas = _motivos([("archivo en cuarentena", pc.take(archivos_fallidos, posicion))] + reglas_cajas,
+                             cajas.num_rows)
+    cajas_fallidas = pc.not_equal(motivos_cajas, "")
+
+    return DataQualityResult(
+        limpio=ParsedBatch(archivos.filter(pc.invert(archivos_fallidos)), cajas.filter(pc.invert(cajas_fallidas))),
+        archivos_cuarentena=_con_motivos(archivos, motivos_archivos, archivos_fallidos, fecha),
+        cajas_cuarentena=_con_motivos(cajas, motivos_cajas, cajas_fallidas, fecha),
+    )
+
+
+class DataQualityService:
+    """
+    Etapa de calidad de datos previa a la carga
+
+    Valida cada lote en bloque (validate_batch), escribe las filas que fallan
+    en la cuarentena local (Parquet bajo QUARANTINE_PATH) y, si
+    QUARANTINE_BIGQUERY=true, en T4_CUARENTENA_ARCHIVOS/T4_CUARENTENA_CAJAS.
+    Por defecto (DQ_EXCLUIR=false) solo se registran: el lote se carga
+    completo, igual que sin validación, mientras las reglas se calibran con lo
+    que va quedando en cuarentena. Con DQ_EXCLUIR=true no se cargan en T1/T2 y
+    la cuarentena es por archivo: una caja que falla deja fuera a su archivo
+    con todas sus cajas, así nunca queda en T1 un archivo con cajas faltantes.
+
+    Para recargar un archivo en cuarentena, se corrige el libro (o se ajustan
+    DQ_PESO_MIN/DQ_PESO_MAX/DQ_SEMANA_TOLERANCIA, o se carga con
+    DQ_EXCLUIR=false) y se vuelve a procesar la carpeta: el archivo no está en
+    T1, así que la verificación de duplicados no lo omite (con LEASE_DIR hay
+    que borrar antes su marcador en done/).
+    """
+
+    def __init__(self, bigquery_client=None):
+        from src.infrastructure.local_store.quarantine_store import QuarantineStore
+
+        self.store = QuarantineStore()
+        self._bigquery_client = bigquery_client
+        self.enabled = settings.dq_enabled
+
+    @property
+    def bigquery_client(self):
+        """Cliente de las tablas de cuarentena, creado a demanda"""
+        if self._bigquery_client is None:
+            from src.infrastructure.bigquery.quarantine_bigquery_client import QuarantineBigQueryClient
+            self._bigquery_client = QuarantineBigQueryClient()
+        return self._bigquery_client
+
+    def apply(self, batch: ParsedBatch, escribir: bool = True) -> ParsedBatch:
+        """
+        Valida el lote y guarda la cuarentena
+
+        Args:
+            batch: Lote parseado
+            escribir: Si guardar las filas en cuarentena (False en simulaciones)
+
+        Returns:
+            Lote a cargar: sin las filas en cuarentena si DQ_EXCLUIR=true, o el mismo lote
+        """
+        if not self.enabled or not batch.num_archivos:
+            return batch
+
+        resultado = validate_batch(batch)
+        if not resultado.cantidad:
+            return batch
+
+        logger.warning("Calidad de datos: %s", resultado.resumen())
+        if escribir:
+            self._guardar(resultado)
+
+        return resultado.limpio if settings.dq_excluir else batch
+
+    def apply_models(self, archivos: List[ArchivoModel],
+                     cajas: List[CajaModel]) -> Tuple[List[ArchivoModel], List[CajaModel]]:
+        """
+        Igual que apply() para listas de modelos
+
+        Returns:
+            Tupla (archivos, cajas) sin los modelos en cuarentena
+        """
+        if not self.enabled or not archivos:
+            return archivos, cajas
+
+        limpio = self.apply(ParsedBatch.from_models(archivos, cajas))
+        if limpio.num_archivos == len(archivos) and limpio.num_cajas == len(cajas):
+            return archivos, cajas
+
+        fps_archivos = set(limpio.fps_archivos())
+        fps_cajas = set(limpio.cajas.column("fp_caja").to_pylist())
+        return ([archivo for archivo in archivos if archivo.fp_archivo in fps_archivos],
+                [caja for caja in cajas if caja.fp_caja in fps_cajas])
+
+    def _guardar(self, resultado: DataQualityResult):
+        # La cuarentena es auxiliar: un error se registra pero no detiene la carga
+        self.store.write(resultado.archivos_cuarentena, resultado.cajas_cuarentena)
+        if settings.quarantine_bigquery:
+            self.bigquery_client.upload(resultado.archivos_cuarentena, resultado.cajas_cuarentena)
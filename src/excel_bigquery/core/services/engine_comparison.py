@@ -0,0 +1,149 @@
+import logging
+import math
+import time
+from dataclasses import dataclass, field, fields
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import excel_reader
+
+logger = logging.getLogger(__name__)
+
+
+def _motor_openpyxl():
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+    return ExcelProcessorService()
+
+
+def _motor_read_only():
+    from src.infrastructure.excel.read_only_engine import ReadOnlyExcelEngine
+    return ReadOnlyExcelEngine()
+
+
+# Motores con la interfaz process_workbook(nombre_limpio, ruta_archivo, warehouse)
+ENGINES: Dict[str, Callable] = {
+    "openpyxl": _motor_openpyxl,
+    "read_only": _motor_read_only,
+}
+
+
+@dataclass
+class Divergencia:
+    archivo: str
+    elemento: str  # "archivo", "caja 3", "cantidad de cajas", "cantidad de hojas" o "error"
+    campo: str
+    valor_a: object
+    valor_b: object
+
+    def __str__(self) -> str:
+        return f"{self.archivo} [{self.elemento}] {self.campo}: {self.valor_a!r} != {self.valor_b!r}"
+
+
+@dataclass
+class ComparisonReport:
+    motor_a: str
+    motor_b: str
+    archivos: int = 0
+    cajas: int = 0
+    segundos: Dict[str, float] = field(default_factory=dict)
+    divergencias: List[Divergencia] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.divergencias
+
+    def resumen(self, max_divergencias: int = 20) -> str:
+        lineas = [f"{self.archivos} libros, {self.cajas} cajas"]
+        for motor in (self.motor_a, self.motor_b):
+            lineas.append(f"  {motor}: {self.segundos.get(motor, 0.0):.2f}s")
+        if self.segundos.get(self.motor_b):
+            lineas.append(f"  {self.motor_b} es {self.segundos[self.motor_a] / self.segundos[self.motor_b]:.2f}x "
+                          f"respecto de {self.motor_a}")
+        lineas.append(f"{len(self.divergencias)} divergencias")
+        lineas.extend(f"  {d}" for d in self.divergencias[:max_divergencias])
+        return "\n".join(lineas)
+
+
+def _iguales(a, b) -> bool:
+    # Mismo tipo y mismo valor: 1 y 1.0 cambian el tipo de la columna en BigQuery
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def _comparar_modelos(archivo: str, elemento: str, modelo_a, modelo_b) -> List[Divergencia]:
+    return [
+        Divergencia(archivo, elemento, f.name, getattr(modelo_a, f.name), getattr(modelo_b, f.name))
+        for f in fields(modelo_a)
+        if not _iguales(getattr(modelo_a, f.name), getattr(modelo_b, f.name))
+    ]
+
+
+def _ejecutar(motor, nombre_limpio: str, ruta_archivo: str, warehouse: str) -> Tuple[Optional[list], Optional[str], float]:
+    inicio = time.perf_counter()
+    try:
+        resultado = motor.process_workbook(nombre_limpio, ruta_archivo, warehouse)
+        error = None
+    except Exception as e:
+        resultado, error = None, f"{type(e).__name__}: {e}"
+    return resultado, error, time.perf_counter() - inicio
+
+
+def compare_engines(fuentes: List[Tuple[str, str, str]], motor_a: str = "openpyxl",
+                    motor_b: str = "read_only") -> ComparisonReport:
+    """
+    Ejecuta dos motores sobre los mismos libros y compara cada campo
+
+    Args:
+        fuentes: Tuplas (nombre_limpio, ruta_archivo, warehouse)
+        motor_a: Motor de referencia (clave de ENGINES)
+        motor_b: Motor candidato (clave de ENGINES)
+
+    Returns:
+        ComparisonReport con tiempos por motor y divergencias campo a campo
+    """
+    motores = {nombre: ENGINES[nombre]() for nombre in (motor_a, motor_b)}
+    reporte = ComparisonReport(motor_a, motor_b, segundos={motor_a: 0.0, motor_b: 0.0})
+
+    for nombre_limpio, ruta_archivo, warehouse in fuentes:
+        resultado_a, error_a, segundos_a = _ejecutar(motores[motor_a], nombre_limpio, ruta_archivo, warehouse)
+        resultado_b, error_b, segundos_b = _ejecutar(motores[motor_b], nombre_limpio, ruta_archivo, warehouse)
+        reporte.segundos[motor_a] += segundos_a
+        reporte.segundos[motor_b] += segundos_b
+        reporte.archivos += 1
+
+        # Un libro que falla en ambos motores por el mismo motivo no es una divergencia
+        if error_a or error_b:
+            if error_a != error_b:
+                reporte.divergencias.append(Divergencia(nombre_limpio, "error", "excepción", error_a, error_b))
+            continue
+
+        if len(resultado_a) != len(resultado_b):
+            reporte.divergencias.append(
+                Divergencia(nombre_limpio, "cantidad de hojas", "len", len(resultado_a), len(resultado_b))
+            )
+
+        for (archivo_a, cajas_a), (archivo_b, cajas_b) in zip(resultado_a, resultado_b):
+            reporte.cajas += len(cajas_a)
+            reporte.divergencias.extend(_comparar_modelos(archivo_a.archivo, "archivo", archivo_a, archivo_b))
+
+            if len(cajas_a) != len(cajas_b):
+                reporte.divergencias.append(
+                    Divergencia(archivo_a.archivo, "cantidad de cajas", "len", len(cajas_a), len(cajas_b))
+                )
+            for i, (caja_a, caja_b) in enumerate(zip(cajas_a, cajas_b), start=1):
+                reporte.divergencias.extend(_comparar_modelos(archivo_a.archivo, f"caja {i}", caja_a, caja_b))
+
+    logger.info("Comparación %s vs %s: %d libros, %d divergencias",
+                motor_a, motor_b, reporte.archivos, len(reporte.divergencias))
+    return reporte
+
+
+def fuentes_de_rutas(rutas: List[str]) -> List[Tuple[str, str, str]]:
+    """Lista (nombre_limpio, ruta_archivo, warehouse) de carpetas o bundles .zip"""
+    fuentes = []
+    for ruta in rutas:
+        excel_files, warehouse = excel_reader(ruta)
+        fuentes.extend((nombre, ruta_archivo, warehouse) for nombre, ruta_archivo in excel_files)
+    return fuentes
@@ -1,14 +1,76 @@
-from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple, Union, BinaryIO, Iterator
 from openpyxl import load_workbook
+import logging
+import multiprocessing
+import os
+import threading
 
 from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
 from src.excel_bigquery.core.domain.models.caja_model import CajaModel
-from src.excel_bigquery.core.use_cases.interfaces.excel_reader import excel_reader
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import excel_reader, abrir_archivo_excel
 from src.excel_bigquery.core.services.caja_processor_service import CajaProcessorService
 from src.config.settings import settings
+from src.infrastructure.profiling.stage_profiler import stage_profiler
+
+logger = logging.getLogger(__name__)
+
+
+def tiene_formato(sheet_obj) -> bool:
+    """True si la hoja tiene el formato de los warehouses: una caja en B2 y semana (T1) o año (A2)"""
+    return bool(str(sheet_obj["B2"].value or "").strip()) and bool(sheet_obj["T1"].value or sheet_obj["A2"].value)
+
+
+def seleccionar_hojas(hojas: List[Tuple[str, object]], activa) -> List[Tuple[Optional[str], object]]:
+    """
+    Hojas de un libro a procesar
+
+    Si más de una hoja tiene el formato se procesan todas ellas, con su título
+    para distinguirlas; si no, solo la hoja activa (título None, mismo
+    id_archivo que los libros de una hoja).
+
+    Args:
+        hojas: Tuplas (título, hoja) de todas las hojas del libro
+        activa: Hoja activa del libro
+
+    Returns:
+        Tuplas (título o None, hoja)
+    """
+    con_formato = [(titulo, hoja) for titulo, hoja in hojas if tiene_formato(hoja)]
+    if len(con_formato) > 1:
+        return con_formato
+    return [(None, activa)]
+
+
+def _puede_paralelizar() -> bool:
+    # Dentro de un proceso del pool (programar, backfill, servidor) los libros ya van en paralelo
+    return multiprocessing.parent_process() is None and _sheet_workers() > 1
+
+
+def _sheet_workers() -> int:
+    return settings.sheet_workers or os.cpu_count() or 1
+
+
+def _procesar_hoja(filas: list, titulo: Optional[str], nombre_limpio: str, warehouse: str,
+                   include_cajas: bool) -> Tuple[ArchivoModel, List[CajaModel]]:
+    """Procesa una hoja (valores ya leídos) en un proceso del pool"""
+    from src.infrastructure.excel.read_only_engine import GridSheet
+
+    return ExcelProcessorService().process_sheets([(titulo, GridSheet(filas))], nombre_limpio, warehouse,
+                                                  include_cajas)[0]
+
+
+def _sin_hojas_validas(errores: List[Exception], resultados: list) -> Optional[Exception]:
+    # Una hoja con error se omite; si fallaron todas, el libro falla como antes
+    return errores[0] if errores and not resultados else None
 
 
 class ExcelProcessorService:
+    # Pool de hojas compartido por todas las instancias: se crea con el primer
+    # libro grande y se reutiliza (crear procesos por libro cuesta más que parsear)
+    _sheet_pool: Optional[ProcessPoolExecutor] = None
+    _sheet_pool_lock = threading.Lock()
 
     def __init__(self):
         self.caja_processor = CajaProcessorService()
@@ -18,22 +80,20 @@ class ExcelProcessorService:
         Procesa todos los archivos Excel en el directorio especificado
 
         Args:
-            path: Ruta del directorio con archivos Excel
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
 
         Returns:
-            Lista de modelos ArchivoModel
+            Lista de modelos ArchivoModel (uno por hoja con el formato)
         """
         excel_files, warehouse = excel_reader(path)
         archivos_models = []
 
         for nombre_limpio, ruta_archivo in excel_files:
             try:
-                archivo_model = self._process_single_file(
-                    nombre_limpio, ruta_archivo, warehouse
-                )
-                archivos_models.append(archivo_model)
+                resultados = self.process_workbook(nombre_limpio, ruta_archivo, warehouse, include_cajas=False)
+                archivos_models.extend(archivo_model for archivo_model, _ in resultados)
             except Exception as e:
-                print(f"Error procesando {nombre_limpio}: {e}")
+                logger.error("Error procesando %s: %s", nombre_limpio, e)
                 continue
 
         return archivos_models
@@ -43,47 +103,178 @@ class ExcelProcessorService:
         Procesa archivos Excel y extrae tanto archivos como cajas
 
         Args:
-            path: Ruta del directorio con archivos Excel
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
 
         Returns:
             Tupla con (lista de ArchivoModel, lista de CajaModel)
         """
-        excel_files, warehouse = excel_reader(path)
         archivos_models = []
         all_cajas = []
 
+        for archivo_model, cajas in self.iter_excel_files_with_cajas(path):
+            archivos_models.append(archivo_model)
+            all_cajas.extend(cajas)
+
+        return archivos_models, all_cajas
+
+    def iter_excel_files_with_cajas(self, path: str) -> Iterator[Tuple[ArchivoModel, List[CajaModel]]]:
+        """
+        Procesa archivos Excel uno a uno, entregando cada archivo con sus cajas
+
+        Permite agregar resultados mientras se parsea sin acumular todas las
+        cajas de la carpeta en memoria.
+
+        Args:
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
+
+        Yields:
+            Tupla (ArchivoModel, lista de CajaModel) por cada hoja válida de cada archivo
+        """
+        excel_files, warehouse = excel_reader(path)
+
         for nombre_limpio, ruta_archivo in excel_files:
             try:
-                # Procesar archivo
-                archivo_model = self._process_single_file(
-                    nombre_limpio, ruta_archivo, warehouse
-                )
-                archivos_models.append(archivo_model)
+                resultados = self.process_workbook(nombre_limpio, ruta_archivo, warehouse)
+            except Exception as e:
+                logger.error("Error procesando %s: %s", nombre_limpio, e)
+                continue
 
-                # Procesar cajas del archivo
-                cajas = self.caja_processor.process_cajas_from_file(archivo_model, ruta_archivo)
-                all_cajas.extend(cajas)
+            yield from resultados
 
+    def process_workbook(self, nombre_limpio: str, ruta_archivo: Union[str, BinaryIO], warehouse: str,
+                         include_cajas: bool = True) -> List[Tuple[ArchivoModel, List[CajaModel]]]:
+        """
+        Procesa un libro Excel (ruta, miembro de zip o stream en memoria)
+
+        El libro se carga una sola vez y la misma hoja sirve para la cabecera y
+        las cajas. Si más de una hoja tiene el formato de los warehouses, cada
+        hoja es un archivo (ver seleccionar_hojas); si no, se procesa la hoja activa.
+
+        Args:
+            nombre_limpio: Nombre limpio del archivo (sin los primeros 3 caracteres)
+            ruta_archivo: Ruta del archivo o stream binario con el contenido
+            warehouse: Tipo de warehouse
+            include_cajas: Si extraer también las cajas
+
+        Returns:
+            Lista de tuplas (ArchivoModel, lista de CajaModel), una por hoja procesada
+        """
+        with stage_profiler.stage("archivo", f"{warehouse}/{nombre_limpio}", ruta_archivo):
+            wb_obj = load_workbook(abrir_archivo_excel(ruta_archivo))
+            hojas = seleccionar_hojas([(ws.title, ws) for ws in wb_obj.worksheets], wb_obj.active)
+
+        return self.process_sheets(hojas, nombre_limpio, warehouse, include_cajas)
+
+    def process_sheets(self, hojas: List[Tuple[Optional[str], object]], nombre_limpio: str, warehouse: str,
+                       include_cajas: bool = True) -> List[Tuple[ArchivoModel, List[CajaModel]]]:
+        """
+        Extrae archivo y cajas de hojas ya abiertas
+
+        Con SHEET_PARALLEL_MIN hojas o más (y fuera de un proceso del pool) las
+        hojas se reparten entre los procesos del pool compartido; cada uno
+        recibe solo los valores del rango que se lee, no el libro. Una hoja con
+        error se registra y se omite; si fallan todas, se lanza el error.
+
+        Args:
+            hojas: Tuplas (título o None si el libro es de una sola hoja, hoja)
+            nombre_limpio: Nombre limpio del archivo
+            warehouse: Tipo de warehouse
+            include_cajas: Si extraer también las cajas
+
+        Returns:
+            Lista de tuplas (ArchivoModel, lista de CajaModel) en el orden de las hojas
+        """
+        if len(hojas) >= settings.sheet_parallel_min and _puede_paralelizar():
+            return self._process_sheets_parallel(hojas, nombre_limpio, warehouse, include_cajas)
+
+        resultados, errores = [], []
+        for titulo, sheet_obj in hojas:
+            try:
+                archivo_model = self._archivo_from_sheet(sheet_obj, nombre_limpio, warehouse, titulo)
             except Exception as e:
-                print(f"Error procesando {nombre_limpio}: {e}")
+                logger.error("Error leyendo la cabecera de %s (hoja %s): %s", nombre_limpio, titulo, e)
+                errores.append(e)
                 continue
+            cajas = []
+            if include_cajas:
+                with stage_profiler.stage("cajas", f"{warehouse}/{nombre_limpio}", hoja=titulo or ""):
+                    try:
+                        cajas = self.caja_processor.process_cajas_from_sheet(sheet_obj, archivo_model)
+                    except Exception as e:
+                        logger.error("Error procesando cajas del archivo %s: %s", archivo_model.archivo, e)
+            resultados.append((archivo_model, cajas))
 
-        return archivos_models, all_cajas
+        error = _sin_hojas_validas(errores, resultados)
+        if error:
+            raise error
+        return resultados
+
+    @classmethod
+    def _pool(cls) -> ProcessPoolExecutor:
+        with cls._sheet_pool_lock:
+            if cls._sheet_pool is None:
+                cls._sheet_pool = ProcessPoolExecutor(max_workers=_sheet_workers())
+            return cls._sheet_pool
+
+    @classmethod
+    def shutdown_pool(cls):
+        """Cierra el pool de hojas (se vuelve a crear con el próximo libro grande)"""
+        with cls._sheet_pool_lock:
+            pool, cls._sheet_pool = cls._sheet_pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def _process_sheets_parallel(self, hojas: List[Tuple[Optional[str], object]], nombre_limpio: str,
+                                 warehouse: str, include_cajas: bool) -> List[Tuple[ArchivoModel, List[CajaModel]]]:
+        from src.infrastructure.excel.read_only_engine import filas_de_hoja
+
+        pool = self._pool()
+        futuros, errores = [], []
+        for titulo, hoja in hojas:
+            try:
+                futuros.append((titulo, pool.submit(_procesar_hoja, filas_de_hoja(hoja), titulo, nombre_limpio,
+                                                    warehouse, include_cajas)))
+            except BrokenProcessPool:
+                self.shutdown_pool()
+                raise
+            except Exception as e:
+                logger.error("Error leyendo la hoja %s de %s: %s", titulo, nombre_limpio, e)
+                errores.append(e)
+
+        resultados = []
+        for titulo, futuro in futuros:
+            try:
+                resultados.append(futuro.result())
+            except BrokenProcessPool:
+                # Un proceso murió (ej. sin memoria): el pool no sirve más, el próximo libro crea otro
+                self.shutdown_pool()
+                raise
+            except Exception as e:
+                logger.error("Error procesando la hoja %s de %s: %s", titulo, nombre_limpio, e)
+                errores.append(e)
+
+        error = _sin_hojas_validas(errores, resultados)
+        if error:
+            raise error
+        return resultados
 
-    def _process_single_file(self, nombre_archivo: str, ruta_archivo: str, warehouse: str) -> ArchivoModel:
+    def _archivo_from_sheet(self, sheet_obj, nombre_archivo: str, warehouse: str,
+                            hoja: Optional[str] = None) -> ArchivoModel:
         """
-        Procesa un archivo Excel individual
+        Arma el ArchivoModel con la cabecera de una hoja ya abierta
 
         Args:
-            nombre_archivo: Nombre limpio del archivo (sin los primeros 3 caracteres)
-            ruta_archivo: Ruta completa del archivo
+            sheet_obj: Hoja de openpyxl (o un objeto con la misma interfaz sheet["A1"].value)
+            nombre_archivo: Nombre limpio del archivo
             warehouse: Tipo de warehouse
+            hoja: Título de la hoja en libros con varias hojas (se agrega al nombre: "archivo#hoja")
 
         Returns:
             Modelo ArchivoModel con los datos extraídos
         """
-        wb_obj = load_workbook(ruta_archivo)
-        sheet_obj = wb_obj.active
+        if hoja is not None:
+            # Distingue id_archivo e id_caja de cada hoja del mismo libro
+            nombre_archivo = f"{nombre_archivo}#{hoja}"
 
         # Extraer datos según las celdas especificadas
         puerto = str(sheet_obj["G1"].value).upper() if sheet_obj["G1"].value else ""
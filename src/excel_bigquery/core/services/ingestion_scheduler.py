@@ -0,0 +1,274 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.config.settings import settings
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import excel_reader, obtener_tamano_archivo
+from src.excel_bigquery.core.services.micro_batch_service import MicroBatchUploader
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+logger = logging.getLogger(__name__)
+
+
+def estimar_memoria(ruta_archivo: str, factor: Optional[float] = None) -> int:
+    """
+    Estima los bytes que ocupa un libro abierto con load_workbook
+
+    El .xlsx está comprimido y openpyxl crea un objeto por celda, así que la
+    memoria crece proporcional al tamaño del archivo (factor configurable).
+    """
+    factor = factor or settings.scheduler_memory_factor
+    return int(obtener_tamano_archivo(ruta_archivo) * factor)
+
+
+def _procesar_tarea(nombre_limpio: str, ruta_archivo: str, warehouse: str):
+    """
+    Procesa un libro en un proceso del pool; los errores se devuelven en lugar de lanzarse
+
+    El resultado viaja como bytes Arrow IPC (ParsedBatch.to_ipc), no como CajaModel.
+    """
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+
+    try:
+        resultados = ExcelProcessorService().process_workbook(nombre_limpio, ruta_archivo, warehouse)
+        return ParsedBatch.from_results(resultados).to_ipc(), None
+    except Exception as e:
+        return None, str(e)
+
+
+@dataclass(order=True)
+class TareaIngesta:
+    # Orden del heap: semanas más nuevas primero, luego orden de llegada
+    prioridad: Tuple[int, int, int]
+    nombre_limpio: str = field(compare=False)
+    ruta_archivo: str = field(compare=False)
+    warehouse: str = field(compare=False)
+    memoria_estimada: int = field(compare=False)
+    clave: str = field(compare=False, default="")
+
+
+class MemoryBudget:
+    """Presupuesto de memoria de los libros que se están procesando"""
+
+    def __init__(self, limite_bytes: int):
+        self.limite = limite_bytes
+        self.en_uso = 0
+
+    def try_acquire(self, cantidad: int) -> bool:
+        # Un libro más grande que el presupuesto se admite solo cuando no hay otros
+        if self.en_uso and self.en_uso + cantidad > self.limite:
+            return False
+        self.en_uso += cantidad
+        return True
+
+    def release(self, cantidad: int):
+        self.en_uso = max(0, self.en_uso - cantidad)
+
+
+class IngestionScheduler:
+    """
+    Planificador de procesamiento y carga con control de admisión
+
+    Los libros de todas las carpetas agregadas se ordenan por semana (las más
+    nuevas primero) y se envían al pool de procesos mientras entren en el
+    presupuesto de memoria (tamaño del archivo x factor). Los resultados van a
+    un MicroBatchUploader; si hay demasiadas cajas esperando carga se deja de
+    admitir libros. Cada job que modifica una tabla pasa por el límite de jobs
+    por tabla (job_rate_limiter), así no se reciben errores de cuota.
+
+    Con leases (FileLeaseQueue) varias máquinas que montan las mismas carpetas
+    se reparten los libros: cada nodo procesa solo los que logra tomar, marca
+    como cargados los de cada lote subido y, al terminar los suyos, espera los
+    que tienen otros nodos para tomarlos si su lease vence (nodo caído).
+    """
+
+    def __init__(self, upload_service=None, workers: Optional[int] = None, memory_mb: Optional[int] = None,
+                 check_duplicates: bool = True, batcher: Optional[MicroBatchUploader] = None,
+                 leases=None):
+        if batcher is None:
+            if upload_service is None:
+                from src.excel_bigquery.core.services.upload_service import UploadService
+                upload_service = UploadService()
+            batcher = MicroBatchUploader(upload_service, check_duplicates=check_duplicates)
+
+        self.batcher = batcher
+        self.workers = workers or settings.ingest_workers
+        self.budget = MemoryBudget((memory_mb or settings.scheduler_memory_mb) * 1024 * 1024)
+        self._cola: List[TareaIngesta] = []
+        self._secuencia = itertools.count()
+
+        self.procesados = 0
+        self.errores: List[str] = []
+
+        self.leases = leases
+        self.de_otros_nodos = 0
+        self._ajenas: List[TareaIngesta] = []
+        self._proxima_revision = 0.0
+        self._fps_por_clave: Dict[str, List[int]] = {}
+        self._perdidas = set()
+        self._lock = threading.Lock()
+        if leases is not None:
+            self.batcher.al_cargar = self._lote_cargado
+            leases.al_perder = self._lease_perdido
+
+    def add_path(self, path: str) -> int:
+        """
+        Agrega los libros de una carpeta (o bundle .zip) a la cola
+
+        Args:
+            path: Ruta de la carpeta del warehouse
+
+        Returns:
+            Cantidad de libros encolados
+        """
+        from src.excel_bigquery.core.services.backfill_service import leer_cabecera
+        from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+
+        excel_files, warehouse = excel_reader(path)
+        processor = ExcelProcessorService()
+
+        for nombre_limpio, ruta_archivo in excel_files:
+            try:
+                annio, semana = leer_cabecera(ruta_archivo, processor)
+            except Exception as e:
+                logger.warning(f"No se pudo leer la cabecera de {nombre_limpio}: {e}")
+                annio, semana = 0, 0
+
+            try:
+                memoria = estimar_memoria(ruta_archivo)
+            except Exception as e:
+                # Sin estimación se reserva todo el presupuesto: el libro se procesa solo
+                logger.warning(f"No se pudo estimar la memoria de {nombre_limpio}: {e}")
+                memoria = self.budget.limite
+
+            heapq.heappush(self._cola, TareaIngesta(
+                (-annio, -semana, next(self._secuencia)), nombre_limpio, ruta_archivo, warehouse, memoria,
+                self.leases.clave(warehouse, nombre_limpio) if self.leases else ""
+            ))
+
+        logger.info(f"Encolados {len(excel_files)} libros de {warehouse}")
+        return len(excel_files)
+
+    def _batcher_saturado(self) -> bool:
+        return self.batcher.pending()["cajas"] >= 2 * self.batcher.max_cajas
+
+    def run(self) -> dict:
+        """
+        Procesa y carga todos los libros encolados
+
+        Returns:
+            Diccionario con procesados, errores, lotes y segundos
+        """
+        inicio = time.perf_counter()
+        self.batcher.start()
+        if self.leases:
+            self.leases.start()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                en_curso = {}
+
+                while self._cola or en_curso or self._ajenas:
+                    if self._ajenas and time.monotonic() >= self._proxima_revision:
+                        self._revisar_ajenas()
+
+                    # Admitir en orden de prioridad mientras haya memoria (sin saltarse al primero)
+                    while (self._cola and len(en_curso) < self.workers and not self._batcher_saturado()
+                           and self.budget.try_acquire(self._cola[0].memoria_estimada)):
+                        tarea = heapq.heappop(self._cola)
+                        if not self._tomar(tarea):
+                            self.budget.release(tarea.memoria_estimada)
+                            continue
+                        futuro = pool.submit(_procesar_tarea, tarea.nombre_limpio, tarea.ruta_archivo, tarea.warehouse)
+                        en_curso[futuro] = tarea
+
+                    if not en_curso:
+                        # Lote pendiente saturado o solo quedan libros de otros nodos: esperar
+                        time.sleep(0.5)
+                        continue
+
+                    terminados, _ = wait(en_curso, timeout=1.0, return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        tarea = en_curso.pop(futuro)
+                        self.budget.release(tarea.memoria_estimada)
+                        self._recibir(tarea, *futuro.result())
+        finally:
+            self.batcher.stop()
+            if self.leases:
+                self.leases.stop()
+
+        return {
+            "procesados": self.procesados,
+            "de_otros_nodos": self.de_otros_nodos,
+            "errores": self.errores,
+            "lotes_subidos": self.batcher.lotes_subidos,
+            "lotes_fallidos": self.batcher.lotes_fallidos,
+            "segundos": round(time.perf_counter() - inicio, 1),
+        }
+
+    def _recibir(self, tarea: TareaIngesta, resultado: Optional[Tuple[bytes, bytes]], error: Optional[str]):
+        if error:
+            logger.error(f"Error procesando {tarea.nombre_limpio}: {error}")
+            self.errores.append(tarea.nombre_limpio)
+            if self.leases:
+                # Sin marcador: otro nodo puede intentarlo
+                self.leases.release(tarea.clave)
+            return
+
+        batch = ParsedBatch.from_ipc(resultado)
+        if self.leases:
+            with self._lock:
+                if tarea.clave in self._perdidas:
+                    logger.warning(f"{tarea.nombre_limpio} lo tomó otro nodo, no se carga")
+                    return
+                self._fps_por_clave[tarea.clave] = batch.fps_archivos()
+
+        self.procesados += 1
+        self.batcher.add_batch(batch)
+
+    def _tomar(self, tarea: TareaIngesta) -> bool:
+        """True si el libro se procesa en este nodo (siempre, sin leases)"""
+        if not self.leases or self.leases.claim(tarea.clave, tarea.nombre_limpio):
+            return True
+        if self.leases.is_done(tarea.clave):
+            self.de_otros_nodos += 1
+        else:
+            self._ajenas.append(tarea)
+        return False
+
+    def _revisar_ajenas(self):
+        """Vuelve a encolar los libros de otros nodos que no terminaron (se toman si su lease venció)"""
+        ajenas, self._ajenas = self._ajenas, []
+        for tarea in ajenas:
+            if self.leases.is_done(tarea.clave):
+                self.de_otros_nodos += 1
+            else:
+                heapq.heappush(self._cola, tarea)
+        self._proxima_revision = time.monotonic() + self.leases.heartbeat
+
+    def _lote_cargado(self, batch: ParsedBatch, exito: bool):
+        """Marca como cargados (o libera si falló) los libros del lote"""
+        fps = set(batch.fps_archivos())
+        with self._lock:
+            claves = [clave for clave, fps_clave in self._fps_por_clave.items() if fps.intersection(fps_clave)]
+            for clave in claves:
+                del self._fps_por_clave[clave]
+
+        for clave in claves:
+            if exito:
+                self.leases.complete(clave)
+            else:
+                self.leases.release(clave)
+
+    def _lease_perdido(self, clave: str):
+        # Otro nodo tomó el libro: no se carga desde este nodo
+        with self._lock:
+            self._perdidas.add(clave)
+            fps = self._fps_por_clave.pop(clave, [])
+        if fps:
+            self.batcher.discard(fps)
@@ -0,0 +1,380 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.config.settings import settings
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatchUploader:
+    """
+    Acumula archivos y cajas ya procesados y los sube a BigQuery en lotes
+
+    Un lote se carga cuando supera el máximo de archivos o de cajas, o cuando
+    el archivo más antiguo del lote lleva más de max_seconds esperando. Así una
+    ráfaga de libros termina en pocos load jobs en vez de uno por archivo. Lo
+    pendiente se guarda en formato columnar (ParsedBatch) y se sube con
+    upload_service.upload_batch. Con LOAD_CONSOLIDATE=true cada lote va a la
+    ventana de carga consolidada y al_cargar se llama cuando se carga esa
+    ventana.
+
+    Un lote que no se pudo cargar vuelve al pendiente y se reintenta con
+    espera exponencial (hasta BATCH_RETRY_MAX_SECONDS). Si al detenerse
+    todavía no se cargó, se guarda en BATCH_SPOOL_PATH y la próxima ejecución
+    lo vuelve a tomar al iniciar. La carpeta de un lote recuperado se borra
+    recién cuando sus archivos se cargan; si el proceso que la tomó muere, otra
+    ejecución la reclama pasados BATCH_SPOOL_STALE_SECONDS.
+    """
+
+    def __init__(self, upload_service, max_archivos: Optional[int] = None,
+                 max_cajas: Optional[int] = None, max_seconds: Optional[float] = None,
+                 check_duplicates: bool = True,
+                 al_cargar: Optional[Callable[[ParsedBatch, bool], None]] = None,
+                 spool_path: Optional[str] = None):
+        self.upload_service = upload_service
+        self.max_archivos = max_archivos or settings.batch_max_archivos
+        self.max_cajas = max_cajas or settings.batch_max_cajas
+        self.max_seconds = max_seconds or settings.batch_max_seconds
+        self.check_duplicates = check_duplicates
+        self.consolidated_load = getattr(upload_service, "consolidated_load", None)
+        # Se llama con (lote, exito) después de cada carga (ej. para marcar los libros como cargados)
+        self.al_cargar = al_cargar
+        self.spool_path = settings.batch_spool_path if spool_path is None else spool_path
+
+        self._lotes: List[ParsedBatch] = []
+        self._num_archivos = 0
+        self._num_cajas = 0
+        self._fps_pendientes = set()
+        self._inicio_lote: Optional[float] = None
+        # Reintentos seguidos del lote pendiente y cuándo se puede volver a intentar
+        self._reintentos = 0
+        self._proximo_intento = 0.0
+        # Carpetas del spool tomadas por este proceso y los fp_archivo que faltan cargar de cada una
+        self._spool_tomado: Dict[str, Set[int]] = {}
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+        self.lotes_subidos = 0
+        self.lotes_fallidos = 0
+        self.ultimo_flush: Optional[float] = None
+
+    def start(self):
+        """Inicia el hilo que carga los lotes por tiempo o tamaño"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._recuperar_spool()
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._loop, name="micro-batch-uploader", daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        """Detiene el hilo y carga lo que quede pendiente"""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+        try:
+            cargado = self.flush()
+        except Exception as e:
+            logger.error(f"Error inesperado cargando lote al detener: {e}")
+            cargado = False
+        if not cargado:
+            self._guardar_spool()
+        if self.consolidated_load is not None:
+            try:
+                self.consolidated_load.flush()
+            except Exception as e:
+                logger.error(f"Error cargando la ventana consolidada al detener: {e}")
+
+    def add(self, archivo: ArchivoModel, cajas: List[CajaModel]):
+        """
+        Agrega un archivo procesado (y sus cajas) al lote actual
+
+        Args:
+            archivo: Modelo del archivo
+            cajas: Cajas extraídas del archivo
+        """
+        self.add_batch(ParsedBatch.from_models([archivo], cajas))
+
+    def add_batch(self, batch: ParsedBatch):
+        """
+        Agrega archivos ya en formato columnar (ej. el resultado de un proceso del pool)
+
+        Args:
+            batch: Archivos y cajas en tablas Arrow
+        """
+        with self._lock:
+            # Un mismo archivo subido dos veces dentro del lote se carga una sola vez
+            repetidos = [fp for fp in batch.fps_archivos() if fp in self._fps_pendientes]
+            if repetidos:
+                logger.info(f"{len(repetidos)} archivos ya están en el lote pendiente, se ignoran")
+                batch = batch.exclude_archivos(repetidos)
+            if not batch.num_archivos:
+                return
+
+            if self._inicio_lote is None:
+                self._inicio_lote = time.monotonic()
+            self._fps_pendientes.update(batch.fps_archivos())
+            self._lotes.append(batch)
+            self._num_archivos += batch.num_archivos
+            self._num_cajas += batch.num_cajas
+
+            lleno = self._num_archivos >= self.max_archivos or self._num_cajas >= self.max_cajas
+
+        if lleno:
+            self._despertar.set()
+
+    def discard(self, fps: Iterable[int]) -> int:
+        """
+        Quita del lote pendiente los archivos (y sus cajas) cuyos fp_archivo están en fps
+
+        Returns:
+            Cantidad de archivos quitados
+        """
+        fps = set(fps)
+        with self._lock:
+            fps &= self._fps_pendientes
+            if not fps:
+                return 0
+            self._lotes = [lote.exclude_archivos(fps) for lote in self._lotes]
+            self._fps_pendientes -= fps
+            self._num_archivos = sum(lote.num_archivos for lote in self._lotes)
+            self._num_cajas = sum(lote.num_cajas for lote in self._lotes)
+        self._liberar_spool(fps)
+        return len(fps)
+
+    def pending(self) -> dict:
+        """Retorna el tamaño del lote pendiente"""
+        with self._lock:
+            edad = time.monotonic() - self._inicio_lote if self._inicio_lote is not None else 0.0
+            return {
+                "archivos": self._num_archivos,
+                "cajas": self._num_cajas,
+                "edad_lote_s": round(edad, 1),
+                "reintentos": self._reintentos,
+                "proximo_intento_s": round(max(0.0, self._proximo_intento - time.monotonic()), 1)
+            }
+
+    def flush(self) -> bool:
+        """
+        Sube el lote pendiente a BigQuery
+
+        Returns:
+            True si no había nada pendiente o la carga fue exitosa
+        """
+        with self._flush_lock:
+            with self._lock:
+                lotes = self._lotes
+                self._lotes, self._num_archivos, self._num_cajas = [], 0, 0
+                self._fps_pendientes = set()
+                self._inicio_lote = None
+
+            if not lotes:
+                return True
+
+            batch = ParsedBatch.concat(lotes)
+            try:
+                if self.consolidated_load is not None:
+                    # al_cargar se llama cuando se carga la ventana del lote
+                    exito = self.consolidated_load.stage(batch, check_duplicates=self.check_duplicates,
+                                                         al_cargar=self._al_cargar_ventana)
+                else:
+                    logger.info(f"Cargando lote de {batch.num_archivos} archivos y {batch.num_cajas} cajas")
+                    exito = self.upload_service.upload_batch(
+                        batch, check_duplicates=self.check_duplicates, include_cajas=True
+                    )
+            except Exception as e:
+                logger.error(f"Error inesperado cargando lote: {e}")
+                exito = False
+            self.ultimo_flush = time.time()
+
+            if not exito:
+                self.lotes_fallidos += 1
+                self._reencolar(batch)
+                return False
+
+            self.lotes_subidos += 1
+            with self._lock:
+                self._reintentos = 0
+                self._proximo_intento = 0.0
+            if self.consolidated_load is None:
+                self._liberar_spool(batch.fps_archivos())
+                if self.al_cargar:
+                    self.al_cargar(batch, True)
+            return True
+
+    def _al_cargar_ventana(self, batch: ParsedBatch, exito: bool):
+        """Se llama cuando se carga la ventana consolidada que contiene el lote"""
+        if exito:
+            self._liberar_spool(batch.fps_archivos())
+        if self.al_cargar:
+            self.al_cargar(batch, exito)
+
+    def _reencolar(self, batch: ParsedBatch):
+        """Devuelve un lote fallido al pendiente y programa el reintento con espera exponencial"""
+        with self._lock:
+            # Si el mismo archivo llegó de nuevo mientras se cargaba, queda la versión nueva
+            batch = batch.exclude_archivos(self._fps_pendientes)
+            self._lotes.insert(0, batch)
+            self._fps_pendientes.update(batch.fps_archivos())
+            self._num_archivos += batch.num_archivos
+            self._num_cajas += batch.num_cajas
+            self._inicio_lote = self._inicio_lote if self._inicio_lote is not None else time.monotonic()
+
+            self._reintentos += 1
+            espera = min(self.max_seconds * 2 ** (self._reintentos - 1), settings.batch_retry_max_seconds)
+            self._proximo_intento = time.monotonic() + espera
+
+        logger.error(f"Error cargando lote de {batch.num_archivos} archivos (intento {self._reintentos}, "
+                     f"se reintenta en {espera:.0f}s): {', '.join(batch.nombres_archivos())}")
+
+    def _guardar_spool(self):
+        """Guarda en disco lo que no se pudo cargar antes de detenerse"""
+        with self._lock:
+            lotes = self._lotes
+            self._lotes, self._num_archivos, self._num_cajas = [], 0, 0
+            self._fps_pendientes = set()
+            self._inicio_lote = None
+        if not lotes:
+            return
+
+        batch = ParsedBatch.concat(lotes)
+        if self.spool_path:
+            nombre = f"{time.time_ns()}_{uuid.uuid4().hex[:8]}"
+            temporal = os.path.join(self.spool_path, f".{nombre}.tmp")
+            try:
+                # Se escribe con otro nombre y se renombra al terminar: nunca se toma un lote a medio escribir
+                batch.write_parquet(temporal)
+                os.rename(temporal, os.path.join(self.spool_path, nombre))
+                logger.error(f"{batch.num_archivos} archivos sin cargar guardados en {self.spool_path}: "
+                             f"se reintentan en la próxima ejecución")
+                # Lo recuperado que seguía pendiente ya quedó en el lote nuevo
+                self._liberar_spool(batch.fps_archivos())
+            except Exception as e:
+                shutil.rmtree(temporal, ignore_errors=True)
+                logger.error(f"No se pudo guardar el lote sin cargar en {self.spool_path}: {e}. "
+                             f"Archivos perdidos: {', '.join(batch.nombres_archivos())}")
+        else:
+            logger.error(f"Archivos sin cargar (BATCH_SPOOL_PATH vacío): {', '.join(batch.nombres_archivos())}")
+
+        if self.al_cargar:
+            self.al_cargar(batch, False)
+
+    def _recuperar_spool(self):
+        """Agrega al pendiente los lotes que una ejecución anterior no pudo cargar"""
+        if not self.spool_path or not os.path.isdir(self.spool_path):
+            return
+        self._reclamar_spool_vencido()
+
+        for nombre in sorted(os.listdir(self.spool_path)):
+            if nombre.startswith(".") or nombre.endswith(".tomado"):
+                continue
+            # El rename reserva el lote: si otro proceso comparte la carpeta, solo uno lo toma
+            tomado = os.path.join(self.spool_path, f"{nombre}.{os.getpid()}.tomado")
+            try:
+                os.rename(os.path.join(self.spool_path, nombre), tomado)
+                os.utime(tomado)
+                batch = ParsedBatch.read_parquet(tomado)
+            except (FileNotFoundError, OSError) as e:
+                logger.warning(f"No se pudo tomar el lote guardado {nombre}: {e}")
+                continue
+            except Exception as e:
+                logger.error(f"Lote guardado ilegible {nombre}: {e}")
+                continue
+
+            # La carpeta queda hasta que sus archivos se carguen (_liberar_spool)
+            with self._lock:
+                self._spool_tomado[tomado] = set(batch.fps_archivos())
+            self.add_batch(batch)
+            logger.info(f"Recuperados {batch.num_archivos} archivos sin cargar de {self.spool_path}")
+
+    def _reclamar_spool_vencido(self):
+        """
+        Devuelve al spool los lotes tomados por un proceso que dejó de tocarlos hace
+        más de BATCH_SPOOL_STALE_SECONDS y borra las escrituras que quedaron a medias
+        """
+        limite = time.time() - settings.batch_spool_stale_seconds
+        for nombre in os.listdir(self.spool_path):
+            ruta = os.path.join(self.spool_path, nombre)
+            tomado = nombre.endswith(".tomado")
+            if not tomado and not (nombre.startswith(".") and nombre.endswith(".tmp")):
+                continue
+            with self._lock:
+                propio = ruta in self._spool_tomado
+            try:
+                if propio or os.path.getmtime(ruta) > limite:
+                    continue
+                if tomado:
+                    os.rename(ruta, os.path.join(self.spool_path, nombre.rsplit(".", 2)[0]))
+                    logger.warning(f"Lote guardado {nombre} abandonado; vuelve al spool")
+                else:
+                    shutil.rmtree(ruta)
+                    logger.warning(f"Lote guardado a medio escribir {nombre} descartado")
+            except OSError as e:
+                # Otro proceso lo reclamó al mismo tiempo
+                logger.debug(f"No se pudo reclamar {nombre}: {e}")
+
+    def _tocar_spool(self):
+        """Renueva la fecha de las carpetas tomadas para que otro proceso no las reclame"""
+        with self._lock:
+            tomados = list(self._spool_tomado)
+        for tomado in tomados:
+            try:
+                os.utime(tomado)
+            except OSError as e:
+                logger.warning(f"No se pudo renovar el lote guardado {tomado}: {e}")
+
+    def _liberar_spool(self, fps: Iterable[int]):
+        """Borra las carpetas del spool cuyos archivos ya se cargaron (o ya no hacen falta)"""
+        fps = set(fps)
+        with self._lock:
+            if not self._spool_tomado:
+                return
+            liberados = []
+            for tomado, pendientes in self._spool_tomado.items():
+                pendientes -= fps
+                if not pendientes:
+                    liberados.append(tomado)
+            for tomado in liberados:
+                del self._spool_tomado[tomado]
+        for tomado in liberados:
+            shutil.rmtree(tomado, ignore_errors=True)
+
+    def _loop(self):
+        """Revisa periódicamente si el lote debe cargarse"""
+        while not self._detener.is_set():
+            self._despertar.wait(timeout=1.0)
+            self._despertar.clear()
+            self._tocar_spool()
+
+            with self._lock:
+                ahora = time.monotonic()
+                vencido = (self._inicio_lote is not None and
+                           ahora - self._inicio_lote >= self.max_seconds)
+                lleno = self._num_archivos >= self.max_archivos or self._num_cajas >= self.max_cajas
+                en_espera = ahora < self._proximo_intento
+
+            if (vencido or lleno) and not en_espera:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Error inesperado cargando lote: {e}")
+
+            if self.consolidated_load is not None and self.consolidated_load.due():
+                try:
+                    self.consolidated_load.flush()
+                except Exception as e:
+                    logger.error(f"Error inesperado cargando la ventana consolidada: {e}")
@@ -0,0 +1,153 @@
+from typing import Dict, List, Iterable, Tuple, Optional
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+
+METRICAS = ("total_cajas", "total_dedos", "peso_total_kg", "total_uw", "total_ow")
+
+
+class WeeklyRollup:
+    """
+    Agregados por archivo y por warehouse/año/semana/hacienda calculados en una pasada
+
+    Se alimenta archivo por archivo mientras se parsea. Los agregados se guardan
+    por (archivo, hacienda), así que después de la verificación de duplicados se
+    pueden obtener los totales solo de los archivos que se subieron: file_totals
+    son las filas que se guardan en T3_TOTALES_ARCHIVO y de ahí se recalcula
+    T3_RESUMEN_SEMANAL.
+    """
+
+    def __init__(self):
+        self._archivos: Dict[int, ArchivoModel] = {}
+        # (fp_archivo, nombre_hacienda) -> [total_cajas, total_dedos, peso_total_kg, total_uw, total_ow]
+        self._por_archivo_hacienda: Dict[Tuple[int, str], list] = {}
+
+    def add(self, archivo: ArchivoModel, cajas: List[CajaModel]):
+        """
+        Agrega los totales de un archivo y sus cajas
+
+        Args:
+            archivo: Modelo del archivo
+            cajas: Cajas del archivo
+        """
+        self._archivos[archivo.fp_archivo] = archivo
+
+        for caja in cajas:
+            clave = (caja.fp_archivo, caja.nombre_hacienda)
+            acumulado = self._por_archivo_hacienda.get(clave)
+            if acumulado is None:
+                acumulado = self._por_archivo_hacienda[clave] = [0, 0, 0.0, 0, 0]
+
+            acumulado[0] += 1
+            acumulado[1] += caja.dedos_totales
+            acumulado[2] += caja.peso_total_kg
+            acumulado[3] += caja.uw
+            acumulado[4] += caja.ow
+
+    @classmethod
+    def from_models(cls, archivos: List[ArchivoModel], cajas: List[CajaModel]) -> "WeeklyRollup":
+        """Construye el rollup a partir de listas ya procesadas (una pasada sobre las cajas)"""
+        rollup = cls()
+        for archivo in archivos:
+            rollup._archivos[archivo.fp_archivo] = archivo
+        for caja in cajas:
+            if caja.fp_archivo in rollup._archivos:
+                rollup.add(rollup._archivos[caja.fp_archivo], [caja])
+        return rollup
+
+    @classmethod
+    def from_batch(cls, batch) -> "WeeklyRollup":
+        """
+        Construye el rollup a partir de un ParsedBatch (agregación columnar, sin CajaModel)
+
+        Args:
+            batch: ParsedBatch con archivos y cajas
+        """
+        rollup = cls()
+        for archivo in batch.archivo_models():
+            rollup._archivos[archivo.fp_archivo] = archivo
+
+        if not batch.num_cajas:
+            return rollup
+
+        agrupado = batch.cajas.group_by(["fp_archivo", "nombre_hacienda"]).aggregate([
+            ("fp_caja", "count"),
+            ("dedos_totales", "sum"),
+            ("peso_total_kg", "sum"),
+            ("uw", "sum"),
+            ("ow", "sum"),
+        ])
+        for fila in agrupado.to_pylist():
+            if fila["fp_archivo"] not in rollup._archivos:
+                continue
+            rollup._por_archivo_hacienda[(fila["fp_archivo"], fila["nombre_hacienda"])] = [
+                fila["fp_caja_count"],
+                fila["dedos_totales_sum"] or 0,
+                fila["peso_total_kg_sum"] or 0.0,
+                fila["uw_sum"] or 0,
+                fila["ow_sum"] or 0,
+            ]
+        return rollup
+
+    def file_totals(self, fps_archivos: Optional[Iterable[int]] = None) -> List[dict]:
+        """
+        Totales por archivo y hacienda (las filas de T3_TOTALES_ARCHIVO)
+
+        Args:
+            fps_archivos: Limitar a estos fingerprints de archivo (None = todos)
+
+        Returns:
+            Lista de diccionarios con fp_archivo, warehouse, annio, semana,
+            nombre_hacienda y las métricas
+        """
+        permitidos = set(fps_archivos) if fps_archivos is not None else None
+        filas = []
+
+        for (fp_archivo, nombre_hacienda), valores in self._por_archivo_hacienda.items():
+            if permitidos is not None and fp_archivo not in permitidos:
+                continue
+            archivo = self._archivos[fp_archivo]
+            filas.append({
+                "fp_archivo": fp_archivo,
+                "warehouse": archivo.warehouse,
+                "annio": archivo.annio,
+                "semana": archivo.semana,
+                "nombre_hacienda": nombre_hacienda,
+                **dict(zip(METRICAS, valores))
+            })
+
+        return filas
+
+    def weekly_rows(self, fps_archivos: Optional[Iterable[int]] = None) -> List[dict]:
+        """
+        Filas del rollup semanal (warehouse, annio, semana, nombre_hacienda + métricas)
+
+        Args:
+            fps_archivos: Limitar a estos fingerprints de archivo (ej. los que se subieron)
+
+        Returns:
+            Lista de diccionarios, una fila por warehouse/año/semana/hacienda
+        """
+        permitidos = set(fps_archivos) if fps_archivos is not None else None
+        semanas: Dict[tuple, list] = {}
+
+        for (fp_archivo, nombre_hacienda), valores in self._por_archivo_hacienda.items():
+            if permitidos is not None and fp_archivo not in permitidos:
+                continue
+
+            archivo = self._archivos[fp_archivo]
+            clave = (archivo.warehouse, archivo.annio, archivo.semana, nombre_hacienda)
+            acumulado = semanas.setdefault(clave, [0, 0, 0.0, 0, 0])
+            for i, valor in enumerate(valores):
+                acumulado[i] += valor
+
+        return [
+            {
+                "warehouse": warehouse,
+                "annio": annio,
+                "semana": semana,
+                "nombre_hacienda": nombre_hacienda,
+                **dict(zip(METRICAS, valores))
+            }
+            for (warehouse, annio, semana, nombre_hacienda), valores in semanas.items()
+        ]
@@ -0,0 +1,115 @@
+from collections import Counter
+from typing import List, Optional
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class ProcessingSummaryAggregator:
+    """
+    Resumen de procesamiento incremental
+
+    Se actualiza archivo por archivo mientras se parsea, en una sola pasada por
+    caja, y no guarda los CajaModel: solo contadores, los detalles por archivo y
+    un histograma de pesos promedio (ya redondeados a 2 decimales) para calcular
+    mínimo, máximo y percentiles exactos. La memoria depende de la cantidad de
+    archivos y de pesos distintos, no de la cantidad de cajas.
+    """
+
+    def __init__(self, include_cajas: bool = True):
+        self.include_cajas = include_cajas
+
+        self.total_files = 0
+        self.warehouses = set()
+        self.years = set()
+        self.files_detail: List[dict] = []
+
+        self.total_cajas = 0
+        self.total_dedos = 0
+        self.peso_total_kg = 0
+        self.suma_peso_promedio = 0
+        self.total_uw = 0
+        self.total_ow = 0
+        self._histograma_pesos = Counter()
+
+    def add(self, archivo: ArchivoModel, cajas: Optional[List[CajaModel]] = None):
+        """
+        Agrega un archivo (y sus cajas) al resumen
+
+        Args:
+            archivo: Modelo del archivo
+            cajas: Cajas del archivo (ignoradas si include_cajas es False)
+        """
+        self.total_files += 1
+        self.warehouses.add(archivo.warehouse)
+        self.years.add(archivo.annio)
+
+        detalle = {
+            "archivo": archivo.archivo,
+            "warehouse": archivo.warehouse,
+            "puerto": archivo.puerto,
+            "buque": archivo.buque,
+            "annio": archivo.annio,
+            "semana": archivo.semana
+        }
+
+        if self.include_cajas:
+            cajas = cajas or []
+            detalle["cajas_count"] = len(cajas)
+
+            for caja in cajas:
+                self.total_dedos += caja.dedos_totales
+                self.peso_total_kg += caja.peso_total_kg
+                self.suma_peso_promedio += caja.peso_promedio
+                self.total_uw += caja.uw
+                self.total_ow += caja.ow
+                self._histograma_pesos[caja.peso_promedio] += 1
+
+            self.total_cajas += len(cajas)
+
+        self.files_detail.append(detalle)
+
+    def percentiles(self) -> dict:
+        """Percentiles (rango más cercano) del peso promedio por caja"""
+        if not self.total_cajas:
+            return {f"p{p}": 0 for p in PERCENTILES}
+
+        pesos = sorted(self._histograma_pesos.items())
+        resultado = {}
+        for p in PERCENTILES:
+            # Rango más cercano: la menor posición k con k >= p% de las cajas
+            objetivo = max(1, -(-p * self.total_cajas // 100))
+            acumulado = 0
+            for peso, cantidad in pesos:
+                acumulado += cantidad
+                if acumulado >= objetivo:
+                    resultado[f"p{p}"] = peso
+                    break
+        return resultado
+
+    def to_dict(self) -> dict:
+        """Retorna el resumen con el mismo formato que UploadService.get_processing_summary"""
+        resumen = {
+            "total_files": self.total_files,
+            "warehouses": list(self.warehouses),
+            "years": list(self.years),
+            "files_detail": self.files_detail
+        }
+
+        if not self.include_cajas:
+            return resumen
+
+        resumen["total_cajas"] = self.total_cajas
+        resumen["cajas_summary"] = {
+            "total_dedos": self.total_dedos,
+            "peso_total_kg": self.peso_total_kg,
+            "promedio_peso_caja": self.suma_peso_promedio / self.total_cajas if self.total_cajas else 0,
+            "total_uw": self.total_uw,
+            "total_ow": self.total_ow,
+            "peso_promedio_min": min(self._histograma_pesos) if self._histograma_pesos else 0,
+            "peso_promedio_max": max(self._histograma_pesos) if self._histograma_pesos else 0,
+            "peso_promedio_percentiles": self.percentiles()
+        }
+        return resumen
@@ -1,9 +1,17 @@
 import logging
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
+from src.config.settings import settings
+from src.excel_bigquery.core.services.consolidated_load_service import ConsolidatedLoadService
+from src.excel_bigquery.core.services.data_quality_service import DataQualityService
 from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+from src.excel_bigquery.core.services.rollup_service import WeeklyRollup
+from src.excel_bigquery.core.services.summary_aggregator import ProcessingSummaryAggregator
 from src.infrastructure.bigquery.bigquery_client import BigQueryClient
 from src.infrastructure.bigquery.caja_bigquery_client import CajaBigQueryClient
+from src.infrastructure.bigquery.rollup_bigquery_client import RollupBigQueryClient
+from src.infrastructure.local_store.parquet_store import LocalParquetStore
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
 from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
 from src.excel_bigquery.core.domain.models.caja_model import CajaModel
 
@@ -15,16 +23,23 @@ class UploadService:
         self.excel_processor = ExcelProcessorService()
         self.bigquery_client = BigQueryClient()
         self.caja_bigquery_client = CajaBigQueryClient()
+        self.rollup_client = RollupBigQueryClient(self.bigquery_client.client)
+        self.local_store = LocalParquetStore()
+        self.data_quality = DataQualityService()
+        # Con LOAD_CONSOLIDATE=true los lotes esperan en Parquet local y se cargan por ventana (flush_loads)
+        self.consolidated_load = ConsolidatedLoadService(self) if settings.load_consolidate else None
 
     def process_and_upload_excel_files(self, path: str, check_duplicates: bool = True,
-                                       include_cajas: bool = True) -> bool:
+                                       include_cajas: bool = True, diferir_carga: bool = False) -> bool:
         """
         Procesa archivos Excel y los sube a BigQuery (incluyendo cajas si está habilitado)
 
         Args:
-            path: Ruta del directorio con archivos Excel
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
             check_duplicates: Si verificar duplicados antes de subir
             include_cajas: Si procesar y subir también las cajas
+            diferir_carga: Con LOAD_CONSOLIDATE=true, dejar los archivos en la ventana
+                abierta sin cargarla (el llamador hace flush_loads al final)
 
         Returns:
             True si el proceso fue exitoso
@@ -32,20 +47,69 @@ class UploadService:
         try:
             logger.info(f"Iniciando procesamiento de archivos en: {path}")
 
-            if include_cajas:
-                # Procesar archivos y cajas
-                archivos, cajas = self.excel_processor.process_excel_files_with_cajas(path)
-                logger.info(f"Procesados {len(archivos)} archivos y {len(cajas)} cajas")
-            else:
-                # Solo procesar archivos
-                archivos = self.excel_processor.process_excel_files(path)
-                cajas = []
-                logger.info(f"Procesados {len(archivos)} archivos")
-
+            archivos, cajas, rollup = self.parse_path(path, include_cajas)
             if not archivos:
                 logger.warning("No se encontraron archivos para procesar")
                 return False
 
+            exito = self.upload_models(archivos, cajas, check_duplicates, include_cajas, rollup)
+            if exito and not diferir_carga:
+                exito = self.flush_loads()
+            return exito
+
+        except Exception as e:
+            logger.error(f"Error en el proceso: {e}")
+            return False
+
+    def parse_path(self, path: str, include_cajas: bool = True
+                   ) -> Tuple[List[ArchivoModel], List[CajaModel], Optional[WeeklyRollup]]:
+        """
+        Procesa los libros de un directorio o bundle
+
+        Args:
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
+            include_cajas: Si procesar también las cajas
+
+        Returns:
+            Tupla (archivos, cajas, rollup semanal acumulado en la misma pasada o None sin cajas)
+        """
+        if not include_cajas:
+            archivos = self.excel_processor.process_excel_files(path)
+            logger.info(f"Procesados {len(archivos)} archivos")
+            return archivos, [], None
+
+        archivos, cajas = [], []
+        rollup = WeeklyRollup()
+        for archivo, cajas_archivo in self.excel_processor.iter_excel_files_with_cajas(path):
+            archivos.append(archivo)
+            cajas.extend(cajas_archivo)
+            rollup.add(archivo, cajas_archivo)
+        logger.info(f"Procesados {len(archivos)} archivos y {len(cajas)} cajas")
+        return archivos, cajas, rollup
+
+    def upload_models(self, archivos: List[ArchivoModel], cajas: List[CajaModel],
+                      check_duplicates: bool = True, include_cajas: bool = True,
+                      rollup: Optional[WeeklyRollup] = None) -> bool:
+        """
+        Sube a BigQuery archivos y cajas ya procesados
+
+        Args:
+            archivos: Lista de modelos ArchivoModel
+            cajas: Lista de modelos CajaModel de esos archivos
+            check_duplicates: Si verificar duplicados antes de subir
+            include_cajas: Si subir también las cajas
+            rollup: Rollup acumulado durante el parseo (si es None se calcula de las cajas)
+
+        Returns:
+            True si la carga fue exitosa
+        """
+        try:
+            if self.consolidated_load is not None:
+                # El rollup se recalcula al cargar la ventana con los archivos realmente insertados
+                return self.consolidated_load.stage(
+                    ParsedBatch.from_models(archivos, cajas if include_cajas else []), check_duplicates
+                )
+
             # Verificar duplicados si está habilitado
             if check_duplicates:
                 archivos = self.bigquery_client.check_existing_files(archivos)
@@ -54,98 +118,179 @@ class UploadService:
                     logger.info("Todos los archivos ya existen en BigQuery")
                     return True
 
+            archivos, cajas, rollup = self.prepare_models(archivos, cajas, include_cajas, rollup)
+            if not archivos:
+                return True
+
             # Subir archivos a BigQuery
-            archivos_success = self.bigquery_client.upload_archivos(archivos)
+            if not self.bigquery_client.upload_archivos(archivos):
+                logger.error("Error subiendo archivos")
+                return False
+
+            if cajas and not self.caja_bigquery_client.upload_cajas(cajas):
+                logger.error("Error subiendo cajas")
+                return False
+
+            self.finish_models(archivos, cajas, rollup)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error subiendo modelos: {e}")
+            return False
+
+    def prepare_models(self, archivos: List[ArchivoModel], cajas: List[CajaModel], include_cajas: bool = True,
+                       rollup: Optional[WeeklyRollup] = None
+                       ) -> Tuple[List[ArchivoModel], List[CajaModel], Optional[WeeklyRollup]]:
+        """
+        Valida en bloque los archivos que se van a subir y deja solo sus cajas
 
-            if not archivos_success:
+        Las filas que fallan la validación quedan en cuarentena. Lo usan
+        upload_models y AsyncUploadService entre la verificación de duplicados
+        y los load jobs.
+
+        Args:
+            archivos: Archivos nuevos (ya sin duplicados)
+            cajas: Cajas de esos archivos
+            include_cajas: Si subir también las cajas
+            rollup: Rollup acumulado durante el parseo (si es None se calcula de las cajas)
+
+        Returns:
+            Tupla (archivos, cajas, rollup) a subir; archivos vacío si no queda nada
+        """
+        cantidad_cajas = len(cajas)
+        archivos, cajas = self.data_quality.apply_models(archivos, cajas)
+        if not archivos:
+            logger.warning("Todos los archivos quedaron en cuarentena")
+            return [], [], None
+        if len(cajas) != cantidad_cajas:
+            # El rollup acumulado incluye cajas en cuarentena: se recalcula
+            rollup = None
+
+        cajas_filtradas = []
+        if include_cajas and cajas:
+            # Solo las cajas de los archivos que se van a subir
+            archivos_fps = {archivo.fp_archivo for archivo in archivos}
+            cajas_filtradas = [caja for caja in cajas if caja.fp_archivo in archivos_fps]
+
+        if settings.rollup_enabled and cajas_filtradas and rollup is None:
+            rollup = WeeklyRollup.from_models(archivos, cajas_filtradas)
+        return archivos, cajas_filtradas, rollup
+
+    def finish_models(self, archivos: List[ArchivoModel], cajas: List[CajaModel],
+                      rollup: Optional[WeeklyRollup] = None):
+        """
+        Actualiza el rollup semanal y la copia local después de subir archivos y cajas
+
+        Args:
+            archivos: Archivos subidos
+            cajas: Cajas subidas
+            rollup: Rollup de esos archivos (de prepare_models)
+        """
+        if settings.rollup_enabled and cajas and rollup is not None:
+            self._update_rollup(rollup, {archivo.fp_archivo for archivo in archivos})
+
+        # La copia local es auxiliar: un error se registra pero no invalida la carga
+        self.local_store.append(archivos, cajas)
+
+        logger.info("Proceso completado exitosamente")
+
+    def upload_batch(self, batch: ParsedBatch, check_duplicates: bool = True,
+                     include_cajas: bool = True) -> bool:
+        """
+        Sube a BigQuery un lote columnar (ParsedBatch) sin reconstruir CajaModel
+
+        Args:
+            batch: Archivos y cajas en tablas Arrow
+            check_duplicates: Si verificar duplicados antes de subir
+            include_cajas: Si subir también las cajas
+
+        Returns:
+            True si la carga fue exitosa
+        """
+        try:
+            if self.consolidated_load is not None:
+                local = batch if include_cajas else ParsedBatch(batch.archivos, batch.cajas.slice(0, 0))
+                return self.consolidated_load.stage(local, check_duplicates)
+
+            if check_duplicates:
+                existentes = self.bigquery_client.check_existing_fingerprints(batch.fps_archivos())
+                batch = batch.exclude_archivos(existentes)
+
+                if not batch.num_archivos:
+                    logger.info("Todos los archivos ya existen en BigQuery")
+                    return True
+
+            batch = self.data_quality.apply(batch)
+            if not batch.num_archivos:
+                logger.warning("Todos los archivos quedaron en cuarentena")
+                return True
+
+            if not self.bigquery_client.upload_archivos_table(batch.archivos):
                 logger.error("Error subiendo archivos")
                 return False
 
-            # Subir cajas si están habilitadas
-            if include_cajas and cajas:
-                # Filtrar cajas que pertenecen a archivos que se subieron exitosamente
-                archivos_ids = {archivo.id_archivo for archivo in archivos}
-                cajas_filtradas = [caja for caja in cajas if caja.id_archivo in archivos_ids]
+            if include_cajas and batch.num_cajas:
+                if not self.caja_bigquery_client.upload_cajas_table(batch.cajas):
+                    logger.error("Error subiendo cajas")
+                    return False
 
-                if cajas_filtradas:
-                    cajas_success = self.caja_bigquery_client.upload_cajas(cajas_filtradas)
-                    if not cajas_success:
-                        logger.error("Error subiendo cajas")
-                        return False
+                if settings.rollup_enabled:
+                    self._update_rollup(WeeklyRollup.from_batch(batch), set(batch.fps_archivos()))
+
+            # La copia local es auxiliar: un error se registra pero no invalida la carga
+            local = batch if include_cajas else ParsedBatch(batch.archivos, batch.cajas.slice(0, 0))
+            self.local_store.append_batch(local)
 
             logger.info("Proceso completado exitosamente")
             return True
 
         except Exception as e:
-            logger.error(f"Error en el proceso: {e}")
+            logger.error(f"Error subiendo lote: {e}")
             return False
 
+    def flush_loads(self) -> bool:
+        """
+        Carga la ventana abierta y las pendientes de ejecuciones anteriores (LOAD_CONSOLIDATE=true)
+
+        Returns:
+            True si no hay carga consolidada, no había nada pendiente o todas las ventanas se cargaron
+        """
+        if self.consolidated_load is None:
+            return True
+        return self.consolidated_load.flush()
+
+    def _update_rollup(self, rollup: WeeklyRollup, archivos_fps: set):
+        """Guarda los totales por archivo y recalcula en el rollup semanal las semanas de los archivos recién subidos"""
+        filas = rollup.file_totals(archivos_fps)
+        semanas = sorted({(f["warehouse"], f["annio"], f["semana"]) for f in filas})
+        if not (self.rollup_client.record_files(filas) and self.rollup_client.rebuild_weeks(semanas)):
+            # Los datos ya están en T1/T2: no se marca la carga como fallida,
+            # el resumen se puede recalcular con 'python main.py reconstruir-resumen --desde-cajas'
+            logger.error(f"T3_RESUMEN_SEMANAL quedó desactualizado para las semanas {semanas}")
+
     def get_processing_summary(self, path: str, include_cajas: bool = True) -> dict:
         """
         Obtiene un resumen del procesamiento sin subir datos
 
         Args:
-            path: Ruta del directorio con archivos Excel
+            path: Ruta del directorio (o bundle .zip) con archivos Excel
             include_cajas: Si incluir información de cajas en el resumen
 
         Returns:
             Diccionario con resumen del procesamiento
         """
         try:
+            resumen = ProcessingSummaryAggregator(include_cajas)
+
             if include_cajas:
-                archivos, cajas = self.excel_processor.process_excel_files_with_cajas(path)
-
-                # Estadísticas de cajas por archivo
-                cajas_por_archivo = {}
-                for caja in cajas:
-                    if caja.id_archivo not in cajas_por_archivo:
-                        cajas_por_archivo[caja.id_archivo] = 0
-                    cajas_por_archivo[caja.id_archivo] += 1
-
-                return {
-                    "total_files": len(archivos),
-                    "total_cajas": len(cajas),
-                    "warehouses": list(set(archivo.warehouse for archivo in archivos)),
-                    "years": list(set(archivo.annio for archivo in archivos)),
-                    "files_detail": [
-                        {
-                            "archivo": archivo.archivo,
-                            "warehouse": archivo.warehouse,
-                            "puerto": archivo.puerto,
-                            "buque": archivo.buque,
-                            "annio": archivo.annio,
-                            "semana": archivo.semana,
-                            "cajas_count": cajas_por_archivo.get(archivo.id_archivo, 0)
-                        }
-                        for archivo in archivos
-                    ],
-                    "cajas_summary": {
-                        "total_dedos": sum(caja.dedos_totales for caja in cajas),
-                        "peso_total_kg": sum(caja.peso_total_kg for caja in cajas),
-                        "promedio_peso_caja": sum(caja.peso_promedio for caja in cajas) / len(cajas) if cajas else 0,
-                        "total_uw": sum(caja.uw for caja in cajas),
-                        "total_ow": sum(caja.ow for caja in cajas)
-                    }
-                }
+                # Una sola pasada por archivo, sin acumular las cajas de toda la carpeta
+                for archivo, cajas in self.excel_processor.iter_excel_files_with_cajas(path):
+                    resumen.add(archivo, cajas)
             else:
-                archivos = self.excel_processor.process_excel_files(path)
-
-                return {
-                    "total_files": len(archivos),
-                    "warehouses": list(set(archivo.warehouse for archivo in archivos)),
-                    "years": list(set(archivo.annio for archivo in archivos)),
-                    "files_detail": [
-                        {
-                            "archivo": archivo.archivo,
-                            "warehouse": archivo.warehouse,
-                            "puerto": archivo.puerto,
-                            "buque": archivo.buque,
-                            "annio": archivo.annio,
-                            "semana": archivo.semana
-                        }
-                        for archivo in archivos
-                    ]
-                }
+                for archivo in self.excel_processor.process_excel_files(path):
+                    resumen.add(archivo)
+
+            return resumen.to_dict()
 
         except Exception as e:
             logger.error(f"Error obteniendo resumen: {e}")
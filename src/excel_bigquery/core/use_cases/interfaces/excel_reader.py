@@ -1,7 +1,12 @@
+import io
 import os
-from typing import List, Tuple
+import zipfile
+from typing import List, Tuple, Union, BinaryIO
 from enum import Enum
 
+# Separador entre la ruta del .zip y el miembro interno: "bundle.zip!/KOBE/日通 WK26.xlsx"
+SEPARADOR_ZIP = "!/"
+
 
 class WarehouseType(Enum):
     NITTSU = "NITTSU"
@@ -12,28 +17,27 @@ class WarehouseType(Enum):
 
 def excel_reader(path: str) -> Tuple[List[Tuple[str, str]], str]:
     """
-    Lee los archivos Excel de un directorio y determina el warehouse
+    Lee los archivos Excel de un directorio (o de un .zip) y determina el warehouse
 
     Args:
-        path: Ruta del directorio
+        path: Ruta del directorio o del archivo .zip con el bundle semanal
 
     Returns:
-        Tupla con lista de archivos (nombre_limpio, ruta_completa) y nombre del warehouse
+        Tupla con lista de archivos (nombre_limpio, ruta_completa) y nombre del warehouse.
+        Para miembros de un .zip la ruta tiene la forma "bundle.zip!/carpeta/archivo.xlsx"
     """
     if not os.path.exists(path):
         raise FileNotFoundError(f"La ruta {path} no existe")
 
+    if es_archivo_zip(path):
+        return _zip_reader(path)
+
     # Filtrar archivos Excel excluyendo temporales
     todos_archivos = os.listdir(path)
     archivos_excel = []
 
     for archivo in todos_archivos:
-        # Filtrar archivos temporales de Excel (empiezan con ~$)
-        if archivo.startswith('~$'):
-            continue
-
-        # Solo archivos Excel
-        if archivo.endswith(('.xlsx', '.xls')):
+        if _es_archivo_excel(archivo):
             # Limpiar nombre del archivo (quitar los primeros 3 caracteres)
             nombre_limpio = _limpiar_nombre_archivo(archivo)
             ruta_completa = os.path.join(path, archivo)
@@ -52,6 +56,131 @@ def excel_reader(path: str) -> Tuple[List[Tuple[str, str]], str]:
     return archivos_excel, warehouse
 
 
+def _zip_reader(zip_path: str) -> Tuple[List[Tuple[str, str]], str]:
+    """
+    Lista los archivos Excel dentro de un .zip (incluyendo carpetas anidadas)
+    sin extraerlos a disco
+
+    Args:
+        zip_path: Ruta del archivo .zip
+
+    Returns:
+        Tupla con lista de archivos (nombre_limpio, ruta_miembro) y nombre del warehouse
+    """
+    archivos_excel = []
+
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+
+            # Los miembros siempre usan "/" como separador dentro del zip
+            archivo = _decodificar_nombre_miembro(info).rsplit('/', 1)[-1]
+            if _es_archivo_excel(archivo):
+                nombre_limpio = _limpiar_nombre_archivo(archivo)
+                ruta_miembro = f"{zip_path}{SEPARADOR_ZIP}{info.filename}"
+                archivos_excel.append((nombre_limpio, ruta_miembro))
+
+    if not archivos_excel:
+        raise ValueError(f"No se encontraron archivos Excel válidos en {zip_path}")
+
+    # El warehouse se detecta por el nombre del zip ("KOBE_WK26.zip") y, si no
+    # lo indica, por la carpeta donde se dejó el bundle (ej. KOBE_PATH)
+    nombre_zip = os.path.splitext(os.path.basename(zip_path))[0]
+    carpeta_padre = os.path.basename(os.path.dirname(os.path.abspath(zip_path)))
+
+    for nombre in (nombre_zip, carpeta_padre):
+        if "MATIAS" in nombre.upper() or "MATHIAS" in nombre.upper():
+            raise ValueError(f"Nittsu Mathias no está configurado aún. Carpeta: {nombre}")
+
+    warehouse = _determinar_warehouse(nombre_zip)
+    if warehouse == WarehouseType.DESCONOCIDO.value:
+        warehouse = _determinar_warehouse(carpeta_padre)
+
+    return archivos_excel, warehouse
+
+
+def _decodificar_nombre_miembro(info: zipfile.ZipInfo) -> str:
+    """
+    Decodifica el nombre de un miembro del zip
+
+    Si el zip no marca los nombres como UTF-8 (flag 0x800), zipfile los decodifica
+    como cp437; los bundles de Windows en Japón suelen venir en UTF-8 o cp932.
+    """
+    if info.flag_bits & 0x800:
+        return info.filename
+
+    crudo = info.filename.encode('cp437')
+    for encoding in ('utf-8', 'cp932'):
+        try:
+            return crudo.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def es_archivo_zip(path: str) -> bool:
+    """Indica si la ruta es un bundle .zip (y no un directorio)"""
+    return path.lower().endswith('.zip') and os.path.isfile(path)
+
+
+def es_miembro_zip(ruta_archivo: str) -> bool:
+    """Indica si la ruta apunta a un miembro dentro de un .zip"""
+    return SEPARADOR_ZIP in ruta_archivo
+
+
+def _separar_ruta_zip(ruta_archivo: str) -> Tuple[str, str]:
+    """Separa "bundle.zip!/carpeta/archivo.xlsx" en (ruta_zip, miembro)"""
+    zip_path, miembro = ruta_archivo.split(SEPARADOR_ZIP, 1)
+    return zip_path, miembro
+
+
+def abrir_archivo_excel(ruta_archivo: Union[str, BinaryIO]) -> Union[str, BinaryIO]:
+    """
+    Retorna una fuente que openpyxl puede abrir con load_workbook
+
+    Para archivos normales retorna la misma ruta. Para miembros de un .zip lee el
+    miembro a memoria (openpyxl necesita un stream con seek) sin escribirlo a disco.
+    Los streams ya abiertos (ej. subidas HTTP) se rebobinan y se retornan tal cual.
+
+    Args:
+        ruta_archivo: Ruta del archivo, del miembro del zip o stream binario
+
+    Returns:
+        Ruta o stream binario del libro Excel
+    """
+    if not isinstance(ruta_archivo, str):
+        ruta_archivo.seek(0)
+        return ruta_archivo
+
+    if not es_miembro_zip(ruta_archivo):
+        return ruta_archivo
+
+    zip_path, miembro = _separar_ruta_zip(ruta_archivo)
+    with zipfile.ZipFile(zip_path) as zf:
+        return io.BytesIO(zf.read(miembro))
+
+
+def obtener_tamano_archivo(ruta_archivo: str) -> int:
+    """Retorna el tamaño en bytes del archivo (sin comprimir si es miembro de un zip)"""
+    if not es_miembro_zip(ruta_archivo):
+        return os.path.getsize(ruta_archivo)
+
+    zip_path, miembro = _separar_ruta_zip(ruta_archivo)
+    with zipfile.ZipFile(zip_path) as zf:
+        return zf.getinfo(miembro).file_size
+
+
+def _es_archivo_excel(archivo: str) -> bool:
+    """Indica si el nombre corresponde a un Excel válido (excluye temporales ~$)"""
+    # Filtrar archivos temporales de Excel (empiezan con ~$)
+    if archivo.startswith('~$'):
+        return False
+
+    # Solo archivos Excel
+    return archivo.endswith(('.xlsx', '.xls'))
+
+
 def _limpiar_nombre_archivo(nombre_archivo: str) -> str:
     """
     Limpia el nombre del archivo quitando los primeros 3 caracteres
@@ -105,12 +234,12 @@ def get_excel_files_info(path: str) -> dict:
 
         archivos_info = []
         for nombre_limpio, ruta_completa in archivos:
-            nombre_original = os.path.basename(ruta_completa)
+            nombre_original = os.path.basename(ruta_completa.replace(SEPARADOR_ZIP, os.sep))
             archivos_info.append({
                 'nombre_original': nombre_original,
                 'nombre_limpio': nombre_limpio,
                 'ruta_completa': ruta_completa,
-                'tamaño_kb': round(os.path.getsize(ruta_completa) / 1024, 2)
+                'tamaño_kb': round(obtener_tamano_archivo(ruta_completa) / 1024, 2)
             })
 
         return {
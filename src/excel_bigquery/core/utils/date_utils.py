@@ -1,6 +1,12 @@
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 
 def extract_week_and_year_from_trazabilidad(codigo_trazabilidad: str) -> tuple[int, int]:
     """
@@ -19,34 +25,119 @@ def extract_week_and_year_from_trazabilidad(codigo_trazabilidad: str) -> tuple[i
             return 0, 0
 
         # Tomar los últimos 6 caracteres
-        fecha_str = codigo_trazabilidad[-6:]
-
-        # Extraer día, mes, año (DDMMYY)
-        if len(fecha_str) == 6:
-            dia = int(fecha_str[:2])
-            mes = int(fecha_str[2:4])
-            anio_corto = int(fecha_str[4:6])
-
-            # Convertir año de 2 dígitos a 4 dígitos
-            # Asumimos que años 00-30 son 2000-2030, y 31-99 son 1931-1999
-            if anio_corto <= 30:
-                anio_completo = 2000 + anio_corto
-            else:
-                anio_completo = 1900 + anio_corto
-
-            # Crear fecha y obtener semana ISO
-            fecha = datetime(anio_completo, mes, dia)
-            semana_iso = fecha.isocalendar()[1]
-
-            return semana_iso, anio_completo
-        else:
-            return 0, 0
+        return _semana_de_fecha(codigo_trazabilidad[-6:])
 
     except (ValueError, IndexError) as e:
-        print(f"Error procesando código trazabilidad {codigo_trazabilidad}: {e}")
+        logger.warning("Error procesando código trazabilidad %s: %s", codigo_trazabilidad, e)
         return 0, 0
 
 
+def _anio_completo(anio_corto: int) -> int:
+    # Asumimos que años 00-30 son 2000-2030, y 31-99 son 1931-1999
+    return 2000 + anio_corto if anio_corto <= 30 else 1900 + anio_corto
+
+
+def _semana_de_fecha(fecha_str: str) -> Tuple[int, int]:
+    """Convierte DDMMYY a (semana ISO, año); lanza ValueError si no es una fecha"""
+    # Extraer día, mes, año (DDMMYY)
+    dia = int(fecha_str[:2])
+    mes = int(fecha_str[2:4])
+    anio_completo = _anio_completo(int(fecha_str[4:6]))
+
+    # Crear fecha y obtener semana ISO
+    fecha = datetime(anio_completo, mes, dia)
+    return fecha.isocalendar()[1], anio_completo
+
+
+@lru_cache(maxsize=None)
+def _calendario_trazabilidad() -> Dict[str, Tuple[int, int]]:
+    """
+    Tabla DDMMYY -> (semana ISO, año) de todas las fechas que admite el código
+
+    Cubre la ventana completa del año de 2 dígitos (1931-2030), así que un
+    DDMMYY de 6 dígitos ASCII que no está en la tabla es una fecha inválida.
+    """
+    calendario = {}
+    fecha = date(1931, 1, 1)
+    ultimo = date(2030, 12, 31)
+    while fecha <= ultimo:
+        calendario[f"{fecha.day:02d}{fecha.month:02d}{fecha.year % 100:02d}"] = (fecha.isocalendar()[1], fecha.year)
+        fecha += timedelta(days=1)
+    return calendario
+
+
+@dataclass
+class TrazabilidadDecodificada:
+    """Resultado de decode_trazabilidad_batch, alineado con los códigos de entrada"""
+    semanas: List[int]
+    annios: List[int]
+    validos: List[bool]
+    # Motivo -> cantidad de códigos, y hasta 3 ejemplos por motivo
+    malformados: Dict[str, int] = field(default_factory=dict)
+    ejemplos: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def cantidad_malformados(self) -> int:
+        return sum(self.malformados.values())
+
+    def resumen(self) -> str:
+        """Reporte compacto de los códigos que no se pudieron decodificar"""
+        return ", ".join(
+            f"{motivo}: {cantidad} (ej. {', '.join(repr(c) for c in self.ejemplos[motivo])})"
+            for motivo, cantidad in self.malformados.items()
+        )
+
+
+def decode_trazabilidad_batch(codigos: Sequence[Optional[str]]) -> TrazabilidadDecodificada:
+    """
+    Decodifica una columna de códigos de trazabilidad a (semana ISO, año)
+
+    Da exactamente el mismo resultado que extract_week_and_year_from_trazabilidad
+    código a código, pero resuelve DDMMYY con una tabla precalculada y, en lugar
+    de imprimir cada error, devuelve una máscara de válidos y un resumen de los
+    códigos malformados.
+
+    Args:
+        codigos: Códigos de trazabilidad (None se trata como vacío)
+
+    Returns:
+        TrazabilidadDecodificada con semanas, años, máscara de válidos y malformados
+    """
+    calendario = _calendario_trazabilidad()
+    resultado = TrazabilidadDecodificada([], [], [])
+
+    for codigo in codigos:
+        if not codigo or len(codigo) < 6:
+            semana_annio = None
+            motivo = "vacío" if not codigo else "menos de 6 caracteres"
+        else:
+            fecha_str = codigo[-6:]
+            semana_annio = calendario.get(fecha_str)
+            motivo = "fecha inválida"
+
+            if semana_annio is None and not (fecha_str.isascii() and fecha_str.isdigit()):
+                # Formas que int() acepta fuera de la tabla ("+1", " 5", dígitos no ASCII)
+                try:
+                    semana_annio = _semana_de_fecha(fecha_str)
+                except (ValueError, IndexError):
+                    motivo = "no numérico"
+
+        if semana_annio is None:
+            resultado.semanas.append(0)
+            resultado.annios.append(0)
+            resultado.validos.append(False)
+            resultado.malformados[motivo] = resultado.malformados.get(motivo, 0) + 1
+            ejemplos = resultado.ejemplos.setdefault(motivo, [])
+            if len(ejemplos) < 3:
+                ejemplos.append(codigo)
+        else:
+            resultado.semanas.append(semana_annio[0])
+            resultado.annios.append(semana_annio[1])
+            resultado.validos.append(True)
+
+    return resultado
+
+
 def is_valid_date(dia: int, mes: int, anio: int) -> bool:
     """Valida si una fecha es válida"""
     try:
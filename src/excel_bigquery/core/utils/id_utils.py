@@ -0,0 +1,31 @@
+import hashlib
+
+
+def fingerprint(valor: str) -> int:
+    """
+    Calcula una huella compacta y determinística (INT64) de un identificador
+
+    Son los primeros 8 bytes del SHA-256 del texto en UTF-8, interpretados como
+    entero con signo big-endian. BigQuery calcula el mismo valor con SHA256(),
+    lo que permite rellenar filas históricas directamente en SQL.
+
+    Ejemplo: fingerprint("KOBE_2025_WK26 MYNY.xlsx_12") -> entero de 64 bits
+
+    Args:
+        valor: Identificador legible (id_archivo, id_caja, ...)
+
+    Returns:
+        Entero con signo de 64 bits
+    """
+    digest = hashlib.sha256(valor.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def sk_hacienda(codigo_hacienda: int, nombre_hacienda: str) -> int:
+    """Clave sustituta estable de la dimensión hacienda (código + nombre)"""
+    return fingerprint(f"{codigo_hacienda}|{nombre_hacienda}")
+
+
+def sk_container(codigo_container: str) -> int:
+    """Clave sustituta estable de la dimensión container"""
+    return fingerprint(codigo_container)
@@ -0,0 +1,56 @@
+import asyncio
+import functools
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+async def run_blocking(func, *args, executor=None, **kwargs):
+    """Ejecuta una llamada bloqueante (HTTP de BigQuery, openpyxl) en un executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def await_job(job, poll_interval: float = 1.0, timeout: Optional[float] = None, executor=None):
+    """
+    Espera un job de BigQuery sin bloquear el event loop
+
+    Consulta job.done() en el executor cada poll_interval segundos. Si la tarea
+    se cancela o vence el timeout, se solicita la cancelación del job en BigQuery
+    antes de propagar la excepción.
+
+    Args:
+        job: QueryJob o LoadJob ya iniciado
+        poll_interval: Segundos entre consultas de estado
+        timeout: Segundos máximos de espera (None = sin límite)
+        executor: Executor para las llamadas bloqueantes (None = el del loop)
+
+    Returns:
+        El mismo job, ya terminado (job.result() ya no bloquea esperando)
+
+    Raises:
+        asyncio.TimeoutError: Si el job no termina dentro del timeout
+        asyncio.CancelledError: Si la tarea que espera es cancelada
+        Exception: El error del job si terminó con errores
+    """
+    async def _poll():
+        while not await run_blocking(job.done, executor=executor):
+            await asyncio.sleep(poll_interval)
+
+    try:
+        await asyncio.wait_for(_poll(), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        logger.warning(f"Cancelando job {job.job_id} de BigQuery")
+        try:
+            # shield: la cancelación del job debe enviarse aunque la tarea ya esté cancelada
+            await asyncio.shield(run_blocking(job.cancel, executor=executor))
+        except Exception as e:
+            logger.warning(f"No se pudo cancelar el job {job.job_id}: {e}")
+        raise
+
+    # Lanza la excepción del job si terminó con errores
+    if job.error_result:
+        await run_blocking(job.result, executor=executor)
+
+    return job
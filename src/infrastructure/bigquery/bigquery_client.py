@@ -1,11 +1,18 @@
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 import pandas as pd
+import pyarrow as pa
 from typing import List
 import logging
 
 from src.config.settings import settings
 from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.infrastructure.bigquery.fingerprint_sql import ensure_fingerprint_columns, backfill_fingerprints
+from src.infrastructure.bigquery.storage_write import StorageWriteWriter
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+from src.infrastructure.dataframes.parsed_batch import table_to_dataframe, table_to_parquet_buffer
+from src.infrastructure.profiling.stage_profiler import profiled
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +22,10 @@ class BigQueryClient:
         self.client = bigquery.Client(project=settings.project_id)
         self.dataset_id = settings.dataset_id
         self.table_id = "T1_ARCHIVOS"
+        self.fingerprint_columns = {"fp_archivo": "id_archivo"}
+        self.clustering_fields = ["fp_archivo"]
+        self.storage_writer = StorageWriteWriter.from_settings()
+        self._schema = None
 
     def create_dataset_if_not_exists(self):
         """Crea el dataset si no existe"""
@@ -34,8 +45,9 @@ class BigQueryClient:
         table_ref = self.client.dataset(self.dataset_id).table(self.table_id)
 
         try:
-            self.client.get_table(table_ref)
+            table = self.client.get_table(table_ref)
             logger.info(f"Tabla {self.table_id} ya existe")
+            ensure_fingerprint_columns(self.client, table, self.fingerprint_columns, self.clustering_fields)
         except NotFound:
             schema = [
                 bigquery.SchemaField("id_archivo", "STRING", mode="REQUIRED"),
@@ -47,12 +59,15 @@ class BigQueryClient:
                 bigquery.SchemaField("semana", "INTEGER", mode="NULLABLE"),
                 bigquery.SchemaField("spec", "INTEGER", mode="NULLABLE"),
                 bigquery.SchemaField("tipo", "STRING", mode="NULLABLE"),
+                bigquery.SchemaField("fp_archivo", "INTEGER", mode="NULLABLE"),
             ]
 
             table = bigquery.Table(table_ref, schema=schema)
+            table.clustering_fields = self.clustering_fields
             table = self.client.create_table(table)
             logger.info(f"Tabla {self.table_id} creada")
 
+    @profiled("carga_archivos")
     def upload_archivos(self, archivos: List[ArchivoModel]) -> bool:
         """
         Sube los datos de archivos a BigQuery
@@ -77,6 +92,25 @@ class BigQueryClient:
         # Subir datos
         return self._upload_dataframe(df)
 
+    @profiled("carga_archivos")
+    def upload_archivos_table(self, table: pa.Table) -> bool:
+        """
+        Sube archivos ya en formato columnar (tabla Arrow con las columnas de T1_ARCHIVOS)
+
+        Args:
+            table: Tabla Arrow de archivos
+
+        Returns:
+            True si la carga fue exitosa, False en caso contrario
+        """
+        if not table.num_rows:
+            logger.warning("No hay archivos para subir")
+            return False
+
+        self.create_dataset_if_not_exists()
+        self.create_table_if_not_exists()
+        return self._upload_table(table)
+
     def _models_to_dataframe(self, archivos: List[ArchivoModel]) -> pd.DataFrame:
         """Convierte lista de modelos a DataFrame"""
         data = []
@@ -90,34 +124,93 @@ class BigQueryClient:
                 'annio': archivo.annio,
                 'semana': archivo.semana,
                 'spec': archivo.spec,
-                'tipo': archivo.tipo
+                'tipo': archivo.tipo,
+                'fp_archivo': archivo.fp_archivo
             })
 
         return pd.DataFrame(data)
 
-    def _upload_dataframe(self, df: pd.DataFrame) -> bool:
-        """Sube DataFrame a BigQuery"""
+    def _start_upload_dataframe(self, df: pd.DataFrame) -> bigquery.LoadJob:
+        """Inicia el load job del DataFrame sin esperar a que termine"""
+        table_id = f"{settings.project_id}.{self.dataset_id}.{self.table_id}"
+
+        job_config = bigquery.LoadJobConfig(
+            write_disposition="WRITE_APPEND",  # Agregar datos sin sobrescribir
+            autodetect=False
+        )
+
+        job_rate_limiter.acquire(table_id)
+        return self.client.load_table_from_dataframe(
+            df, table_id, job_config=job_config
+        )
+
+    def _start_upload_table(self, table: pa.Table) -> bigquery.LoadJob:
+        """Inicia el load job de una tabla Arrow (Parquet en memoria) sin esperar a que termine"""
+        table_id = f"{settings.project_id}.{self.dataset_id}.{self.table_id}"
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition="WRITE_APPEND",
+            autodetect=False
+        )
+
+        job_rate_limiter.acquire(table_id)
+        return self.client.load_table_from_file(
+            table_to_parquet_buffer(table), table_id, job_config=job_config
+        )
+
+    def _upload_table(self, table: pa.Table) -> bool:
+        """Sube una tabla Arrow (lotes chicos por el Storage Write API, el resto como Parquet)"""
+        if self._use_storage_write(table.num_rows):
+            return self._upload_dataframe(table_to_dataframe(table))
+
         try:
-            table_id = f"{settings.project_id}.{self.dataset_id}.{self.table_id}"
+            cost_log.wait(self._start_upload_table(table), f"carga {self.table_id}")
+            logger.info(f"Subidos {table.num_rows} registros a {settings.project_id}.{self.dataset_id}.{self.table_id}")
+            return True
 
-            job_config = bigquery.LoadJobConfig(
-                write_disposition="WRITE_APPEND",  # Agregar datos sin sobrescribir
-                autodetect=False
-            )
+        except Exception as e:
+            logger.error(f"Error subiendo datos a BigQuery: {e}")
+            return False
+
+    def _use_storage_write(self, filas: int) -> bool:
+        """True si el lote se sube con el Storage Write API en lugar de un load job"""
+        return self.storage_writer is not None and self.storage_writer.accepts(filas)
+
+    def _get_schema(self) -> list:
+        if self._schema is None:
+            self._schema = self.client.get_table(f"{settings.project_id}.{self.dataset_id}.{self.table_id}").schema
+        return self._schema
 
-            job = self.client.load_table_from_dataframe(
-                df, table_id, job_config=job_config
-            )
+    def _upload_dataframe(self, df: pd.DataFrame) -> bool:
+        """Sube DataFrame a BigQuery (Storage Write API para lotes chicos, load job para el resto)"""
+        if self._use_storage_write(len(df)):
+            try:
+                filas = self.storage_writer.write_dataframe(
+                    settings.project_id, self.dataset_id, self.table_id, self._get_schema(), df
+                )
+                logger.info(f"Subidos {filas} registros a {settings.project_id}.{self.dataset_id}.{self.table_id} (Storage Write API)")
+                return True
+
+            except Exception as e:
+                if not self.storage_writer.fallback_safe(e):
+                    logger.error(f"Error subiendo datos a BigQuery (Storage Write API): {e}")
+                    return False
+                logger.warning(f"Storage Write API falló: {e}. Usando load job.")
+
+        try:
+            job = self._start_upload_dataframe(df)
 
-            job.result()  # Esperar a que termine el job
+            cost_log.wait(job, f"carga {self.table_id}")  # Esperar a que termine el job
 
-            logger.info(f"Subidos {len(df)} registros a {table_id}")
+            logger.info(f"Subidos {len(df)} registros a {settings.project_id}.{self.dataset_id}.{self.table_id}")
             return True
 
         except Exception as e:
             logger.error(f"Error subiendo datos a BigQuery: {e}")
             return False
 
+    @profiled("duplicados")
     def check_existing_files(self, archivos: List[ArchivoModel]) -> List[ArchivoModel]:
         """
         Verifica qué archivos ya existen en BigQuery para evitar duplicados
@@ -127,33 +220,97 @@ class BigQueryClient:
 
         Returns:
             Lista de archivos que no existen en BigQuery
+
+        Raises:
+            Exception: Si la consulta falla (incluye QueryCostExceeded y el límite de bytes facturados)
         """
         if not archivos:
             return []
 
-        # Crear lista de IDs para consultar
-        ids_to_check = [archivo.id_archivo for archivo in archivos]
-        ids_str = "', '".join(ids_to_check)
+        query = self._build_existing_query(archivos)
 
-        query = f"""
-        SELECT id_archivo 
-        FROM `{settings.project_id}.{self.dataset_id}.{self.table_id}`
-        WHERE id_archivo IN ('{ids_str}')
+        try:
+            # Migra/crea la tabla antes de consultar: tablas antiguas aún no tienen fp_archivo
+            self.create_dataset_if_not_exists()
+            self.create_table_if_not_exists()
+
+            results = cost_log.run_query(self.client, query, etiqueta=f"duplicados {self.table_id}").result()
+            return self._filter_existing(archivos, results)
+
+        except Exception as e:
+            # Sin la verificación se subiría todo de nuevo (duplicados): se cancela la carga,
+            # también si la consulta supera QUERY_MAX_BYTES o maximum_bytes_billed
+            logger.error(f"Error verificando archivos existentes: {e}. Se cancela la carga")
+            raise
+
+    @profiled("duplicados")
+    def check_existing_fingerprints(self, fps: List[int]) -> set:
         """
+        Retorna los fp_archivo que ya existen en BigQuery
 
-        try:
-            results = self.client.query(query).result()
-            existing_ids = {row.id_archivo for row in results}
+        Args:
+            fps: Fingerprints de los archivos a verificar
 
-            # Filtrar archivos que no existen
-            new_archivos = [
-                archivo for archivo in archivos
-                if archivo.id_archivo not in existing_ids
-            ]
+        Returns:
+            Conjunto de fingerprints existentes
+
+        Raises:
+            Exception: Si la consulta falla (incluye QueryCostExceeded y el límite de bytes facturados)
+        """
+        if not fps:
+            return set()
+
+        try:
+            self.create_dataset_if_not_exists()
+            self.create_table_if_not_exists()
 
-            logger.info(f"Archivos existentes: {len(existing_ids)}, Archivos nuevos: {len(new_archivos)}")
-            return new_archivos
+            job = cost_log.run_query(self.client, self._build_existing_query_fps(fps),
+                                     etiqueta=f"duplicados {self.table_id}")
+            results = job.result()
+            existentes = {row.fp_archivo for row in results}
+            logger.info(f"Archivos existentes: {len(existentes)}, Archivos nuevos: {len(set(fps) - existentes)}")
+            return existentes
 
         except Exception as e:
-            logger.warning(f"Error verificando archivos existentes: {e}. Subiendo todos los archivos.")
-            return archivos
\ No newline at end of file
+            logger.error(f"Error verificando archivos existentes: {e}. Se cancela la carga")
+            raise
+
+    def _build_existing_query(self, archivos: List[ArchivoModel]) -> str:
+        """Construye la consulta de fingerprints de archivos ya cargados"""
+        return self._build_existing_query_fps([archivo.fp_archivo for archivo in archivos])
+
+    def _build_existing_query_fps(self, fps: List[int]) -> str:
+        # Los fingerprints INT64 son más baratos de filtrar que los IDs legibles
+        # y aprovechan el clustering de la tabla
+        fps_str = ", ".join(str(fp) for fp in fps)
+
+        return f"""
+        SELECT fp_archivo 
+        FROM `{settings.project_id}.{self.dataset_id}.{self.table_id}`
+        WHERE fp_archivo IN ({fps_str})
+        """
+
+    def _filter_existing(self, archivos: List[ArchivoModel], results) -> List[ArchivoModel]:
+        """Filtra los archivos cuyos fingerprints aparecen en el resultado de la consulta"""
+        existing_ids = {row.fp_archivo for row in results}
+
+        # Filtrar archivos que no existen
+        new_archivos = [
+            archivo for archivo in archivos
+            if archivo.fp_archivo not in existing_ids
+        ]
+
+        logger.info(f"Archivos existentes: {len(existing_ids)}, Archivos nuevos: {len(new_archivos)}")
+        return new_archivos
+
+    def backfill_fingerprints(self) -> int:
+        """
+        Rellena fp_archivo en las filas históricas de T1_ARCHIVOS
+
+        Returns:
+            Cantidad de filas actualizadas
+        """
+        self.create_table_if_not_exists()
+        return backfill_fingerprints(
+            self.client, f"{settings.project_id}.{self.dataset_id}.{self.table_id}", self.fingerprint_columns
+        )
@@ -1,11 +1,18 @@
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 import pandas as pd
+import pyarrow as pa
 from typing import List
 import logging
 
 from src.config.settings import settings
 from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.infrastructure.bigquery.fingerprint_sql import ensure_fingerprint_columns, backfill_fingerprints
+from src.infrastructure.bigquery.storage_write import StorageWriteWriter
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+from src.infrastructure.dataframes.parsed_batch import table_to_dataframe, table_to_parquet_buffer
+from src.infrastructure.profiling.stage_profiler import profiled
 
 logger = logging.getLogger(__name__)
 
@@ -15,14 +22,20 @@ class CajaBigQueryClient:
         self.client = bigquery.Client(project=settings.project_id)
         self.dataset_id = settings.dataset_id
         self.table_id = "T2_CAJAS"
+        self.fingerprint_columns = {"fp_caja": "id_caja", "fp_archivo": "id_archivo"}
+        self.clustering_fields = ["fp_archivo", "fp_caja"]
+        self.storage_writer = StorageWriteWriter.from_settings()
+        self._schema = None
+        self._dimensional_client = None
 
     def create_table_if_not_exists(self):
         """Crea la tabla T2_CAJAS si no existe"""
         table_ref = self.client.dataset(self.dataset_id).table(self.table_id)
 
         try:
-            self.client.get_table(table_ref)
+            table = self.client.get_table(table_ref)
             logger.info(f"Tabla {self.table_id} ya existe")
+            ensure_fingerprint_columns(self.client, table, self.fingerprint_columns, self.clustering_fields)
         except NotFound:
             schema = [
                 bigquery.SchemaField("id_caja", "STRING", mode="REQUIRED"),
@@ -44,12 +57,16 @@ class CajaBigQueryClient:
                 bigquery.SchemaField("spec", "INTEGER", mode="NULLABLE"),
                 bigquery.SchemaField("uw", "INTEGER", mode="NULLABLE"),
                 bigquery.SchemaField("ow", "INTEGER", mode="NULLABLE"),
+                bigquery.SchemaField("fp_caja", "INTEGER", mode="NULLABLE"),
+                bigquery.SchemaField("fp_archivo", "INTEGER", mode="NULLABLE"),
             ]
 
             table = bigquery.Table(table_ref, schema=schema)
+            table.clustering_fields = self.clustering_fields
             table = self.client.create_table(table)
             logger.info(f"Tabla {self.table_id} creada")
 
+    @profiled("carga_cajas")
     def upload_cajas(self, cajas: List[CajaModel]) -> bool:
         """
         Sube los datos de cajas a BigQuery
@@ -64,6 +81,9 @@ class CajaBigQueryClient:
             logger.warning("No hay cajas para subir")
             return False
 
+        if settings.cajas_dimensional:
+            return self.dimensional_client.upload_cajas(cajas)
+
         # Crear tabla si no existe
         self.create_table_if_not_exists()
 
@@ -73,6 +93,35 @@ class CajaBigQueryClient:
         # Subir datos
         return self._upload_dataframe(df)
 
+    @profiled("carga_cajas")
+    def upload_cajas_table(self, table: pa.Table) -> bool:
+        """
+        Sube cajas ya en formato columnar (tabla Arrow con las columnas de T2_CAJAS)
+
+        Args:
+            table: Tabla Arrow de cajas
+
+        Returns:
+            True si la carga fue exitosa, False en caso contrario
+        """
+        if not table.num_rows:
+            logger.warning("No hay cajas para subir")
+            return False
+
+        if settings.cajas_dimensional:
+            return self.dimensional_client.upload_cajas_dataframe(table_to_dataframe(table))
+
+        self.create_table_if_not_exists()
+        return self._upload_table(table)
+
+    @property
+    def dimensional_client(self):
+        """Cliente del modelo dimensional (T2_CAJAS_FACT + dimensiones), creado a demanda"""
+        if self._dimensional_client is None:
+            from src.infrastructure.bigquery.caja_dimensional_client import CajaDimensionalClient
+            self._dimensional_client = CajaDimensionalClient(self.client)
+        return self._dimensional_client
+
     def _models_to_dataframe(self, cajas: List[CajaModel]) -> pd.DataFrame:
         """Convierte lista de modelos a DataFrame"""
         data = []
@@ -96,30 +145,101 @@ class CajaBigQueryClient:
                 'year_code': caja.year_code,
                 'spec': caja.spec,
                 'uw': caja.uw,
-                'ow': caja.ow
+                'ow': caja.ow,
+                'fp_caja': caja.fp_caja,
+                'fp_archivo': caja.fp_archivo
             })
 
         return pd.DataFrame(data)
 
-    def _upload_dataframe(self, df: pd.DataFrame) -> bool:
-        """Sube DataFrame a BigQuery"""
+    def _start_upload_dataframe(self, df: pd.DataFrame) -> bigquery.LoadJob:
+        """Inicia el load job del DataFrame sin esperar a que termine"""
+        table_id = f"{settings.project_id}.{self.dataset_id}.{self.table_id}"
+
+        job_config = bigquery.LoadJobConfig(
+            write_disposition="WRITE_APPEND",
+            autodetect=False
+        )
+
+        job_rate_limiter.acquire(table_id)
+        return self.client.load_table_from_dataframe(
+            df, table_id, job_config=job_config
+        )
+
+    def _start_upload_table(self, table: pa.Table) -> bigquery.LoadJob:
+        """Inicia el load job de una tabla Arrow (Parquet en memoria) sin esperar a que termine"""
+        table_id = f"{settings.project_id}.{self.dataset_id}.{self.table_id}"
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition="WRITE_APPEND",
+            autodetect=False
+        )
+
+        job_rate_limiter.acquire(table_id)
+        return self.client.load_table_from_file(
+            table_to_parquet_buffer(table), table_id, job_config=job_config
+        )
+
+    def _upload_table(self, table: pa.Table) -> bool:
+        """Sube una tabla Arrow (lotes chicos por el Storage Write API, el resto como Parquet)"""
+        if self._use_storage_write(table.num_rows):
+            return self._upload_dataframe(table_to_dataframe(table))
+
         try:
-            table_id = f"{settings.project_id}.{self.dataset_id}.{self.table_id}"
+            cost_log.wait(self._start_upload_table(table), f"carga {self.table_id}")
+            logger.info(f"Subidas {table.num_rows} cajas a {settings.project_id}.{self.dataset_id}.{self.table_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error subiendo cajas a BigQuery: {e}")
+            return False
 
-            job_config = bigquery.LoadJobConfig(
-                write_disposition="WRITE_APPEND",
-                autodetect=False
-            )
+    def _use_storage_write(self, filas: int) -> bool:
+        """True si el lote se sube con el Storage Write API en lugar de un load job"""
+        return self.storage_writer is not None and self.storage_writer.accepts(filas)
 
-            job = self.client.load_table_from_dataframe(
-                df, table_id, job_config=job_config
-            )
+    def _get_schema(self) -> list:
+        if self._schema is None:
+            self._schema = self.client.get_table(f"{settings.project_id}.{self.dataset_id}.{self.table_id}").schema
+        return self._schema
 
-            job.result()  # Esperar a que termine el job
+    def _upload_dataframe(self, df: pd.DataFrame) -> bool:
+        """Sube DataFrame a BigQuery (Storage Write API para lotes chicos, load job para el resto)"""
+        if self._use_storage_write(len(df)):
+            try:
+                filas = self.storage_writer.write_dataframe(
+                    settings.project_id, self.dataset_id, self.table_id, self._get_schema(), df
+                )
+                logger.info(f"Subidas {filas} cajas a {settings.project_id}.{self.dataset_id}.{self.table_id} (Storage Write API)")
+                return True
+
+            except Exception as e:
+                if not self.storage_writer.fallback_safe(e):
+                    logger.error(f"Error subiendo cajas a BigQuery (Storage Write API): {e}")
+                    return False
+                logger.warning(f"Storage Write API falló: {e}. Usando load job.")
 
-            logger.info(f"Subidas {len(df)} cajas a {table_id}")
+        try:
+            job = self._start_upload_dataframe(df)
+
+            cost_log.wait(job, f"carga {self.table_id}")  # Esperar a que termine el job
+
+            logger.info(f"Subidas {len(df)} cajas a {settings.project_id}.{self.dataset_id}.{self.table_id}")
             return True
 
         except Exception as e:
             logger.error(f"Error subiendo cajas a BigQuery: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def backfill_fingerprints(self) -> int:
+        """
+        Rellena fp_caja y fp_archivo en las filas históricas de T2_CAJAS
+
+        Returns:
+            Cantidad de filas actualizadas
+        """
+        self.create_table_if_not_exists()
+        return backfill_fingerprints(
+            self.client, f"{settings.project_id}.{self.dataset_id}.{self.table_id}", self.fingerprint_columns
+        )
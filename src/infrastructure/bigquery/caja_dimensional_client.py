@@ -0,0 +1,364 @@
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
+import pandas as pd
+from typing import List, Dict, Tuple
+import logging
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.utils.id_utils import sk_hacienda, sk_container
+from src.infrastructure.bigquery.fingerprint_sql import fingerprint_sql
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+from src.infrastructure.dataframes.model_frames import cajas_to_dataframe
+
+logger = logging.getLogger(__name__)
+
+FACT_COLUMNS = [
+    'fp_caja', 'fp_archivo', 'sk_hacienda', 'sk_container', 'nombre_caja', 'codigo_trazabilidad',
+    'temperatura', 'dedos_totales', 'peso_bruto_kg', 'peso_total_kg', 'cantidad_observaciones',
+    'dedos_afectados_totales', 'peso_promedio', 'week_code', 'year_code', 'spec', 'uw', 'ow'
+]
+
+
+def _valor(valor):
+    """Normaliza nulos de pandas (NA/NaN) a None"""
+    return None if pd.isna(valor) else valor
+
+
+class CajaDimensionalClient:
+    """
+    Modelo dimensional de cajas
+
+    Las haciendas y containers se guardan una sola vez en D_HACIENDAS y
+    D_CONTAINERS con claves sustitutas INT64 estables (fingerprint de la clave
+    natural), y T2_CAJAS_FACT guarda solo esas claves. La vista V_T2_CAJAS
+    reconstruye las columnas de T2_CAJAS (incluyendo id_caja e id_archivo)
+    uniendo con T1_ARCHIVOS y las dimensiones.
+    """
+
+    def __init__(self, client: bigquery.Client = None):
+        self.client = client or bigquery.Client(project=settings.project_id)
+        self.dataset_id = settings.dataset_id
+        self.fact_table_id = "T2_CAJAS_FACT"
+        self.hacienda_table_id = "D_HACIENDAS"
+        self.container_table_id = "D_CONTAINERS"
+        self.view_id = "V_T2_CAJAS"
+        self.archivos_table_id = "T1_ARCHIVOS"
+
+    def _fqn(self, table_id: str) -> str:
+        return f"{settings.project_id}.{self.dataset_id}.{table_id}"
+
+    def create_tables_if_not_exist(self):
+        """Crea dimensiones, tabla de hechos y vista de compatibilidad si no existen"""
+        self._create_table(self.hacienda_table_id, [
+            bigquery.SchemaField("sk_hacienda", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("codigo_hacienda", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("nombre_hacienda", "STRING", mode="NULLABLE"),
+        ])
+        self._create_table(self.container_table_id, [
+            bigquery.SchemaField("sk_container", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("codigo_container", "STRING", mode="NULLABLE"),
+        ])
+        self._create_table(self.fact_table_id, [
+            bigquery.SchemaField("fp_caja", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("fp_archivo", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("sk_hacienda", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("sk_container", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("nombre_caja", "STRING", mode="NULLABLE"),
+            bigquery.SchemaField("codigo_trazabilidad", "STRING", mode="NULLABLE"),
+            bigquery.SchemaField("temperatura", "FLOAT", mode="NULLABLE"),
+            bigquery.SchemaField("dedos_totales", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("peso_bruto_kg", "FLOAT", mode="NULLABLE"),
+            bigquery.SchemaField("peso_total_kg", "FLOAT", mode="NULLABLE"),
+            bigquery.SchemaField("cantidad_observaciones", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("dedos_afectados_totales", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("peso_promedio", "FLOAT", mode="NULLABLE"),
+            bigquery.SchemaField("week_code", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("year_code", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("spec", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("uw", "INTEGER", mode="NULLABLE"),
+            bigquery.SchemaField("ow", "INTEGER", mode="NULLABLE"),
+        ], clustering_fields=["fp_archivo", "sk_hacienda"])
+        self._create_compat_view()
+
+    def _create_table(self, table_id: str, schema: list, clustering_fields: list = None):
+        table_ref = self.client.dataset(self.dataset_id).table(table_id)
+
+        try:
+            self.client.get_table(table_ref)
+            logger.info(f"Tabla {table_id} ya existe")
+        except NotFound:
+            table = bigquery.Table(table_ref, schema=schema)
+            if clustering_fields:
+                table.clustering_fields = clustering_fields
+            self.client.create_table(table)
+            logger.info(f"Tabla {table_id} creada")
+
+    def _create_compat_view(self):
+        """Crea (o actualiza) la vista V_T2_CAJAS con las mismas columnas que T2_CAJAS"""
+        view_ref = self.client.dataset(self.dataset_id).table(self.view_id)
+
+        # id_caja se reconstruye con el mismo formato que CajaProcessorService. Los datos del archivo
+        # salen de un LEFT JOIN a T1 sin duplicados: una caja sin archivo en T1 no desaparece y un
+        # archivo cargado dos veces no duplica sus cajas (igual que T2_CAJAS). Las dimensiones también se
+        # leen sin duplicados: dos cargas concurrentes pueden insertar el mismo sk con sus MERGE
+        view_query = f"""
+        SELECT
+            CONCAT(a.warehouse, '_', CAST(a.annio AS STRING), '_', a.archivo, '_',
+                   REPLACE(f.nombre_caja, ' ', '_'), '_', c.codigo_container, '_',
+                   CAST(h.codigo_hacienda AS STRING), '_', f.codigo_trazabilidad, '_',
+                   REPLACE(h.nombre_hacienda, ' ', '_')) AS id_caja,
+            a.id_archivo,
+            f.nombre_caja,
+            c.codigo_container,
+            h.codigo_hacienda,
+            f.codigo_trazabilidad,
+            h.nombre_hacienda,
+            f.temperatura,
+            f.dedos_totales,
+            f.peso_bruto_kg,
+            f.peso_total_kg,
+            f.cantidad_observaciones,
+            f.dedos_afectados_totales,
+            f.peso_promedio,
+            f.week_code,
+            f.year_code,
+            f.spec,
+            f.uw,
+            f.ow,
+            f.fp_caja,
+            f.fp_archivo
+        FROM `{self._fqn(self.fact_table_id)}` f
+        JOIN (
+            SELECT sk_hacienda, codigo_hacienda, nombre_hacienda
+            FROM `{self._fqn(self.hacienda_table_id)}`
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY sk_hacienda) = 1
+        ) h ON h.sk_hacienda = f.sk_hacienda
+        JOIN (
+            SELECT sk_container, codigo_container
+            FROM `{self._fqn(self.container_table_id)}`
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY sk_container) = 1
+        ) c ON c.sk_container = f.sk_container
+        LEFT JOIN (
+            SELECT fp_archivo, id_archivo, archivo, warehouse, annio
+            FROM `{self._fqn(self.archivos_table_id)}`
+            WHERE fp_archivo IS NOT NULL
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY fp_archivo) = 1
+        ) a ON a.fp_archivo = f.fp_archivo
+        """
+
+        try:
+            view = self.client.get_table(view_ref)
+            if (view.view_query or "").strip() != view_query.strip():
+                view.view_query = view_query
+                self.client.update_table(view, ["view_query"])
+                logger.info(f"Vista {self.view_id} actualizada")
+            else:
+                logger.info(f"Vista {self.view_id} ya existe")
+            return
+        except NotFound:
+            pass
+
+        view = bigquery.Table(view_ref)
+        view.view_query = view_query
+        self.client.create_table(view)
+        logger.info(f"Vista {self.view_id} creada")
+
+    def upload_cajas(self, cajas: List[CajaModel]) -> bool:
+        """
+        Registra las haciendas/containers nuevos y sube las cajas a T2_CAJAS_FACT
+
+        Args:
+            cajas: Lista de modelos CajaModel
+
+        Returns:
+            True si la carga fue exitosa, False en caso contrario
+        """
+        if not cajas:
+            logger.warning("No hay cajas para subir")
+            return False
+
+        return self.upload_cajas_dataframe(cajas_to_dataframe(cajas))
+
+    def upload_cajas_dataframe(self, cajas_df: pd.DataFrame) -> bool:
+        """
+        Igual que upload_cajas pero a partir de un DataFrame con las columnas de T2_CAJAS
+
+        Args:
+            cajas_df: DataFrame de cajas
+
+        Returns:
+            True si la carga fue exitosa, False en caso contrario
+        """
+        if cajas_df.empty:
+            logger.warning("No hay cajas para subir")
+            return False
+
+        try:
+            self.create_tables_if_not_exist()
+
+            haciendas, containers = self._collect_dimensions(cajas_df)
+            self._merge_haciendas(haciendas)
+            self._merge_containers(containers)
+
+            df = self._fact_dataframe(cajas_df, haciendas, containers)
+
+            job_config = bigquery.LoadJobConfig(write_disposition="WRITE_APPEND", autodetect=False)
+            job_rate_limiter.acquire(self._fqn(self.fact_table_id))
+            job = self.client.load_table_from_dataframe(df, self._fqn(self.fact_table_id), job_config=job_config)
+            cost_log.wait(job, f"carga {self.fact_table_id}")
+
+            logger.info(f"Subidas {len(df)} cajas a {self._fqn(self.fact_table_id)} "
+                        f"({len(haciendas)} haciendas, {len(containers)} containers)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error subiendo cajas al modelo dimensional: {e}")
+            return False
+
+    @staticmethod
+    def _claves_hacienda(cajas_df: pd.DataFrame) -> List[tuple]:
+        return [
+            (None if pd.isna(codigo) else int(codigo), _valor(nombre))
+            for codigo, nombre in zip(cajas_df['codigo_hacienda'], cajas_df['nombre_hacienda'])
+        ]
+
+    def _collect_dimensions(self, cajas_df: pd.DataFrame) -> Tuple[Dict[tuple, int], Dict[str, int]]:
+        """Calcula una sola vez la clave sustituta de cada hacienda y container del lote"""
+        haciendas: Dict[tuple, int] = {}
+        containers: Dict[str, int] = {}
+
+        for clave_hacienda in set(self._claves_hacienda(cajas_df)):
+            haciendas[clave_hacienda] = sk_hacienda(*clave_hacienda)
+        for codigo in cajas_df['codigo_container'].unique():
+            codigo = _valor(codigo)
+            containers[codigo] = sk_container(codigo)
+
+        return haciendas, containers
+
+    def _merge_haciendas(self, haciendas: Dict[tuple, int]):
+        filas = [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("sk_hacienda", "INT64", sk),
+                bigquery.ScalarQueryParameter("codigo_hacienda", "INT64", codigo),
+                bigquery.ScalarQueryParameter("nombre_hacienda", "STRING", nombre),
+            )
+            for (codigo, nombre), sk in haciendas.items()
+        ]
+        self._merge_dimension(self.hacienda_table_id, "sk_hacienda",
+                              ["sk_hacienda", "codigo_hacienda", "nombre_hacienda"], filas)
+
+    def _merge_containers(self, containers: Dict[str, int]):
+        filas = [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("sk_container", "INT64", sk),
+                bigquery.ScalarQueryParameter("codigo_container", "STRING", codigo),
+            )
+            for codigo, sk in containers.items()
+        ]
+        self._merge_dimension(self.container_table_id, "sk_container",
+                              ["sk_container", "codigo_container"], filas)
+
+    def _merge_dimension(self, table_id: str, clave: str, columnas: List[str], filas: list):
+        """
+        Inserta solo las filas cuya clave sustituta aún no existe (MERGE idempotente)
+
+        Dos cargas simultáneas pueden insertar la misma clave (la clave se deriva del
+        valor, así que las filas son idénticas); V_T2_CAJAS lee las dimensiones sin duplicados.
+        """
+        if not filas:
+            return
+
+        lista_columnas = ", ".join(columnas)
+        valores = ", ".join(f"S.{columna}" for columna in columnas)
+        query = f"""
+        MERGE `{self._fqn(table_id)}` D
+        USING (SELECT * FROM UNNEST(@filas)) S
+        ON D.{clave} = S.{clave}
+        WHEN NOT MATCHED THEN
+            INSERT ({lista_columnas}) VALUES ({valores})
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("filas", "STRUCT", filas)]
+        )
+        job_rate_limiter.acquire(self._fqn(table_id))
+        filas_nuevas = self._run_dml(query, job_config, f"merge {table_id}")
+        logger.info(f"{table_id}: {filas_nuevas} filas nuevas")
+
+    def _fact_dataframe(self, cajas_df: pd.DataFrame, haciendas: Dict[tuple, int],
+                        containers: Dict[str, int]) -> pd.DataFrame:
+        """Convierte cajas a filas de la tabla de hechos (solo claves, sin strings repetidos)"""
+        df = cajas_df.copy()
+        df['sk_hacienda'] = pd.array([haciendas[clave] for clave in self._claves_hacienda(cajas_df)], dtype='Int64')
+        df['sk_container'] = pd.array([containers[_valor(codigo)] for codigo in cajas_df['codigo_container']],
+                                      dtype='Int64')
+        return df[FACT_COLUMNS].reset_index(drop=True)
+
+    def migrate_from_flat_table(self, flat_table_id: str = "T2_CAJAS") -> int:
+        """
+        Copia el histórico de T2_CAJAS al modelo dimensional
+
+        Solo inserta cajas cuyo fp_caja aún no está en la tabla de hechos, por lo
+        que puede ejecutarse varias veces.
+
+        Args:
+            flat_table_id: Tabla plana de origen
+
+        Returns:
+            Cantidad de cajas copiadas
+        """
+        self.create_tables_if_not_exist()
+        origen = self._fqn(flat_table_id)
+        sk_hacienda_sql = fingerprint_sql("CONCAT(CAST(codigo_hacienda AS STRING), '|', nombre_hacienda)")
+        sk_container_sql = fingerprint_sql("codigo_container")
+
+        self._run_dml(f"""
+        MERGE `{self._fqn(self.hacienda_table_id)}` D
+        USING (
+            SELECT DISTINCT {sk_hacienda_sql} AS sk_hacienda, codigo_hacienda, nombre_hacienda
+            FROM `{origen}`
+        ) S
+        ON D.sk_hacienda = S.sk_hacienda
+        WHEN NOT MATCHED THEN
+            INSERT (sk_hacienda, codigo_hacienda, nombre_hacienda)
+            VALUES (S.sk_hacienda, S.codigo_hacienda, S.nombre_hacienda)
+        """)
+
+        self._run_dml(f"""
+        MERGE `{self._fqn(self.container_table_id)}` D
+        USING (
+            SELECT DISTINCT {sk_container_sql} AS sk_container, codigo_container
+            FROM `{origen}`
+        ) S
+        ON D.sk_container = S.sk_container
+        WHEN NOT MATCHED THEN
+            INSERT (sk_container, codigo_container)
+            VALUES (S.sk_container, S.codigo_container)
+        """)
+
+        filas = self._run_dml(f"""
+        INSERT INTO `{self._fqn(self.fact_table_id)}` (
+            fp_caja, fp_archivo, sk_hacienda, sk_container, nombre_caja, codigo_trazabilidad,
+            temperatura, dedos_totales, peso_bruto_kg, peso_total_kg, cantidad_observaciones,
+            dedos_afectados_totales, peso_promedio, week_code, year_code, spec, uw, ow
+        )
+        SELECT
+            t.fp_caja, t.fp_archivo, {sk_hacienda_sql}, {sk_container_sql}, t.nombre_caja,
+            t.codigo_trazabilidad, t.temperatura, t.dedos_totales, t.peso_bruto_kg, t.peso_total_kg,
+            t.cantidad_observaciones, t.dedos_afectados_totales, t.peso_promedio, t.week_code,
+            t.year_code, t.spec, t.uw, t.ow
+        FROM `{origen}` t
+        WHERE t.fp_caja NOT IN (SELECT fp_caja FROM `{self._fqn(self.fact_table_id)}`)
+        """)
+
+        logger.info(f"Migradas {filas} cajas de {flat_table_id} a {self.fact_table_id}")
+        return filas
+
+    def _run_dml(self, query: str, job_config: bigquery.QueryJobConfig = None,
+                 etiqueta: str = "migración dimensional") -> int:
+        """Ejecuta una sentencia DML y retorna las filas afectadas"""
+        job = cost_log.run_query(self.client, query, job_config, etiqueta)
+        return job.num_dml_affected_rows or 0
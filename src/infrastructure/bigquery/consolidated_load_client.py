@@ -0,0 +1,180 @@
+from google.cloud import bigquery
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+import logging
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config.settings import settings
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+from src.infrastructure.bigquery.partition_replace_client import PartitionReplaceClient
+from src.infrastructure.dataframes.parsed_batch import table_to_dataframe, table_to_parquet_buffer
+
+try:
+    from google.cloud import storage
+except ImportError:  # pragma: no cover - dependencia opcional
+    storage = None
+
+logger = logging.getLogger(__name__)
+
+
+class ConsolidatedLoadClient(PartitionReplaceClient):
+    """
+    Carga una ventana de lotes en T1/T2 de una sola vez (todo o nada)
+
+    Los Parquet de la ventana se cargan con un load job por tabla a tablas de
+    staging: con LOAD_STAGING_BUCKET se suben a GCS y se cargan todos con un
+    solo job (URI con comodín); si no, se concatenan en un Parquet por tabla.
+    Luego una transacción inserta en T1/T2 solo los archivos que todavía no
+    están en T1, así reintentar una ventana ya cargada no duplica filas. Si
+    algo falla antes del COMMIT no queda nada cargado.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.bucket = settings.load_staging_bucket
+        self._storage_client = None
+
+        if self.bucket and storage is None:
+            logger.warning("LOAD_STAGING_BUCKET requiere el paquete google-cloud-storage; "
+                           "se cargará un Parquet concatenado por tabla")
+            self.bucket = ""
+
+    def load_window(self, ventana: str, archivos: List[str], cajas: List[str]) -> Optional[Set[int]]:
+        """
+        Carga los Parquet de una ventana
+
+        Args:
+            ventana: Nombre de la ventana (para los prefijos en GCS y el log)
+            archivos: Parquet de archivos (columnas de T1_ARCHIVOS), uno por lote
+            cajas: Parquet de cajas (columnas de T2_CAJAS) de esos archivos
+
+        Returns:
+            fp_archivo insertados (vacío si todos ya estaban en T1) o None si la carga falló
+        """
+        staging = []
+        blobs = []
+
+        try:
+            self.bigquery_client.create_dataset_if_not_exists()
+            self.bigquery_client.create_table_if_not_exists()
+            self.caja_bigquery_client.create_table_if_not_exists()
+
+            archivos_table_id = self.bigquery_client.table_id
+            stg_archivos = self._load_staging_files(archivos_table_id, ventana, "archivos", archivos, blobs)
+            staging.append(stg_archivos)
+
+            archivos_fqn = self._fqn(archivos_table_id)
+            columnas_archivos = [campo.name for campo in self.client.get_table(archivos_fqn).schema]
+            inserts = [self._insert_nuevos_sql(archivos_fqn, stg_archivos, columnas_archivos, "fp_archivo")]
+            destinos = [archivos_fqn]
+
+            if cajas:
+                cajas_table_id, stg_cajas, columnas_cajas = self._stage_cajas(ventana, cajas, blobs)
+                staging.append(stg_cajas)
+                cajas_fqn = self._fqn(cajas_table_id)
+                inserts.append(self._insert_nuevos_sql(cajas_fqn, stg_cajas, columnas_cajas, "fp_caja"))
+                destinos.append(cajas_fqn)
+
+            query = f"""
+            BEGIN TRANSACTION;
+
+            CREATE TEMP TABLE fps_nuevos AS
+            SELECT DISTINCT fp_archivo FROM `{stg_archivos}`
+            EXCEPT DISTINCT
+            SELECT fp_archivo FROM `{archivos_fqn}`
+            WHERE fp_archivo IN (SELECT fp_archivo FROM `{stg_archivos}`);
+
+            {"".join(inserts)}
+            COMMIT TRANSACTION;
+
+            SELECT fp_archivo FROM fps_nuevos;
+            """
+            for destino in destinos:
+                job_rate_limiter.acquire(destino)
+            job = cost_log.run_query(self.client, query, etiqueta=f"carga consolidada {ventana}")
+            nuevos = {row.fp_archivo for row in job.result()}
+
+            logger.info(f"Ventana {ventana} cargada: {len(nuevos)} archivos nuevos "
+                        f"({len(archivos)} lotes, {'GCS' if self.bucket else 'Parquet concatenado'})")
+            return nuevos
+
+        except Exception as e:
+            logger.error(f"Error cargando la ventana {ventana}: {e}")
+            return None
+
+        finally:
+            for table_fqn in staging:
+                try:
+                    self.client.delete_table(table_fqn, not_found_ok=True)
+                except Exception as e:
+                    logger.warning(f"No se pudo borrar la tabla de staging {table_fqn} (expira sola): {e}")
+            for blob in blobs:
+                try:
+                    blob.delete()
+                except Exception as e:
+                    logger.warning(f"No se pudo borrar {blob.name} de gs://{self.bucket}: {e}")
+
+    def _stage_cajas(self, ventana: str, rutas: List[str], blobs: list):
+        """Carga las cajas a staging según el modelo configurado; retorna (tabla destino, staging, columnas)"""
+        if settings.cajas_dimensional:
+            # La tabla de hechos necesita las claves de las dimensiones: se arma en memoria como en el reemplazo
+            cajas_df = pd.concat([table_to_dataframe(pq.read_table(ruta)) for ruta in rutas],
+                                 ignore_index=True)
+            table_id, fact_df = self._cajas_target(cajas_df)
+            return table_id, self._load_staging(table_id, fact_df), list(fact_df.columns)
+
+        table_id = self.caja_bigquery_client.table_id
+        staging_fqn = self._load_staging_files(table_id, ventana, "cajas", rutas, blobs)
+        return table_id, staging_fqn, [campo.name for campo in self.client.get_table(self._fqn(table_id)).schema]
+
+    def _load_staging_files(self, table_id: str, ventana: str, tabla: str, rutas: List[str], blobs: list) -> str:
+        """Carga los Parquet a una tabla de staging con el esquema de table_id con un solo load job"""
+        destino = self.client.get_table(self._fqn(table_id))
+        staging_fqn = self._fqn(f"_STG_{table_id}_{uuid.uuid4().hex[:12]}")
+
+        staging = bigquery.Table(staging_fqn, schema=destino.schema)
+        staging.expires = datetime.now(timezone.utc) + timedelta(days=1)
+        self.client.create_table(staging)
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition="WRITE_TRUNCATE",
+            autodetect=False
+        )
+
+        if self.bucket:
+            prefijo = f"staging_cargas/{os.path.basename(ventana)}/{tabla}"
+            bucket = self._storage().bucket(self.bucket)
+            for ruta in rutas:
+                # El nombre del lote es la carpeta del Parquet
+                blob = bucket.blob(f"{prefijo}/{os.path.basename(os.path.dirname(ruta))}.parquet")
+                blob.upload_from_filename(ruta)
+                blobs.append(blob)
+            job = self.client.load_table_from_uri(f"gs://{self.bucket}/{prefijo}/*.parquet", staging_fqn,
+                                                  job_config=job_config)
+        else:
+            tabla_completa = pa.concat_tables([pq.read_table(ruta) for ruta in rutas])
+            job = self.client.load_table_from_file(table_to_parquet_buffer(tabla_completa), staging_fqn,
+                                                   job_config=job_config)
+
+        cost_log.wait(job, f"staging {table_id}")
+        return staging_fqn
+
+    def _storage(self):
+        if self._storage_client is None:
+            self._storage_client = storage.Client(project=settings.project_id)
+        return self._storage_client
+
+    @staticmethod
+    def _insert_nuevos_sql(destino_fqn: str, staging_fqn: str, columnas: List[str], clave: str) -> str:
+        # Solo los archivos nuevos y una fila por clave (un lote repetido dentro de la ventana se inserta una vez)
+        lista = ", ".join(columnas)
+        return (f"INSERT INTO `{destino_fqn}` ({lista}) SELECT {lista} FROM `{staging_fqn}` "
+                f"WHERE fp_archivo IN (SELECT fp_archivo FROM fps_nuevos) "
+                f"QUALIFY ROW_NUMBER() OVER (PARTITION BY {clave}) = 1;\n")
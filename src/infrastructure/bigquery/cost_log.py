@@ -0,0 +1,199 @@
+import copy
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from google.cloud import bigquery
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCostExceeded(Exception):
+    """La consulta supera el límite de bytes configurado (QUERY_MAX_BYTES)"""
+
+
+def _duracion_ms(job) -> Optional[int]:
+    if job.started and job.ended:
+        return int((job.ended - job.started).total_seconds() * 1000)
+    return None
+
+
+class CostLog:
+    """
+    Registro de costo de los jobs de BigQuery (consultas, DML y load jobs)
+
+    Cada job terminado se registra en el log con bytes procesados/facturados,
+    slot ms, duración y job id; si COST_LOG_FILE está configurado, además se
+    agrega una línea JSON por job para seguir cómo crece el costo al crecer
+    T1/T2. Las consultas pueden estimarse antes con un dry run
+    (QUERY_DRY_RUN) y las que superan QUERY_MAX_BYTES se rechazan: primero
+    por la estimación y, si el dry run no es posible, por maximum_bytes_billed.
+    """
+
+    def __init__(self, archivo: Optional[str] = None, max_bytes: Optional[int] = None,
+                 dry_run: Optional[bool] = None):
+        self.archivo = settings.cost_log_file if archivo is None else archivo
+        self.max_bytes = settings.query_max_bytes if max_bytes is None else max_bytes
+        self.dry_run = settings.query_dry_run if dry_run is None else dry_run
+        self._lock = threading.Lock()
+
+    def estimate(self, client: bigquery.Client, query: str,
+                 job_config: Optional[bigquery.QueryJobConfig] = None) -> int:
+        """
+        Estima con un dry run los bytes que procesaría la consulta
+
+        Args:
+            client: Cliente bigquery.Client
+            query: SQL a estimar
+            job_config: Configuración de la consulta (parámetros)
+
+        Returns:
+            Bytes que procesaría la consulta
+        """
+        config = copy.deepcopy(job_config) if job_config else bigquery.QueryJobConfig()
+        config.dry_run = True
+        config.use_query_cache = False
+
+        job = client.query(query, job_config=config)
+        return job.total_bytes_processed or 0
+
+    def start_query(self, client: bigquery.Client, query: str,
+                    job_config: Optional[bigquery.QueryJobConfig] = None,
+                    etiqueta: str = "consulta") -> bigquery.QueryJob:
+        """
+        Inicia una consulta aplicando la estimación y el límite de bytes
+
+        Args:
+            client: Cliente bigquery.Client
+            query: SQL a ejecutar
+            job_config: Configuración de la consulta (parámetros)
+            etiqueta: Nombre de la operación en el log de costos
+
+        Returns:
+            El QueryJob iniciado (sin esperar a que termine)
+
+        Raises:
+            QueryCostExceeded: Si la estimación supera QUERY_MAX_BYTES
+        """
+        if self.dry_run or self.max_bytes:
+            try:
+                estimado = self.estimate(client, query, job_config)
+            except Exception as e:
+                # Los scripts con tablas temporales no siempre admiten dry run
+                logger.warning(f"No se pudo estimar el costo de {etiqueta}: {e}")
+            else:
+                logger.info(f"Costo estimado de {etiqueta}: {estimado:,} bytes")
+                if self.max_bytes and estimado > self.max_bytes:
+                    raise QueryCostExceeded(
+                        f"{etiqueta} procesaría {estimado:,} bytes (límite {self.max_bytes:,})"
+                    )
+
+        if self.max_bytes:
+            job_config = copy.deepcopy(job_config) if job_config else bigquery.QueryJobConfig()
+            job_config.maximum_bytes_billed = self.max_bytes
+
+        return client.query(query, job_config=job_config)
+
+    def run_query(self, client: bigquery.Client, query: str,
+                  job_config: Optional[bigquery.QueryJobConfig] = None,
+                  etiqueta: str = "consulta") -> bigquery.QueryJob:
+        """Ejecuta la consulta, espera a que termine y registra su costo"""
+        return self.wait(self.start_query(client, query, job_config, etiqueta), etiqueta)
+
+    def wait(self, job, etiqueta: str):
+        """Espera un job ya iniciado y registra su costo (también si falla)"""
+        try:
+            job.result()
+        finally:
+            self.record(job, etiqueta)
+        return job
+
+    def record(self, job, etiqueta: str) -> dict:
+        """
+        Registra las estadísticas de un job terminado
+
+        Args:
+            job: QueryJob o LoadJob
+            etiqueta: Nombre de la operación
+
+        Returns:
+            Diccionario con las estadísticas registradas
+        """
+        registro = {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "etiqueta": etiqueta,
+            "job_id": job.job_id,
+            "tipo": job.job_type,
+            "estado": "error" if job.error_result else ("ok" if job.state == "DONE" else str(job.state).lower()),
+            "duracion_ms": _duracion_ms(job),
+            "slot_ms": getattr(job, "slot_millis", None),
+            "bytes_procesados": getattr(job, "total_bytes_processed", None),
+            "bytes_facturados": getattr(job, "total_bytes_billed", None),
+            "cache": getattr(job, "cache_hit", None),
+            "filas_dml": getattr(job, "num_dml_affected_rows", None),
+            "filas_cargadas": getattr(job, "output_rows", None),
+            "bytes_cargados": getattr(job, "output_bytes", None),
+        }
+
+        if registro["slot_ms"] is None:
+            # LoadJob no expone slot_millis como propiedad
+            slot_ms = job._properties.get("statistics", {}).get("totalSlotMs")
+            registro["slot_ms"] = int(slot_ms) if slot_ms is not None else None
+
+        logger.info(
+            f"Costo {etiqueta} [{registro['job_id']}]: {registro['bytes_procesados'] or 0:,} bytes procesados, "
+            f"{registro['bytes_facturados'] or 0:,} facturados, {registro['slot_ms'] or 0} slot ms, "
+            f"{registro['duracion_ms'] or 0} ms"
+        )
+
+        if self.archivo:
+            try:
+                directorio = os.path.dirname(self.archivo)
+                if directorio:
+                    os.makedirs(directorio, exist_ok=True)
+                with self._lock, open(self.archivo, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(registro) + "\n")
+            except Exception as e:
+                logger.warning(f"No se pudo escribir el log de costos {self.archivo}: {e}")
+
+        return registro
+
+
+def resumir_costos(archivo: Optional[str] = None) -> List[dict]:
+    """
+    Totales del log de costos por etiqueta
+
+    Args:
+        archivo: Archivo JSONL del log (por defecto COST_LOG_FILE)
+
+    Returns:
+        Lista de diccionarios con etiqueta, jobs, bytes procesados/facturados y slot ms
+    """
+    archivo = archivo or settings.cost_log_file
+    if not archivo or not os.path.exists(archivo):
+        return []
+
+    totales = {}
+    with open(archivo, encoding="utf-8") as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            total = totales.setdefault(registro["etiqueta"], {
+                "etiqueta": registro["etiqueta"], "jobs": 0,
+                "bytes_procesados": 0, "bytes_facturados": 0, "slot_ms": 0,
+            })
+            total["jobs"] += 1
+            for campo in ("bytes_procesados", "bytes_facturados", "slot_ms"):
+                total[campo] += registro.get(campo) or 0
+
+    return sorted(totales.values(), key=lambda total: total["bytes_facturados"], reverse=True)
+
+
+# Compartido por todos los clientes del proceso
+cost_log = CostLog()
@@ -0,0 +1,89 @@
+import logging
+
+from src.infrastructure.bigquery.cost_log import cost_log
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint_sql(columna: str) -> str:
+    """
+    Expresión SQL de BigQuery equivalente a id_utils.fingerprint
+
+    Arma el INT64 con los primeros 8 bytes de SHA256(columna) en dos mitades de
+    32 bits, ya que CAST de un hexadecimal de 16 dígitos desborda INT64.
+
+    Args:
+        columna: Columna STRING con el identificador legible
+
+    Returns:
+        Expresión SQL que produce el fingerprint INT64
+    """
+    return (
+        f"((CAST(CONCAT('0x', TO_HEX(SUBSTR(SHA256({columna}), 1, 4))) AS INT64) << 32)"
+        f" | CAST(CONCAT('0x', TO_HEX(SUBSTR(SHA256({columna}), 5, 4))) AS INT64))"
+    )
+
+
+def ensure_fingerprint_columns(client, table, columnas: dict, clustering_fields: list) -> bool:
+    """
+    Agrega las columnas de fingerprint a una tabla existente y rellena sus filas
+
+    Tablas creadas antes de los fingerprints no tienen las columnas; se agregan,
+    se actualiza el clustering y se rellenan las filas históricas en SQL para que
+    la verificación de duplicados por fingerprint no deje pasar archivos ya cargados.
+
+    Args:
+        client: Cliente bigquery.Client
+        table: Tabla obtenida con client.get_table
+        columnas: Diccionario {columna_fingerprint: columna_id_legible}
+        clustering_fields: Columnas de clustering de la tabla
+
+    Returns:
+        True si la tabla tuvo que migrarse
+    """
+    from google.cloud import bigquery
+
+    existentes = {campo.name for campo in table.schema}
+    faltantes = [fp for fp in columnas if fp not in existentes]
+
+    if not faltantes:
+        return False
+
+    logger.info(f"Agregando columnas {', '.join(faltantes)} a {table.table_id}")
+    table.schema = list(table.schema) + [
+        bigquery.SchemaField(fp, "INTEGER", mode="NULLABLE") for fp in faltantes
+    ]
+    table.clustering_fields = clustering_fields
+    client.update_table(table, ["schema", "clustering_fields"])
+
+    backfill_fingerprints(client, f"{table.project}.{table.dataset_id}.{table.table_id}", columnas)
+    return True
+
+
+def backfill_fingerprints(client, table_fqn: str, columnas: dict) -> int:
+    """
+    Calcula en BigQuery los fingerprints de las filas que aún no los tienen
+
+    Args:
+        client: Cliente bigquery.Client
+        table_fqn: Tabla como proyecto.dataset.tabla
+        columnas: Diccionario {columna_fingerprint: columna_id_legible}
+
+    Returns:
+        Cantidad de filas actualizadas
+    """
+    asignaciones = ",\n            ".join(
+        f"{fp} = {fingerprint_sql(id_col)}" for fp, id_col in columnas.items()
+    )
+    condicion = " OR ".join(f"{fp} IS NULL" for fp in columnas)
+
+    query = f"""
+        UPDATE `{table_fqn}`
+        SET {asignaciones}
+        WHERE {condicion}
+    """
+
+    job = cost_log.run_query(client, query, etiqueta=f"fingerprints {table_fqn}")
+    filas = job.num_dml_affected_rows or 0
+    logger.info(f"Fingerprints rellenados en {table_fqn}: {filas} filas")
+    return filas
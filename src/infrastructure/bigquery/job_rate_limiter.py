@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobRateLimiter:
+    """
+    Token bucket por tabla para los jobs que modifican tablas (loads y DML)
+
+    BigQuery limita las operaciones que actualizan una misma tabla (5 cada 10
+    segundos) y la cantidad de load jobs diarios por tabla. Antes de lanzar un
+    job se pide un token para la tabla destino; si no hay, el hilo espera en
+    lugar de recibir un error de cuota. El límite es por proceso.
+    """
+
+    def __init__(self, jobs: Optional[int] = None, segundos: Optional[float] = None):
+        self.capacidad = jobs or settings.job_rate_jobs
+        self.segundos = segundos or settings.job_rate_seconds
+        self._tokens: Dict[str, float] = {}
+        self._ultimo: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.esperas = 0
+
+    def acquire(self, tabla: str):
+        """
+        Espera hasta que haya un token para la tabla y lo consume
+
+        Args:
+            tabla: Nombre completo de la tabla destino del job
+        """
+        tasa = self.capacidad / self.segundos
+
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                tokens = self._tokens.get(tabla, float(self.capacidad))
+                tokens = min(self.capacidad, tokens + (ahora - self._ultimo.get(tabla, ahora)) * tasa)
+                self._ultimo[tabla] = ahora
+
+                if tokens >= 1:
+                    self._tokens[tabla] = tokens - 1
+                    return
+
+                self._tokens[tabla] = tokens
+                espera = (1 - tokens) / tasa
+                self.esperas += 1
+
+            logger.debug(f"Límite de jobs para {tabla}: esperando {espera:.1f}s")
+            time.sleep(espera)
+
+
+# Compartido por todos los clientes del proceso
+job_rate_limiter = JobRateLimiter()
@@ -0,0 +1,149 @@
+from google.cloud import bigquery
+from datetime import datetime, timedelta, timezone
+import logging
+import uuid
+
+import pandas as pd
+
+from src.config.settings import settings
+from src.infrastructure.bigquery.bigquery_client import BigQueryClient
+from src.infrastructure.bigquery.caja_bigquery_client import CajaBigQueryClient
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionReplaceClient:
+    """
+    Reemplaza de forma atómica las semanas de un warehouse en T1/T2
+
+    Los archivos y cajas nuevos se cargan a tablas de staging y luego, en una
+    transacción, se borran las filas de las semanas indicadas (y las de los
+    archivos recargados, por si cambiaron de semana) y se insertan las nuevas.
+    Repetir la misma recarga deja exactamente el mismo resultado, sin
+    verificación de duplicados fila por fila.
+    """
+
+    def __init__(self):
+        self.bigquery_client = BigQueryClient()
+        self.caja_bigquery_client = CajaBigQueryClient()
+        self.client = self.bigquery_client.client
+        self.dataset_id = settings.dataset_id
+
+    def _fqn(self, table_id: str) -> str:
+        return f"{settings.project_id}.{self.dataset_id}.{table_id}"
+
+    def replace_weeks(self, warehouse: str, annio: int, semana_desde: int, semana_hasta: int,
+                      archivos_df: pd.DataFrame, cajas_df: pd.DataFrame) -> bool:
+        """
+        Reemplaza las semanas [semana_desde, semana_hasta] del warehouse y año
+
+        Args:
+            warehouse: Warehouse a reemplazar
+            annio: Año de las semanas
+            semana_desde: Semana inicial (incluida)
+            semana_hasta: Semana final (incluida)
+            archivos_df: Archivos procesados de esas semanas (columnas de T1_ARCHIVOS)
+            cajas_df: Cajas de esos archivos (columnas de T2_CAJAS)
+
+        Returns:
+            True si el reemplazo fue exitoso
+        """
+        staging = []
+
+        try:
+            self.bigquery_client.create_dataset_if_not_exists()
+            self.bigquery_client.create_table_if_not_exists()
+            self.caja_bigquery_client.create_table_if_not_exists()
+
+            cajas_table_id, cajas_df = self._cajas_target(cajas_df)
+
+            stg_archivos = self._load_staging(self.bigquery_client.table_id, archivos_df)
+            staging.append(stg_archivos)
+
+            archivos_fqn = self._fqn(self.bigquery_client.table_id)
+            cajas_fqn = self._fqn(cajas_table_id)
+            inserts = [self._insert_sql(archivos_fqn, stg_archivos, archivos_df)]
+
+            if not cajas_df.empty:
+                stg_cajas = self._load_staging(cajas_table_id, cajas_df)
+                staging.append(stg_cajas)
+                inserts.append(self._insert_sql(cajas_fqn, stg_cajas, cajas_df))
+
+            query = f"""
+            BEGIN TRANSACTION;
+
+            CREATE TEMP TABLE fps_reemplazados AS
+            SELECT fp_archivo FROM `{archivos_fqn}`
+            WHERE warehouse = @warehouse AND annio = @annio AND semana BETWEEN @desde AND @hasta
+            UNION DISTINCT
+            SELECT fp_archivo FROM `{stg_archivos}`;
+
+            DELETE FROM `{cajas_fqn}` WHERE fp_archivo IN (SELECT fp_archivo FROM fps_reemplazados);
+            DELETE FROM `{archivos_fqn}` WHERE fp_archivo IN (SELECT fp_archivo FROM fps_reemplazados);
+
+            {"".join(inserts)}
+            COMMIT TRANSACTION;
+            """
+            job_config = bigquery.QueryJobConfig(query_parameters=[
+                bigquery.ScalarQueryParameter("warehouse", "STRING", warehouse),
+                bigquery.ScalarQueryParameter("annio", "INT64", annio),
+                bigquery.ScalarQueryParameter("desde", "INT64", semana_desde),
+                bigquery.ScalarQueryParameter("hasta", "INT64", semana_hasta),
+            ])
+            job_rate_limiter.acquire(archivos_fqn)
+            job_rate_limiter.acquire(cajas_fqn)
+            cost_log.run_query(self.client, query, job_config, f"reemplazo semanas {warehouse} {annio}")
+
+            logger.info(f"Reemplazadas semanas {semana_desde}-{semana_hasta} de {warehouse} {annio}: "
+                        f"{len(archivos_df)} archivos, {len(cajas_df)} cajas")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error reemplazando semanas {semana_desde}-{semana_hasta} de {warehouse} {annio}: {e}")
+            return False
+
+        finally:
+            for table_fqn in staging:
+                try:
+                    self.client.delete_table(table_fqn, not_found_ok=True)
+                except Exception as e:
+                    logger.warning(f"No se pudo borrar la tabla de staging {table_fqn} (expira sola): {e}")
+
+    def _cajas_target(self, cajas_df: pd.DataFrame):
+        """Tabla destino y filas de las cajas según el modelo configurado"""
+        if not settings.cajas_dimensional or cajas_df.empty:
+            return self.caja_bigquery_client.table_id, cajas_df
+
+        dimensional = self.caja_bigquery_client.dimensional_client
+        dimensional.create_tables_if_not_exist()
+
+        # Las dimensiones solo crecen (MERGE de inserción): pueden actualizarse fuera de la transacción
+        haciendas, containers = dimensional._collect_dimensions(cajas_df)
+        dimensional._merge_haciendas(haciendas)
+        dimensional._merge_containers(containers)
+        return dimensional.fact_table_id, dimensional._fact_dataframe(cajas_df, haciendas, containers)
+
+    @staticmethod
+    def _insert_sql(destino_fqn: str, staging_fqn: str, df: pd.DataFrame) -> str:
+        columnas = ", ".join(df.columns)
+        return f"INSERT INTO `{destino_fqn}` ({columnas}) SELECT {columnas} FROM `{staging_fqn}`;\n"
+
+    def _load_staging(self, table_id: str, df: pd.DataFrame) -> str:
+        """Carga el DataFrame a una tabla de staging con el esquema de table_id (expira en un día)"""
+        destino = self.client.get_table(self._fqn(table_id))
+        staging_fqn = self._fqn(f"_STG_{table_id}_{uuid.uuid4().hex[:12]}")
+
+        staging = bigquery.Table(staging_fqn, schema=destino.schema)
+        staging.expires = datetime.now(timezone.utc) + timedelta(days=1)
+        self.client.create_table(staging)
+
+        job_config = bigquery.LoadJobConfig(
+            write_disposition="WRITE_TRUNCATE",
+            schema=destino.schema,
+            autodetect=False
+        )
+        cost_log.wait(self.client.load_table_from_dataframe(df, staging_fqn, job_config=job_config),
+                      f"staging {table_id}")
+        return staging_fqn
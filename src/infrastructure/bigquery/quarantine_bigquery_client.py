@@ -0,0 +1,60 @@
+from google.cloud import bigquery
+import pyarrow as pa
+import logging
+
+from src.config.settings import settings
+from src.infrastructure.bigquery.cost_log import cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+from src.infrastructure.dataframes.parsed_batch import table_to_parquet_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class QuarantineBigQueryClient:
+    """
+    Carga las filas en cuarentena en T4_CUARENTENA_ARCHIVOS / T4_CUARENTENA_CAJAS
+
+    Las tablas tienen las columnas de T1/T2 más motivos y fecha_cuarentena. El
+    load job (Parquet) las crea con el esquema del lote la primera vez.
+    """
+
+    def __init__(self, client: bigquery.Client = None):
+        self.client = client or bigquery.Client(project=settings.project_id)
+        self.dataset_id = settings.dataset_id
+        self.table_ids = {"archivos": "T4_CUARENTENA_ARCHIVOS", "cajas": "T4_CUARENTENA_CAJAS"}
+
+    def upload(self, archivos: pa.Table, cajas: pa.Table) -> bool:
+        """
+        Agrega las filas en cuarentena
+
+        Args:
+            archivos: Archivos en cuarentena (con motivos)
+            cajas: Cajas en cuarentena (con motivos)
+
+        Returns:
+            True si las cargas fueron exitosas
+        """
+        exito = True
+        for tabla, datos in (("archivos", archivos), ("cajas", cajas)):
+            if datos.num_rows and not self._upload_table(self.table_ids[tabla], datos):
+                exito = False
+        return exito
+
+    def _upload_table(self, table_id: str, table: pa.Table) -> bool:
+        destino = f"{settings.project_id}.{self.dataset_id}.{table_id}"
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition="WRITE_APPEND",
+            create_disposition="CREATE_IF_NEEDED",
+        )
+
+        try:
+            job_rate_limiter.acquire(destino)
+            job = self.client.load_table_from_file(table_to_parquet_buffer(table), destino, job_config=job_config)
+            cost_log.wait(job, f"carga {table_id}")
+            logger.info(f"Subidas {table.num_rows} filas en cuarentena a {destino}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error subiendo la cuarentena a {destino}: {e}")
+            return False
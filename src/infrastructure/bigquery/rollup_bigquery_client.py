@@ -0,0 +1,296 @@
+from datetime import datetime, timezone
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
+from typing import Iterable, List, Tuple
+import logging
+import time
+
+from src.config.settings import settings
+from src.infrastructure.bigquery.cost_log import QueryCostExceeded, cost_log
+from src.infrastructure.bigquery.job_rate_limiter import job_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+_METRICAS_SCHEMA = [
+    bigquery.SchemaField("nombre_hacienda", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("total_cajas", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("total_dedos", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("peso_total_kg", "FLOAT", mode="NULLABLE"),
+    bigquery.SchemaField("total_uw", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("total_ow", "INTEGER", mode="NULLABLE"),
+]
+
+TOTALES_ARCHIVO_SCHEMA = [
+    bigquery.SchemaField("fp_archivo", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("warehouse", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("annio", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("semana", "INTEGER", mode="REQUIRED"),
+    *_METRICAS_SCHEMA,
+    bigquery.SchemaField("cargado", "TIMESTAMP", mode="NULLABLE"),
+]
+
+
+def _supera_limite(error: Exception) -> bool:
+    """True si la consulta se rechazó por QUERY_MAX_BYTES o maximum_bytes_billed (reintentar no sirve)"""
+    if isinstance(error, QueryCostExceeded):
+        return True
+    razones = [e.get("reason") for e in getattr(error, "errors", None) or [] if isinstance(e, dict)]
+    return "bytesBilledLimitExceeded" in razones or "bytesBilledLimitExceeded" in str(error)
+
+
+class RollupBigQueryClient:
+    """
+    Mantiene T3_RESUMEN_SEMANAL: totales por warehouse/año/semana/hacienda
+
+    Cada carga guarda en T3_TOTALES_ARCHIVO los totales por archivo y hacienda
+    calculados al parsear (unas pocas filas por libro) y recalcula con un MERGE
+    solo las semanas afectadas a partir de esa tabla. Así el costo de una carga
+    no crece con el histórico de T2_CAJAS y los reportes leen unos cientos de
+    filas en lugar de todas las cajas.
+    """
+
+    def __init__(self, client: bigquery.Client = None):
+        self.client = client or bigquery.Client(project=settings.project_id)
+        self.dataset_id = settings.dataset_id
+        self.table_id = "T3_RESUMEN_SEMANAL"
+        self.totales_table_id = "T3_TOTALES_ARCHIVO"
+        self.archivos_table_id = "T1_ARCHIVOS"
+
+    def _fqn(self, table_id: str) -> str:
+        return f"{settings.project_id}.{self.dataset_id}.{table_id}"
+
+    @property
+    def cajas_source_id(self) -> str:
+        """Tabla o vista con las columnas de T2_CAJAS según el modelo configurado"""
+        return "V_T2_CAJAS" if settings.cajas_dimensional else "T2_CAJAS"
+
+    def create_table_if_not_exists(self):
+        """Crea las tablas T3_RESUMEN_SEMANAL y T3_TOTALES_ARCHIVO si no existen"""
+        schemas = {
+            self.table_id: [
+                bigquery.SchemaField("warehouse", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("annio", "INTEGER", mode="REQUIRED"),
+                bigquery.SchemaField("semana", "INTEGER", mode="REQUIRED"),
+                *_METRICAS_SCHEMA,
+                bigquery.SchemaField("actualizado", "TIMESTAMP", mode="NULLABLE"),
+            ],
+            self.totales_table_id: TOTALES_ARCHIVO_SCHEMA,
+        }
+
+        for table_id, schema in schemas.items():
+            table_ref = self.client.dataset(self.dataset_id).table(table_id)
+            try:
+                self.client.get_table(table_ref)
+                logger.info(f"Tabla {table_id} ya existe")
+            except NotFound:
+                table = bigquery.Table(table_ref, schema=schema)
+                table.clustering_fields = ["warehouse", "annio", "semana"]
+                self.client.create_table(table)
+                logger.info(f"Tabla {table_id} creada")
+
+    def record_files(self, filas: List[dict]) -> bool:
+        """
+        Agrega a T3_TOTALES_ARCHIVO los totales de los archivos recién subidos
+
+        Si un archivo se registra más de una vez, rebuild_weeks usa solo su
+        registro más reciente.
+
+        Args:
+            filas: Totales por archivo y hacienda (WeeklyRollup.file_totals)
+
+        Returns:
+            True si la carga fue exitosa
+        """
+        if not filas:
+            return True
+
+        cargado = datetime.now(timezone.utc).isoformat()
+        filas = [{**fila, "cargado": cargado} for fila in filas]
+        job_config = bigquery.LoadJobConfig(
+            schema=TOTALES_ARCHIVO_SCHEMA,
+            write_disposition="WRITE_APPEND",
+        )
+
+        try:
+            self.create_table_if_not_exists()
+            job_rate_limiter.acquire(self._fqn(self.totales_table_id))
+            job = self.client.load_table_from_json(filas, self._fqn(self.totales_table_id), job_config=job_config)
+            cost_log.wait(job, f"carga {self.totales_table_id}")
+            logger.info(f"{self.totales_table_id}: {len(filas)} filas")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error guardando totales en {self.totales_table_id}: {e}")
+            return False
+
+    def replace_files(self, warehouse: str, annio: int, semana_desde: int, semana_hasta: int,
+                      filas: List[dict]) -> bool:
+        """
+        Reemplaza en T3_TOTALES_ARCHIVO los totales de un rango de semanas (backfill)
+
+        Args:
+            warehouse: Warehouse recargado
+            annio: Año recargado
+            semana_desde: Semana inicial (incluida)
+            semana_hasta: Semana final (incluida)
+            filas: Totales por archivo y hacienda de los libros recargados
+
+        Returns:
+            True si el reemplazo fue exitoso
+        """
+        query = f"""
+        DELETE FROM `{self._fqn(self.totales_table_id)}`
+        WHERE (warehouse = @warehouse AND annio = @annio AND semana BETWEEN @desde AND @hasta)
+           OR fp_archivo IN UNNEST(@fps)
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("warehouse", "STRING", warehouse),
+            bigquery.ScalarQueryParameter("annio", "INT64", annio),
+            bigquery.ScalarQueryParameter("desde", "INT64", semana_desde),
+            bigquery.ScalarQueryParameter("hasta", "INT64", semana_hasta),
+            bigquery.ArrayQueryParameter("fps", "INT64", sorted({fila["fp_archivo"] for fila in filas})),
+        ])
+
+        try:
+            self.create_table_if_not_exists()
+            job_rate_limiter.acquire(self._fqn(self.totales_table_id))
+            cost_log.run_query(self.client, query, job_config, f"reemplazo {self.totales_table_id}")
+        except Exception as e:
+            logger.error(f"Error reemplazando totales en {self.totales_table_id}: {e}")
+            return False
+
+        return self.record_files(filas)
+
+    def rebuild_file_totals(self, semanas: Iterable[Tuple[str, int, int]]) -> bool:
+        """
+        Recalcula T3_TOTALES_ARCHIVO desde T1/T2 para las semanas indicadas
+
+        Es la única consulta que recorre T2_CAJAS: sirve para poblar la tabla con
+        el histórico cargado antes de que existiera o repararla. Pasa por
+        QUERY_MAX_BYTES como cualquier consulta; para semanas grandes puede hacer
+        falta subir el límite solo para esta ejecución.
+
+        Args:
+            semanas: Tuplas (warehouse, annio, semana) a recalcular
+
+        Returns:
+            True si la actualización fue exitosa
+        """
+        semanas = sorted(set(semanas))
+        if not semanas:
+            return True
+
+        # ON FALSE: reemplazo atómico de las filas de esas semanas
+        query = f"""
+        MERGE `{self._fqn(self.totales_table_id)}` F
+        USING (
+            SELECT
+                a.fp_archivo, a.warehouse, a.annio, a.semana, c.nombre_hacienda,
+                COUNT(*) AS total_cajas, SUM(c.dedos_totales) AS total_dedos,
+                SUM(c.peso_total_kg) AS peso_total_kg, SUM(c.uw) AS total_uw, SUM(c.ow) AS total_ow
+            FROM (
+                SELECT fp_archivo, warehouse, annio, semana
+                FROM `{self._fqn(self.archivos_table_id)}`
+                WHERE CONCAT(warehouse, '|', CAST(annio AS STRING), '|', CAST(semana AS STRING)) IN UNNEST(@claves)
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY fp_archivo) = 1
+            ) a
+            JOIN `{self._fqn(self.cajas_source_id)}` c ON c.fp_archivo = a.fp_archivo
+            GROUP BY a.fp_archivo, a.warehouse, a.annio, a.semana, c.nombre_hacienda
+        ) D
+        ON FALSE
+        WHEN NOT MATCHED BY TARGET THEN INSERT
+            (fp_archivo, warehouse, annio, semana, nombre_hacienda, total_cajas, total_dedos,
+             peso_total_kg, total_uw, total_ow, cargado)
+        VALUES
+            (D.fp_archivo, D.warehouse, D.annio, D.semana, D.nombre_hacienda, D.total_cajas, D.total_dedos,
+             D.peso_total_kg, D.total_uw, D.total_ow, CURRENT_TIMESTAMP())
+        WHEN NOT MATCHED BY SOURCE
+             AND CONCAT(F.warehouse, '|', CAST(F.annio AS STRING), '|', CAST(F.semana AS STRING)) IN UNNEST(@claves)
+        THEN DELETE
+        """
+        return self._merge(query, semanas, self.totales_table_id)
+
+    def rebuild_weeks(self, semanas: Iterable[Tuple[str, int, int]], intentos: int = 3) -> bool:
+        """
+        Recalcula desde T3_TOTALES_ARCHIVO las semanas indicadas
+
+        El MERGE toma como origen los totales de esas semanas sumados sobre
+        T3_TOTALES_ARCHIVO (el registro más reciente de cada archivo), no deltas
+        del cliente: repetirlo deja el mismo resultado, así que un job reintentado
+        no cuenta dos veces y, si dos cargas lo ejecutan a la vez, la que falla
+        por conflicto se reintenta. Lee solo filas por archivo, nunca T2_CAJAS.
+
+        Args:
+            semanas: Tuplas (warehouse, annio, semana) a recalcular
+            intentos: Intentos ante errores (ej. conflicto con otro MERGE concurrente)
+
+        Returns:
+            True si la actualización fue exitosa
+        """
+        semanas = sorted(set(semanas))
+        if not semanas:
+            return True
+
+        query = f"""
+        MERGE `{self._fqn(self.table_id)}` R
+        USING (
+            SELECT
+                warehouse, annio, semana, nombre_hacienda,
+                SUM(total_cajas) AS total_cajas, SUM(total_dedos) AS total_dedos,
+                SUM(peso_total_kg) AS peso_total_kg, SUM(total_uw) AS total_uw, SUM(total_ow) AS total_ow
+            FROM (
+                SELECT *
+                FROM `{self._fqn(self.totales_table_id)}`
+                WHERE CONCAT(warehouse, '|', CAST(annio AS STRING), '|', CAST(semana AS STRING)) IN UNNEST(@claves)
+                QUALIFY DENSE_RANK() OVER (PARTITION BY fp_archivo ORDER BY cargado DESC) = 1
+            )
+            GROUP BY warehouse, annio, semana, nombre_hacienda
+        ) D
+        ON R.warehouse = D.warehouse AND R.annio = D.annio AND R.semana = D.semana
+           AND R.nombre_hacienda IS NOT DISTINCT FROM D.nombre_hacienda
+        WHEN MATCHED THEN UPDATE SET
+            total_cajas = D.total_cajas,
+            total_dedos = D.total_dedos,
+            peso_total_kg = D.peso_total_kg,
+            total_uw = D.total_uw,
+            total_ow = D.total_ow,
+            actualizado = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED BY TARGET THEN INSERT
+            (warehouse, annio, semana, nombre_hacienda, total_cajas, total_dedos,
+             peso_total_kg, total_uw, total_ow, actualizado)
+        VALUES
+            (D.warehouse, D.annio, D.semana, D.nombre_hacienda, D.total_cajas, D.total_dedos,
+             D.peso_total_kg, D.total_uw, D.total_ow, CURRENT_TIMESTAMP())
+        WHEN NOT MATCHED BY SOURCE
+             AND CONCAT(R.warehouse, '|', CAST(R.annio AS STRING), '|', CAST(R.semana AS STRING)) IN UNNEST(@claves)
+        THEN DELETE
+        """
+        return self._merge(query, semanas, self.table_id, intentos)
+
+    def _merge(self, query: str, semanas: List[Tuple[str, int, int]], table_id: str, intentos: int = 3) -> bool:
+        """Ejecuta un MERGE por semanas (parámetro @claves) reintentando conflictos, nunca el límite de bytes"""
+        claves = [f"{warehouse}|{annio}|{semana}" for warehouse, annio, semana in semanas]
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("claves", "STRING", claves)]
+        )
+
+        for intento in range(1, intentos + 1):
+            try:
+                self.create_table_if_not_exists()
+                job_rate_limiter.acquire(self._fqn(table_id))
+                cost_log.run_query(self.client, query, job_config, f"merge {table_id}")
+
+                logger.info(f"{table_id}: recalculadas {len(semanas)} semanas")
+                return True
+
+            except Exception as e:
+                if _supera_limite(e):
+                    # La misma consulta volvería a superar el límite
+                    logger.error(f"Error actualizando {table_id}: {e}")
+                    return False
+                if intento == intentos:
+                    logger.error(f"Error actualizando {table_id}: {e}")
+                    return False
+                logger.warning(f"Error actualizando {table_id} (intento {intento}/{intentos}): {e}. Reintentando")
+                time.sleep(2 ** intento)
+        return False
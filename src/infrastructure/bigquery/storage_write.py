@@ -0,0 +1,388 @@
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+from src.config.settings import settings
+
+try:
+    from google.cloud import bigquery_storage_v1
+    from google.cloud.bigquery_storage_v1 import types as storage_types
+    from google.cloud.bigquery_storage_v1 import writer as storage_writer
+except ImportError:  # pragma: no cover - dependencia opcional
+    bigquery_storage_v1 = None
+
+logger = logging.getLogger(__name__)
+
+STREAM_PENDING = "pending"
+STREAM_COMMITTED = "committed"
+
+# Límite de AppendRows es 10 MB por request; se deja margen para el esquema
+MAX_REQUEST_BYTES = 9 * 1024 * 1024
+
+_PROTO_TYPES = {
+    "STRING": descriptor_pb2.FieldDescriptorProto.TYPE_STRING,
+    "INTEGER": descriptor_pb2.FieldDescriptorProto.TYPE_INT64,
+    "INT64": descriptor_pb2.FieldDescriptorProto.TYPE_INT64,
+    "FLOAT": descriptor_pb2.FieldDescriptorProto.TYPE_DOUBLE,
+    "FLOAT64": descriptor_pb2.FieldDescriptorProto.TYPE_DOUBLE,
+    "BOOLEAN": descriptor_pb2.FieldDescriptorProto.TYPE_BOOL,
+    "BOOL": descriptor_pb2.FieldDescriptorProto.TYPE_BOOL,
+}
+
+_CONVERSIONES = {
+    descriptor_pb2.FieldDescriptorProto.TYPE_STRING: str,
+    descriptor_pb2.FieldDescriptorProto.TYPE_INT64: int,
+    descriptor_pb2.FieldDescriptorProto.TYPE_DOUBLE: float,
+    descriptor_pb2.FieldDescriptorProto.TYPE_BOOL: bool,
+}
+
+
+class CommitUncertain(RuntimeError):
+    """El commit de un stream falló y no se pudo comprobar si el servidor lo aplicó"""
+
+
+def storage_write_available() -> bool:
+    """True si google-cloud-bigquery-storage está instalado"""
+    return bigquery_storage_v1 is not None
+
+
+def build_row_message(nombre: str, schema: Sequence) -> tuple:
+    """
+    Construye en tiempo de ejecución el mensaje protobuf de una fila de la tabla
+
+    Args:
+        nombre: Nombre del mensaje (ej. el id de la tabla)
+        schema: Lista de bigquery.SchemaField (o con .name y .field_type)
+
+    Returns:
+        Tupla (DescriptorProto para el writer_schema, clase del mensaje)
+    """
+    file_proto = descriptor_pb2.FileDescriptorProto(name=f"{nombre}.proto", package="excel_bigquery")
+    mensaje = file_proto.message_type.add(name=nombre)
+
+    for numero, campo in enumerate(schema, start=1):
+        tipo = _PROTO_TYPES.get(campo.field_type.upper())
+        if tipo is None:
+            raise ValueError(f"Tipo {campo.field_type} de {campo.name} no soportado por el writer")
+        mensaje.field.add(
+            name=campo.name, number=numero, type=tipo,
+            label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL
+        )
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    descriptor = pool.FindMessageTypeByName(f"excel_bigquery.{nombre}")
+
+    descriptor_proto = descriptor_pb2.DescriptorProto()
+    descriptor.CopyToProto(descriptor_proto)
+    return descriptor_proto, message_factory.GetMessageClass(descriptor)
+
+
+def serialize_dataframe(df: pd.DataFrame, message_class) -> List[bytes]:
+    """
+    Serializa cada fila del DataFrame con el mensaje de la tabla
+
+    Las columnas que no están en el esquema se ignoran; los nulos (None, NaN,
+    pd.NA) se dejan sin asignar y BigQuery los guarda como NULL.
+    """
+    campos = [(campo.name, _CONVERSIONES[campo.type])
+              for campo in message_class.DESCRIPTOR.fields if campo.name in df.columns]
+    nombres = [nombre for nombre, _ in campos]
+
+    filas = []
+    for valores in df[nombres].itertuples(index=False, name=None):
+        mensaje = message_class()
+        for (nombre, convertir), valor in zip(campos, valores):
+            if valor is None or valor is pd.NA or (isinstance(valor, float) and math.isnan(valor)):
+                continue
+            setattr(mensaje, nombre, convertir(valor))
+        filas.append(mensaje.SerializeToString())
+
+    return filas
+
+
+def _chunk_rows(filas: List[bytes], max_bytes: int = MAX_REQUEST_BYTES) -> List[List[bytes]]:
+    """Agrupa filas serializadas en requests que no superen max_bytes"""
+    bloques, actual, tamano = [], [], 0
+    for fila in filas:
+        if actual and tamano + len(fila) > max_bytes:
+            bloques.append(actual)
+            actual, tamano = [], 0
+        actual.append(fila)
+        tamano += len(fila)
+    if actual:
+        bloques.append(actual)
+    return bloques
+
+
+class GrpcStorageWriteTransport:
+    """Transporte real: BigQueryWriteClient de google-cloud-bigquery-storage"""
+
+    def __init__(self, write_client=None):
+        if bigquery_storage_v1 is None:
+            raise RuntimeError(
+                "El Storage Write API requiere google-cloud-bigquery-storage (pip install google-cloud-bigquery-storage)"
+            )
+        self.write_client = write_client or bigquery_storage_v1.BigQueryWriteClient()
+        self._streams: Dict[str, object] = {}
+
+    def table_path(self, project: str, dataset: str, table: str) -> str:
+        return self.write_client.table_path(project, dataset, table)
+
+    def create_stream(self, parent: str, stream_type: str) -> str:
+        write_stream = storage_types.WriteStream()
+        write_stream.type_ = (storage_types.WriteStream.Type.PENDING if stream_type == STREAM_PENDING
+                              else storage_types.WriteStream.Type.COMMITTED)
+        return self.write_client.create_write_stream(parent=parent, write_stream=write_stream).name
+
+    def append(self, stream_name: str, descriptor_proto, filas: List[bytes], offset: int):
+        append_stream = self._streams.get(stream_name)
+        if append_stream is None:
+            template = storage_types.AppendRowsRequest()
+            template.write_stream = stream_name
+            proto_schema = storage_types.ProtoSchema()
+            proto_schema.proto_descriptor = descriptor_proto
+            proto_data = storage_types.AppendRowsRequest.ProtoData()
+            proto_data.writer_schema = proto_schema
+            template.proto_rows = proto_data
+            append_stream = self._streams[stream_name] = storage_writer.AppendRowsStream(
+                self.write_client, template
+            )
+
+        proto_rows = storage_types.ProtoRows()
+        proto_rows.serialized_rows.extend(filas)
+        request = storage_types.AppendRowsRequest()
+        request.offset = offset
+        proto_data = storage_types.AppendRowsRequest.ProtoData()
+        proto_data.rows = proto_rows
+        request.proto_rows = proto_data
+
+        append_stream.send(request).result()
+
+    def finalize(self, stream_name: str):
+        append_stream = self._streams.pop(stream_name, None)
+        if append_stream is not None:
+            append_stream.close()
+        self.write_client.finalize_write_stream(name=stream_name)
+
+    def commit(self, parent: str, stream_names: List[str]):
+        request = storage_types.BatchCommitWriteStreamsRequest()
+        request.parent = parent
+        request.write_streams = stream_names
+        response = self.write_client.batch_commit_write_streams(request)
+        if response.stream_errors:
+            raise RuntimeError(f"Error confirmando streams: {list(response.stream_errors)}")
+
+    def committed(self, stream_name: str) -> bool:
+        return "commit_time" in self.write_client.get_write_stream(name=stream_name)
+
+    def abort(self, stream_name: str):
+        append_stream = self._streams.pop(stream_name, None)
+        if append_stream is not None:
+            append_stream.close()
+
+
+class FakeStorageWriteTransport:
+    """
+    Servidor Storage Write en memoria para pruebas sin conexión
+
+    Respeta la semántica de los streams: las filas de un stream pending solo
+    aparecen en la tabla después de finalize + commit, las de un stream committed
+    aparecen al confirmar cada append, y un offset distinto al esperado se
+    rechaza. fallar_en_append permite simular errores de red; fallar_en_commit
+    ("antes" o "despues") simula un commit que falla antes de aplicarse o que
+    el servidor aplicó pero cuya respuesta se perdió.
+    """
+
+    def __init__(self, fallar_en_append: Optional[int] = None, latencia: float = 0.0,
+                 fallar_en_commit: Optional[str] = None):
+        self.tables: Dict[str, List[dict]] = {}
+        self.fallar_en_append = fallar_en_append
+        self.fallar_en_commit = fallar_en_commit
+        self.latencia = latencia
+        self.appends = 0
+        self._streams: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def table_path(self, project: str, dataset: str, table: str) -> str:
+        return f"projects/{project}/datasets/{dataset}/tables/{table}"
+
+    def create_stream(self, parent: str, stream_type: str) -> str:
+        with self._lock:
+            nombre = f"{parent}/streams/{len(self._streams)}"
+            self._streams[nombre] = {"parent": parent, "type": stream_type, "rows": [],
+                                     "finalized": False, "committed": False}
+            return nombre
+
+    def append(self, stream_name: str, descriptor_proto, filas: List[bytes], offset: int):
+        time.sleep(self.latencia)
+        with self._lock:
+            self.appends += 1
+            if self.fallar_en_append is not None and self.appends == self.fallar_en_append:
+                raise ConnectionError("Fallo simulado en AppendRows")
+
+            stream = self._streams[stream_name]
+            if stream["finalized"]:
+                raise RuntimeError(f"Stream {stream_name} ya finalizado")
+            if offset != len(stream["rows"]):
+                raise RuntimeError(f"Offset {offset} inválido, se esperaba {len(stream['rows'])}")
+
+            message_class = self._message_class(descriptor_proto)
+            decodificadas = []
+            for fila in filas:
+                mensaje = message_class.FromString(fila)
+                decodificadas.append({campo.name: getattr(mensaje, campo.name) if mensaje.HasField(campo.name)
+                                      else None for campo in message_class.DESCRIPTOR.fields})
+            stream["rows"].extend(decodificadas)
+
+            if stream["type"] == STREAM_COMMITTED:
+                self.tables.setdefault(stream["parent"], []).extend(decodificadas)
+
+    def finalize(self, stream_name: str):
+        with self._lock:
+            self._streams[stream_name]["finalized"] = True
+
+    def commit(self, parent: str, stream_names: List[str]):
+        with self._lock:
+            if self.fallar_en_commit == "antes":
+                raise ConnectionError("Fallo simulado en BatchCommitWriteStreams")
+            for nombre in stream_names:
+                stream = self._streams[nombre]
+                if not stream["finalized"]:
+                    raise RuntimeError(f"Stream {nombre} no finalizado")
+                self.tables.setdefault(parent, []).extend(stream["rows"])
+                stream["committed"] = True
+            if self.fallar_en_commit == "despues":
+                raise ConnectionError("Respuesta de BatchCommitWriteStreams perdida")
+
+    def committed(self, stream_name: str) -> bool:
+        with self._lock:
+            return self._streams[stream_name]["committed"]
+
+    def abort(self, stream_name: str):
+        with self._lock:
+            self._streams.pop(stream_name, None)
+
+    def rows(self, project: str, dataset: str, table: str) -> List[dict]:
+        """Filas visibles (confirmadas) de una tabla"""
+        return list(self.tables.get(self.table_path(project, dataset, table), []))
+
+    @staticmethod
+    def _message_class(descriptor_proto):
+        file_proto = descriptor_pb2.FileDescriptorProto(name=f"{descriptor_proto.name}.proto")
+        file_proto.message_type.add().CopyFrom(descriptor_proto)
+        pool = descriptor_pool.DescriptorPool()
+        pool.Add(file_proto)
+        return message_factory.GetMessageClass(pool.FindMessageTypeByName(descriptor_proto.name))
+
+
+class StorageWriteWriter:
+    """
+    Escritura de lotes chicos con el Storage Write API
+
+    Con streams pending (por defecto) el lote es atómico: las filas se envían,
+    el stream se finaliza y se confirma con BatchCommitWriteStreams; si algo
+    falla antes del commit no queda nada escrito y se puede reintentar con un
+    load job. Si falla el commit se consulta el stream: puede que el servidor
+    lo haya aplicado y solo se perdió la respuesta. Con streams committed las filas son visibles apenas se confirma
+    cada append (menor latencia, pero un fallo puede dejar el lote a medias).
+    """
+
+    def __init__(self, transport=None, max_rows: Optional[int] = None, stream_type: Optional[str] = None):
+        self.transport = transport or GrpcStorageWriteTransport()
+        self.max_rows = settings.storage_write_max_rows if max_rows is None else max_rows
+        self.stream_type = (stream_type or settings.storage_write_stream).lower()
+        if self.stream_type not in (STREAM_PENDING, STREAM_COMMITTED):
+            raise ValueError(f"Tipo de stream inválido: {self.stream_type}")
+        self._mensajes: Dict[str, tuple] = {}
+
+    @classmethod
+    def from_settings(cls) -> Optional["StorageWriteWriter"]:
+        """Writer configurado, o None si está deshabilitado o falta la librería"""
+        if settings.storage_write_max_rows <= 0 or not storage_write_available():
+            return None
+        return cls()
+
+    def fallback_safe(self, error: Exception) -> bool:
+        """True si ante el error de write_dataframe no quedaron filas escritas (se puede usar un load job)"""
+        return self.stream_type == STREAM_PENDING and not isinstance(error, CommitUncertain)
+
+    def accepts(self, filas: int) -> bool:
+        """True si el lote es lo bastante chico para el Storage Write API"""
+        return 0 < filas <= self.max_rows
+
+    def write_dataframe(self, project: str, dataset: str, table: str, schema: Sequence,
+                        df: pd.DataFrame) -> int:
+        """
+        Escribe el DataFrame en la tabla
+
+        Args:
+            project: Proyecto de la tabla
+            dataset: Dataset de la tabla
+            table: Id de la tabla
+            schema: Esquema de la tabla (lista de SchemaField)
+            df: Filas a escribir
+
+        Returns:
+            Cantidad de filas escritas
+
+        Raises:
+            CommitUncertain: Si el commit falló y no se sabe si quedó aplicado
+        """
+        inicio = time.perf_counter()
+        clave = f"{project}.{dataset}.{table}"
+        if clave not in self._mensajes:
+            self._mensajes[clave] = build_row_message(table, schema)
+        descriptor_proto, message_class = self._mensajes[clave]
+
+        filas = serialize_dataframe(df, message_class)
+        parent = self.transport.table_path(project, dataset, table)
+        stream_name = self.transport.create_stream(parent, self.stream_type)
+
+        try:
+            offset = 0
+            for bloque in _chunk_rows(filas):
+                self.transport.append(stream_name, descriptor_proto, bloque, offset)
+                offset += len(bloque)
+
+            if self.stream_type == STREAM_PENDING:
+                self.transport.finalize(stream_name)
+                try:
+                    self.transport.commit(parent, [stream_name])
+                except Exception as e:
+                    self._verificar_commit(stream_name, e)
+            else:
+                self.transport.finalize(stream_name)
+
+        except Exception:
+            self.transport.abort(stream_name)
+            raise
+
+        logger.debug(f"Storage Write {clave}: {len(filas)} filas en "
+                     f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+        return len(filas)
+
+    def _verificar_commit(self, stream_name: str, error: Exception):
+        """
+        Decide qué hacer con un commit fallido según el estado del stream
+
+        Si el stream tiene commit_time el servidor aplicó el commit y las filas ya
+        están en la tabla (no se relanza el error); si no lo tiene, se relanza el
+        error original y se puede usar un load job sin duplicar filas.
+
+        Raises:
+            CommitUncertain: Si no se pudo consultar el stream
+        """
+        try:
+            confirmado = self.transport.committed(stream_name)
+        except Exception as consulta:
+            raise CommitUncertain(f"No se sabe si el stream {stream_name} quedó confirmado: "
+                                  f"{error} ({consulta})") from error
+        if not confirmado:
+            raise error
+        logger.warning(f"El commit de {stream_name} devolvió error pero quedó aplicado: {error}")
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from src.config.settings import settings
+from src.excel_bigquery.core.utils.id_utils import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class FileLeaseQueue:
+    """
+    Reparto de libros entre varias máquinas con leases en una carpeta compartida
+
+    Cada libro tiene una clave (warehouse + nombre) y dos archivos posibles:
+    leases/<clave>.lease mientras un nodo lo procesa y done/<clave>.done cuando
+    ya se cargó. Tomar un lease es crear el archivo con O_EXCL (atómico también
+    en NFS/SMB), así solo un nodo gana. Un hilo renueva los leases propios
+    (mtime) cada LEASE_HEARTBEAT_SECONDS; un lease sin renovar por más de
+    LEASE_TTL_SECONDS es de un nodo caído y otro nodo lo retira (rename
+    atómico) y lo toma. Si un nodo detecta que perdió un lease, avisa con
+    al_perder para no cargar ese libro.
+
+    El marcador done se escribe después de la carga; si un nodo cae entre la
+    carga y el marcador, el libro se reprocesa y la verificación de duplicados
+    contra BigQuery evita cargarlo dos veces.
+    """
+
+    def __init__(self, directorio: Optional[str] = None, nodo: Optional[str] = None,
+                 ttl: Optional[float] = None, heartbeat: Optional[float] = None):
+        self.directorio = directorio or settings.lease_dir
+        self.nodo = nodo or settings.node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl or settings.lease_ttl_seconds
+        self.heartbeat = heartbeat or settings.lease_heartbeat_seconds
+        self.al_perder: Optional[Callable[[str], None]] = None
+
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+        os.makedirs(os.path.join(self.directorio, "leases"), exist_ok=True)
+        os.makedirs(os.path.join(self.directorio, "done"), exist_ok=True)
+
+    @staticmethod
+    def clave(warehouse: str, nombre_limpio: str) -> str:
+        """Clave estable de un libro (la misma en todos los nodos que montan la carpeta)"""
+        return format(fingerprint(f"{warehouse}/{nombre_limpio}") & 0xFFFFFFFFFFFFFFFF, "016x")
+
+    def _ruta_lease(self, clave: str) -> str:
+        return os.path.join(self.directorio, "leases", f"{clave}.lease")
+
+    def _ruta_done(self, clave: str) -> str:
+        return os.path.join(self.directorio, "done", f"{clave}.done")
+
+    @staticmethod
+    def _crear(ruta: str, contenido: dict) -> bool:
+        try:
+            fd = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(contenido, f)
+        return True
+
+    @staticmethod
+    def _leer(ruta: str) -> Optional[tuple]:
+        """(contenido, mtime) del lease o None si ya no existe"""
+        try:
+            mtime = os.stat(ruta).st_mtime
+            with open(ruta, encoding="utf-8") as f:
+                return json.load(f), mtime
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Lease vacío o a medio escribir: vale su mtime, así vence si su nodo cayó al crearlo
+            return {}, mtime
+
+    def is_done(self, clave: str) -> bool:
+        return os.path.exists(self._ruta_done(clave))
+
+    def claim(self, clave: str, nombre: str = "") -> bool:
+        """
+        Intenta tomar el libro
+
+        Args:
+            clave: Clave del libro (FileLeaseQueue.clave)
+            nombre: Nombre del libro, para los mensajes
+
+        Returns:
+            True si este nodo tiene el lease; False si ya se cargó o lo tiene otro nodo
+        """
+        if self.is_done(clave):
+            return False
+
+        ruta = self._ruta_lease(clave)
+        token = uuid.uuid4().hex
+        contenido = {"nodo": self.nodo, "archivo": nombre, "token": token, "tomado": time.time()}
+
+        if not self._crear(ruta, contenido):
+            actual = self._leer(ruta)
+            if actual is not None:
+                lease, mtime = actual
+                if time.time() - mtime < self.ttl:
+                    return False
+                if not self._retirar_vencido(ruta, lease.get("token"), mtime):
+                    return False
+                logger.warning("Lease de %s vencido (nodo %s); se reasigna a %s",
+                               nombre or clave, lease.get("nodo"), self.nodo)
+            if not self._crear(ruta, contenido):
+                return False
+
+        with self._lock:
+            self._tokens[clave] = token
+
+        # Otro nodo pudo terminarlo entre la verificación y la creación del lease
+        if self.is_done(clave):
+            self.release(clave)
+            return False
+        return True
+
+    def _retirar_vencido(self, ruta: str, token: Optional[str], mtime: float) -> bool:
+        # El rename es atómico: de los nodos que vieron el lease vencido solo uno lo retira
+        tumba = f"{ruta}.{uuid.uuid4().hex}.vencido"
+        try:
+            os.rename(ruta, tumba)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning("No se pudo retirar el lease vencido %s: %s", ruta, e)
+            return False
+
+        retirado = self._leer(tumba)
+        # Un lease vacío no tiene token: se reconoce por seguir vacío y con el mismo mtime
+        vencido = retirado is None or (retirado[0].get("token") == token
+                                       and (token is not None or retirado[1] == mtime))
+        if not vencido:
+            # Entre la lectura y el rename otro nodo tomó un lease nuevo: se restaura con
+            # O_EXCL (SMB y algunos NFS no admiten hard links) y este nodo no lo toma
+            try:
+                self._crear(ruta, retirado[0])
+            except OSError as e:
+                logger.warning("No se pudo restaurar el lease %s: %s", ruta, e)
+            self._borrar(tumba)
+            return False
+
+        self._borrar(tumba)
+        return True
+
+    @staticmethod
+    def _borrar(ruta: str):
+        try:
+            os.remove(ruta)
+        except OSError as e:
+            logger.warning("No se pudo borrar %s: %s", ruta, e)
+
+    def _es_propio(self, clave: str, token: Optional[str]) -> bool:
+        actual = self._leer(self._ruta_lease(clave)) if token else None
+        return actual is not None and actual[0].get("token") == token
+
+    def complete(self, clave: str) -> bool:
+        """
+        Marca el libro como cargado y libera el lease
+
+        Returns:
+            True si el marcador se escribió
+        """
+        exito = self._crear(self._ruta_done(clave), {"nodo": self.nodo, "fecha": time.time()})
+        self.release(clave)
+        return exito or self.is_done(clave)
+
+    def release(self, clave: str):
+        """Libera el lease sin marcar el libro (otro nodo puede tomarlo)"""
+        with self._lock:
+            token = self._tokens.pop(clave, None)
+        if self._es_propio(clave, token):
+            try:
+                os.remove(self._ruta_lease(clave))
+            except FileNotFoundError:
+                pass
+
+    def renew(self):
+        """Renueva los leases propios; los que ya no son de este nodo se informan con al_perder"""
+        with self._lock:
+            propios = list(self._tokens.items())
+
+        for clave, token in propios:
+            if self._es_propio(clave, token):
+                try:
+                    os.utime(self._ruta_lease(clave))
+                    continue
+                except FileNotFoundError:
+                    pass
+
+            with self._lock:
+                if self._tokens.get(clave) != token:
+                    continue  # liberado mientras se renovaba
+                del self._tokens[clave]
+            logger.error("Se perdió el lease %s: otro nodo lo tomó", clave)
+            if self.al_perder:
+                self.al_perder(clave)
+
+    def held(self) -> int:
+        with self._lock:
+            return len(self._tokens)
+
+    def start(self):
+        """Inicia el hilo de heartbeat"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._loop, name="lease-heartbeat", daemon=True)
+        self._hilo.start()
+        logger.info("Nodo %s coordinado con leases en %s (ttl %ss)", self.nodo, self.directorio, self.ttl)
+
+    def stop(self):
+        """Detiene el heartbeat y libera los leases que queden"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+
+        with self._lock:
+            claves = list(self._tokens)
+        for clave in claves:
+            self.release(clave)
+
+    def _loop(self):
+        while not self._detener.wait(self.heartbeat):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error("Error renovando leases: %s", e)
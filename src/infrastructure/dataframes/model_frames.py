@@ -0,0 +1,81 @@
+import pandas as pd
+from typing import List
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+
+# Tipos pandas equivalentes al esquema de T1_ARCHIVOS / T2_CAJAS en BigQuery
+# (STRING -> string, INTEGER -> Int64 nullable, FLOAT -> float64)
+ARCHIVO_DTYPES = {
+    'id_archivo': 'string',
+    'archivo': 'string',
+    'warehouse': 'string',
+    'puerto': 'string',
+    'buque': 'string',
+    'annio': 'Int64',
+    'semana': 'Int64',
+    'spec': 'Int64',
+    'tipo': 'string',
+    'fp_archivo': 'Int64',
+}
+
+CAJA_DTYPES = {
+    'id_caja': 'string',
+    'id_archivo': 'string',
+    'nombre_caja': 'string',
+    'codigo_container': 'string',
+    'codigo_hacienda': 'Int64',
+    'codigo_trazabilidad': 'string',
+    'nombre_hacienda': 'string',
+    'temperatura': 'float64',
+    'dedos_totales': 'Int64',
+    'peso_bruto_kg': 'float64',
+    'peso_total_kg': 'float64',
+    'cantidad_observaciones': 'Int64',
+    'dedos_afectados_totales': 'Int64',
+    'peso_promedio': 'float64',
+    'week_code': 'Int64',
+    'year_code': 'Int64',
+    'spec': 'Int64',
+    'uw': 'Int64',
+    'ow': 'Int64',
+    'fp_caja': 'Int64',
+    'fp_archivo': 'Int64',
+}
+
+# Metadatos del archivo que se agregan a cada caja (vista "cajas con su archivo")
+ARCHIVO_METADATA_COLUMNS = ['archivo', 'warehouse', 'puerto', 'buque', 'annio', 'semana', 'tipo']
+
+
+def archivos_to_dataframe(archivos: List[ArchivoModel]) -> pd.DataFrame:
+    """Convierte archivos a un DataFrame con los tipos del esquema de BigQuery"""
+    columnas = {columna: [getattr(archivo, columna) for archivo in archivos] for columna in ARCHIVO_DTYPES}
+    return pd.DataFrame(columnas).astype(ARCHIVO_DTYPES)
+
+
+def cajas_to_dataframe(cajas: List[CajaModel]) -> pd.DataFrame:
+    """Convierte cajas a un DataFrame con los tipos del esquema de BigQuery"""
+    columnas = {columna: [getattr(caja, columna) for caja in cajas] for columna in CAJA_DTYPES}
+    return pd.DataFrame(columnas).astype(CAJA_DTYPES)
+
+
+def cajas_with_archivo_dataframe(archivos: List[ArchivoModel], cajas: List[CajaModel]) -> pd.DataFrame:
+    """
+    Convierte cajas a DataFrame agregando los metadatos de su archivo
+
+    Args:
+        archivos: Archivos a los que pertenecen las cajas
+        cajas: Cajas a convertir
+
+    Returns:
+        DataFrame con las columnas de T2_CAJAS más ARCHIVO_METADATA_COLUMNS
+    """
+    por_fp = {archivo.fp_archivo: archivo for archivo in archivos}
+    df = cajas_to_dataframe(cajas)
+
+    for columna in ARCHIVO_METADATA_COLUMNS:
+        valores = [getattr(por_fp[caja.fp_archivo], columna) if caja.fp_archivo in por_fp else None
+                   for caja in cajas]
+        df[columna] = pd.Series(valores, dtype=ARCHIVO_DTYPES[columna], index=df.index)
+
+    return df
@@ -0,0 +1,149 @@
+import io
+import os
+from typing import Iterable, List, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.infrastructure.dataframes.model_frames import ARCHIVO_DTYPES, CAJA_DTYPES
+
+_ARROW_TYPES = {'string': pa.string(), 'Int64': pa.int64(), 'float64': pa.float64()}
+
+ARCHIVO_SCHEMA = pa.schema([(columna, _ARROW_TYPES[tipo]) for columna, tipo in ARCHIVO_DTYPES.items()])
+CAJA_SCHEMA = pa.schema([(columna, _ARROW_TYPES[tipo]) for columna, tipo in CAJA_DTYPES.items()])
+
+# Al pasar a pandas se usan los mismos tipos nullable que model_frames
+_PANDAS_TYPES = {pa.string(): pd.StringDtype(), pa.int64(): pd.Int64Dtype()}
+
+
+def _models_to_table(modelos: list, schema: pa.Schema) -> pa.Table:
+    columnas = [pa.array([getattr(modelo, campo.name) for modelo in modelos], type=campo.type)
+                for campo in schema]
+    return pa.Table.from_arrays(columnas, schema=schema)
+
+
+def _table_to_ipc(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _ipc_to_table(contenido: bytes) -> pa.Table:
+    # Los buffers de la tabla apuntan a los bytes recibidos: no se copian ni se crean objetos por fila
+    return pa.ipc.open_stream(pa.py_buffer(contenido)).read_all()
+
+
+def table_to_dataframe(table: pa.Table) -> pd.DataFrame:
+    """Convierte una tabla Arrow a DataFrame con los tipos de model_frames"""
+    return table.to_pandas(types_mapper=_PANDAS_TYPES.get)
+
+
+def table_to_parquet_buffer(table: pa.Table) -> io.BytesIO:
+    """Serializa la tabla a Parquet en memoria para un load job (sin pasar por pandas)"""
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ParsedBatch:
+    """
+    Archivos y cajas parseados en formato columnar (tablas Arrow)
+
+    Los procesos del pool devuelven to_ipc() (bytes de Arrow IPC) en lugar de
+    listas de CajaModel, así el proceso principal no des-serializa un objeto
+    por caja: from_ipc() arma las tablas sobre los mismos bytes y éstas van
+    directo a los load jobs (Parquet) y a la copia local.
+    """
+
+    def __init__(self, archivos: pa.Table, cajas: pa.Table):
+        self.archivos = archivos
+        self.cajas = cajas
+
+    @classmethod
+    def empty(cls) -> "ParsedBatch":
+        return cls(ARCHIVO_SCHEMA.empty_table(), CAJA_SCHEMA.empty_table())
+
+    @classmethod
+    def from_models(cls, archivos: List[ArchivoModel], cajas: List[CajaModel]) -> "ParsedBatch":
+        return cls(_models_to_table(archivos, ARCHIVO_SCHEMA), _models_to_table(cajas, CAJA_SCHEMA))
+
+    @classmethod
+    def from_results(cls, resultados: Iterable[Tuple[ArchivoModel, List[CajaModel]]]) -> "ParsedBatch":
+        """Construye el lote a partir de tuplas (ArchivoModel, cajas) de process_workbook"""
+        archivos, cajas = [], []
+        for archivo, cajas_archivo in resultados:
+            archivos.append(archivo)
+            cajas.extend(cajas_archivo)
+        return cls.from_models(archivos, cajas)
+
+    @classmethod
+    def from_ipc(cls, contenido: Tuple[bytes, bytes]) -> "ParsedBatch":
+        archivos_ipc, cajas_ipc = contenido
+        return cls(_ipc_to_table(archivos_ipc), _ipc_to_table(cajas_ipc))
+
+    @classmethod
+    def concat(cls, lotes: List["ParsedBatch"]) -> "ParsedBatch":
+        if not lotes:
+            return cls.empty()
+        if len(lotes) == 1:
+            return lotes[0]
+        return cls(
+            pa.concat_tables([lote.archivos for lote in lotes]),
+            pa.concat_tables([lote.cajas for lote in lotes])
+        )
+
+    def to_ipc(self) -> Tuple[bytes, bytes]:
+        return _table_to_ipc(self.archivos), _table_to_ipc(self.cajas)
+
+    @property
+    def num_archivos(self) -> int:
+        return self.archivos.num_rows
+
+    @property
+    def num_cajas(self) -> int:
+        return self.cajas.num_rows
+
+    def fps_archivos(self) -> List[int]:
+        return self.archivos.column("fp_archivo").to_pylist()
+
+    def nombres_archivos(self) -> List[str]:
+        return self.archivos.column("archivo").to_pylist()
+
+    def exclude_archivos(self, fps: Iterable[int]) -> "ParsedBatch":
+        """Lote sin los archivos (ni sus cajas) cuyos fp_archivo están en fps"""
+        excluir = pa.array(list(set(fps)), type=pa.int64())
+        if not len(excluir):
+            return self
+        return ParsedBatch(
+            self.archivos.filter(pc.invert(pc.is_in(self.archivos.column("fp_archivo"), value_set=excluir))),
+            self.cajas.filter(pc.invert(pc.is_in(self.cajas.column("fp_archivo"), value_set=excluir)))
+        )
+
+    def archivos_df(self) -> pd.DataFrame:
+        return table_to_dataframe(self.archivos)
+
+    def cajas_df(self) -> pd.DataFrame:
+        return table_to_dataframe(self.cajas)
+
+    def archivo_models(self) -> List[ArchivoModel]:
+        """Reconstruye los ArchivoModel (son pocos: uno por libro)"""
+        columnas = [columna for columna in ARCHIVO_DTYPES if columna != "fp_archivo"]
+        return [ArchivoModel(**fila) for fila in self.archivos.select(columnas).to_pylist()]
+
+    def write_parquet(self, directorio: str):
+        """Guarda el lote como archivos.parquet y cajas.parquet en el directorio"""
+        os.makedirs(directorio, exist_ok=True)
+        pq.write_table(self.archivos, os.path.join(directorio, "archivos.parquet"))
+        pq.write_table(self.cajas, os.path.join(directorio, "cajas.parquet"))
+
+    @classmethod
+    def read_parquet(cls, directorio: str) -> "ParsedBatch":
+        """Lee un lote guardado con write_parquet"""
+        return cls(pq.read_table(os.path.join(directorio, "archivos.parquet"), schema=ARCHIVO_SCHEMA),
+                   pq.read_table(os.path.join(directorio, "cajas.parquet"), schema=CAJA_SCHEMA))
@@ -1,11 +1,17 @@
 import sys
 import os
+from typing import Iterator
+
 import pandas as pd
+import pyarrow as pa
 
 # Agregar el directorio raíz al path para imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.excel_bigquery.core.services.upload_service import UploadService
+from src.infrastructure.dataframes.model_frames import (
+    ARCHIVO_DTYPES, ARCHIVO_METADATA_COLUMNS, CAJA_DTYPES, archivos_to_dataframe, cajas_with_archivo_dataframe
+)
 
 
 def load_excel_to_dataframe(path: str) -> pd.DataFrame:
@@ -13,7 +19,7 @@ def load_excel_to_dataframe(path: str) -> pd.DataFrame:
     Procesa archivos Excel y retorna un DataFrame con los datos
 
     Args:
-        path: Ruta del directorio con archivos Excel
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
 
     Returns:
         DataFrame con los datos procesados
@@ -26,22 +32,103 @@ def load_excel_to_dataframe(path: str) -> pd.DataFrame:
     if not archivos_models:
         return pd.DataFrame()
 
-    # Convertir modelos a diccionarios para DataFrame
-    data_list = []
-    for modelo in archivos_models:
-        data_list.append({
-            'id_archivo': modelo.id_archivo,
-            'archivo': modelo.archivo,
-            'warehouse': modelo.warehouse,
-            'puerto': modelo.puerto,
-            'buque': modelo.buque,
-            'annio': modelo.annio,
-            'semana': modelo.semana,
-            'spec': modelo.spec,
-            'tipo': modelo.tipo
-        })
+    return archivos_to_dataframe(archivos_models)
+
+
+def _empty_cajas_dataframe() -> pd.DataFrame:
+    dtypes = {**CAJA_DTYPES, **{columna: ARCHIVO_DTYPES[columna] for columna in ARCHIVO_METADATA_COLUMNS}}
+    return pd.DataFrame({columna: pd.Series(dtype=tipo) for columna, tipo in dtypes.items()})
+
+
+def iter_cajas_dataframes(path: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+    """
+    Procesa archivos Excel entregando las cajas en DataFrames de tamaño fijo
+
+    Cada DataFrame tiene chunk_size filas (el último puede tener menos) con las
+    columnas de T2_CAJAS más los metadatos de su archivo, con los tipos del esquema
+    de BigQuery. Solo se mantienen en memoria las cajas del bloque en curso.
+
+    Args:
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
+        chunk_size: Cantidad de cajas por DataFrame
+
+    Yields:
+        DataFrame con hasta chunk_size cajas
+    """
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size debe ser mayor que 0")
+
+    processor = ExcelProcessorService()
+    archivos = {}
+    pendientes = []
+
+    for archivo, cajas in processor.iter_excel_files_with_cajas(path):
+        archivos[archivo.fp_archivo] = archivo
+        pendientes.extend(cajas)
+
+        while len(pendientes) >= chunk_size:
+            bloque, pendientes = pendientes[:chunk_size], pendientes[chunk_size:]
+            yield cajas_with_archivo_dataframe(list(archivos.values()), bloque)
+
+            # Conservar solo los archivos que aún tienen cajas pendientes
+            fps_pendientes = {caja.fp_archivo for caja in pendientes}
+            archivos = {fp: a for fp, a in archivos.items() if fp in fps_pendientes}
+
+    if pendientes:
+        yield cajas_with_archivo_dataframe(list(archivos.values()), pendientes)
+
+
+def load_cajas_to_dataframe(path: str) -> pd.DataFrame:
+    """
+    Procesa archivos Excel y retorna un DataFrame con las cajas y los datos de su archivo
+
+    Args:
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
+
+    Returns:
+        DataFrame con las columnas de T2_CAJAS más los metadatos del archivo
+    """
+    bloques = list(iter_cajas_dataframes(path))
+
+    if not bloques:
+        return _empty_cajas_dataframe()
+
+    return pd.concat(bloques, ignore_index=True) if len(bloques) > 1 else bloques[0]
+
+
+def iter_cajas_arrow(path: str, chunk_size: int = 50000) -> Iterator[pa.RecordBatch]:
+    """
+    Igual que iter_cajas_dataframes pero entrega RecordBatch de Arrow
+
+    Args:
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
+        chunk_size: Cantidad de cajas por lote
+
+    Yields:
+        RecordBatch con hasta chunk_size cajas
+    """
+    for df in iter_cajas_dataframes(path, chunk_size):
+        yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+
+
+def load_cajas_to_arrow(path: str) -> pa.Table:
+    """
+    Procesa archivos Excel y retorna las cajas (con los datos de su archivo) como tabla Arrow
+
+    Args:
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
+
+    Returns:
+        Tabla Arrow con las columnas de T2_CAJAS más los metadatos del archivo
+    """
+    lotes = list(iter_cajas_arrow(path))
+
+    if not lotes:
+        return pa.Table.from_pandas(_empty_cajas_dataframe(), preserve_index=False)
 
-    return pd.DataFrame(data_list)
+    return pa.Table.from_batches(lotes)
 
 
 def process_and_upload_to_bigquery(path: str, check_duplicates: bool = True) -> bool:
@@ -49,7 +136,7 @@ def process_and_upload_to_bigquery(path: str, check_duplicates: bool = True) ->
     Procesa archivos Excel y los sube a BigQuery
 
     Args:
-        path: Ruta del directorio con archivos Excel
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
         check_duplicates: Si verificar duplicados antes de subir
 
     Returns:
@@ -64,7 +151,7 @@ def get_processing_preview(path: str) -> dict:
     Obtiene una vista previa del procesamiento sin subir datos
 
     Args:
-        path: Ruta del directorio con archivos Excel
+        path: Ruta del directorio (o bundle .zip) con archivos Excel
 
     Returns:
         Diccionario con información del procesamiento
@@ -0,0 +1,117 @@
+import logging
+from typing import List, Optional, Tuple, Union, BinaryIO
+
+from openpyxl import load_workbook
+from openpyxl.utils.cell import coordinate_to_tuple
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.services.caja_processor_service import MAX_COLUMNAS_CAJAS, FILA_INICIAL_PESOS
+from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService, seleccionar_hojas
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import abrir_archivo_excel
+
+logger = logging.getLogger(__name__)
+
+
+class _Celda:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class GridSheet:
+    """
+    Hoja en memoria (tuplas de valores) con la interfaz que usan los procesadores
+
+    Expone sheet.cell(row, column).value y sheet["A1"].value sobre las filas
+    leídas con iter_rows(values_only=True); fuera del rango leído el valor es None.
+    """
+
+    def __init__(self, filas: List[tuple]):
+        self._filas = filas
+
+    def cell(self, row: int, column: int) -> _Celda:
+        try:
+            return _Celda(self._filas[row - 1][column - 1])
+        except IndexError:
+            return _Celda(None)
+
+    def __getitem__(self, coordenada: str) -> _Celda:
+        return self.cell(*coordinate_to_tuple(coordenada))
+
+
+def filas_de_hoja(hoja) -> List[tuple]:
+    """Valores de las filas 1..(pesos) y columnas A..MAX_COLUMNAS_CAJAS de una hoja de openpyxl"""
+    if isinstance(hoja, GridSheet):
+        return hoja._filas
+
+    max_fila = max(6, FILA_INICIAL_PESOS + settings.spec_value - 1)
+    return list(hoja.iter_rows(min_row=1, max_row=max_fila, max_col=MAX_COLUMNAS_CAJAS, values_only=True))
+
+
+def leer_hojas(ruta_archivo: Union[str, BinaryIO]) -> List[Tuple[Optional[str], GridSheet]]:
+    """
+    Lee en modo read_only/values_only solo el rango que usan los procesadores
+
+    Cada hoja se parsea una sola vez; la selección de hojas es la misma de
+    ExcelProcessorService (seleccionar_hojas).
+
+    Args:
+        ruta_archivo: Ruta del archivo (o miembro de un .zip) o stream binario
+
+    Returns:
+        Tuplas (título o None, GridSheet) de las hojas a procesar
+    """
+    wb_obj = load_workbook(abrir_archivo_excel(ruta_archivo), read_only=True)
+    try:
+        hojas = [(ws.title, GridSheet(filas_de_hoja(ws))) for ws in wb_obj.worksheets]
+        activa = wb_obj.worksheets.index(wb_obj.active) if wb_obj.active in wb_obj.worksheets else 0
+    finally:
+        wb_obj.close()
+
+    if not hojas:
+        return []
+    return seleccionar_hojas(hojas, hojas[activa][1])
+
+
+def leer_hoja(ruta_archivo: Union[str, BinaryIO]) -> GridSheet:
+    """
+    Lee la hoja activa en modo read_only/values_only (solo el rango que usan los procesadores)
+
+    Args:
+        ruta_archivo: Ruta del archivo (o miembro de un .zip) o stream binario
+
+    Returns:
+        GridSheet con las filas 1..(pesos) y columnas A..MAX_COLUMNAS_CAJAS de la hoja activa
+    """
+    wb_obj = load_workbook(abrir_archivo_excel(ruta_archivo), read_only=True)
+    try:
+        return GridSheet(filas_de_hoja(wb_obj.active))
+    finally:
+        wb_obj.close()
+
+
+class ReadOnlyExcelEngine:
+    """
+    Motor de extracción con openpyxl en modo read_only y values_only
+
+    Abre el libro una sola vez y lee solo el rango de la cabecera, las cajas y
+    los pesos de cada hoja. La extracción de campos es la misma de
+    ExcelProcessorService y CajaProcessorService sobre GridSheet; la
+    equivalencia con el motor actual se verifica con python main.py comparar-motores.
+    """
+
+    def __init__(self):
+        self.processor = ExcelProcessorService()
+
+    def process_workbook(self, nombre_limpio: str, ruta_archivo: Union[str, BinaryIO], warehouse: str,
+                         include_cajas: bool = True) -> List[Tuple[ArchivoModel, List[CajaModel]]]:
+        """
+        Procesa un libro (misma interfaz que ExcelProcessorService.process_workbook)
+
+        Returns:
+            Lista de tuplas (ArchivoModel, lista de CajaModel), una por hoja procesada
+        """
+        return self.processor.process_sheets(leer_hojas(ruta_archivo), nombre_limpio, warehouse, include_cajas)
@@ -0,0 +1,108 @@
+import os
+import random
+from datetime import datetime
+from typing import List
+
+from openpyxl import Workbook
+
+from src.config.settings import settings
+
+# Valores de borde para cada celda que leen los procesadores
+_SEMANAS = [26, "27", 28.0, None, 1, 53]
+_ANNIOS = ["Year 2025", "Year 2024", "2025", "FY2026", "Year", None, 2025]
+_PUERTOS = ["kobe", "Hakata", None, "nittsu port", 123]
+_CODIGOS_HACIENDA = [101, 102.0, 12.7, "13.0", "abc", None, -5, "  14 ", True]
+_CONTAINERS = ["CONT1", " CONT2 ", 4567, None, "cont-3"]
+_HACIENDAS = ["hacienda uno", "Hacienda Ñandú", " san josé ", None, "LA ESPERANZA", 77]
+
+
+def _trazabilidad(r: random.Random):
+    dia, mes, anio = r.randint(1, 28), r.randint(1, 12), r.choice([24, 25, 26, 99, 30, 31])
+    return r.choice([
+        f"020214{dia:02d}{mes:02d}{anio:02d}",
+        f"020214{dia:02d}{mes:02d}{anio:02d}",
+        int(f"20214{dia:02d}{mes:02d}{anio:02d}"),   # celda numérica
+        "BAD99",
+        "020214310225",                               # 31/02: fecha inválida
+        " 020214010125 ",
+        None,
+        "0202140101-1",
+    ])
+
+
+def _peso(r: random.Random):
+    opcion = r.random()
+    if opcion < 0.80:
+        return round(r.uniform(450, 850), r.choice([0, 1, 2, 3, 6]))
+    return r.choice([
+        settings.uw_threshold, settings.ow_threshold, settings.uw_threshold - 0.001,
+        settings.ow_threshold + 0.001, 600, "600", "x", None, 0.125, 2.675, -10,
+        True, datetime(2025, 6, 1), "=SUM(A1:A2)",
+    ])
+
+
+def generar_libro(ruta: str, semilla: int, max_cajas: int = 25):
+    """
+    Genera un libro con el formato de los warehouses y valores de borde
+
+    Incluye cabeceras faltantes o con otro tipo, códigos de hacienda con
+    decimales o texto, haciendas en minúsculas, códigos de trazabilidad
+    inválidos, pesos en los umbrales UW/OW, texto y fórmulas entre los pesos,
+    y columnas vacías que cortan la lectura de cajas.
+
+    Args:
+        ruta: Archivo .xlsx a crear
+        semilla: Semilla del generador (el mismo valor genera el mismo libro)
+        max_cajas: Máximo de cajas del libro
+    """
+    r = random.Random(semilla)
+    wb = Workbook()
+    ws = wb.active
+
+    ws["B1"] = r.choice(["BUQUE SOL", "buque luna", None, 42])
+    ws["G1"] = r.choice(_PUERTOS)
+    ws["Q1"] = r.choice([f"N{semilla}", semilla, None])
+    ws["T1"] = r.choice(_SEMANAS)
+    ws["A2"] = r.choice(_ANNIOS)
+
+    n_cajas = r.randint(0, max_cajas)
+    for i in range(n_cajas):
+        columna = 2 + 2 * i
+        # De vez en cuando un nombre vacío corta la lectura como en los libros reales
+        if i and r.random() < 0.03:
+            ws.cell(row=2, column=columna, value=r.choice(["", "   "]))
+            continue
+
+        ws.cell(row=2, column=columna, value=r.choice([f"Caja {i + 1}", i + 1, f" caja {i + 1} "]))
+        ws.cell(row=3, column=columna, value=r.choice(_CONTAINERS))
+        ws.cell(row=4, column=columna, value=r.choice(_CODIGOS_HACIENDA))
+        ws.cell(row=5, column=columna, value=_trazabilidad(r))
+        ws.cell(row=6, column=columna, value=r.choice(_HACIENDAS))
+
+        for fila in range(8, 8 + settings.spec_value + 2):
+            if r.random() < 0.9:
+                ws.cell(row=fila, column=columna, value=_peso(r))
+
+    wb.save(ruta)
+
+
+def generar_corpus(directorio: str, cantidad: int, semilla: int = 0) -> List[str]:
+    """
+    Genera un corpus sintético de libros en una carpeta
+
+    Args:
+        directorio: Carpeta destino (se crea si no existe)
+        cantidad: Cantidad de libros
+        semilla: Semilla base
+
+    Returns:
+        Rutas de los libros generados
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rutas = []
+    for i in range(cantidad):
+        # Los 3 primeros caracteres se descartan al limpiar el nombre
+        ruta = os.path.join(directorio, f"日通 WK{i % 53 + 1:02d} S{semilla + i}.xlsx")
+        generar_libro(ruta, semilla + i)
+        rutas.append(ruta)
+    return rutas
@@ -0,0 +1,206 @@
+import io
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+from src.config.settings import settings
+from src.excel_bigquery.core.services.micro_batch_service import MicroBatchUploader
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import WarehouseType, _limpiar_nombre_archivo
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+logger = logging.getLogger(__name__)
+
+WAREHOUSES_VALIDOS = {w.value for w in WarehouseType if w != WarehouseType.DESCONOCIDO}
+
+
+def parsear_libro_subido(nombre_original: str, contenido: bytes, warehouse: str) -> Tuple[bytes, bytes]:
+    """
+    Parsea un libro recibido por HTTP (se ejecuta en un proceso del pool)
+
+    Args:
+        nombre_original: Nombre del archivo tal como lo envió el warehouse
+        contenido: Bytes del libro .xlsx
+        warehouse: Warehouse al que pertenece el libro
+
+    Returns:
+        Archivo y cajas como bytes Arrow IPC (ParsedBatch.to_ipc)
+    """
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+
+    nombre_limpio = _limpiar_nombre_archivo(nombre_original)
+    resultados = ExcelProcessorService().process_workbook(nombre_limpio, io.BytesIO(contenido), warehouse)
+    return ParsedBatch.from_results(resultados).to_ipc()
+
+
+class IngestionService:
+    """
+    Servicio de ingesta continua: recibe libros, los parsea en un pool de procesos
+    y los entrega al MicroBatchUploader para cargarlos en lotes
+    """
+
+    def __init__(self, upload_service=None, workers: int = None):
+        if upload_service is None:
+            from src.excel_bigquery.core.services.upload_service import UploadService
+            upload_service = UploadService()
+
+        self.workers = workers or settings.ingest_workers
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.batcher = MicroBatchUploader(upload_service)
+        self.inicio = time.time()
+
+        self._lock = threading.Lock()
+        self._en_parseo = 0
+        self.archivos_recibidos = 0
+        self.archivos_con_error = 0
+
+    def start(self):
+        self.batcher.start()
+
+    def stop(self):
+        """Espera los parseos en curso y carga el último lote"""
+        self.executor.shutdown(wait=True)
+        self.batcher.stop()
+
+    def submit(self, nombre_original: str, contenido: bytes, warehouse: str):
+        """Encola un libro para parsearlo en el pool de procesos"""
+        with self._lock:
+            self._en_parseo += 1
+            self.archivos_recibidos += 1
+
+        future = self.executor.submit(parsear_libro_subido, nombre_original, contenido, warehouse)
+        future.add_done_callback(lambda f: self._on_parseado(nombre_original, f))
+
+    def _on_parseado(self, nombre_original: str, future):
+        with self._lock:
+            self._en_parseo -= 1
+
+        try:
+            batch = ParsedBatch.from_ipc(future.result())
+            logger.info(f"Parseado {nombre_original}: {batch.num_cajas} cajas")
+            self.batcher.add_batch(batch)
+        except Exception as e:
+            with self._lock:
+                self.archivos_con_error += 1
+            logger.error(f"Error procesando {nombre_original}: {e}")
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.inicio, 1),
+            "workers": self.workers
+        }
+
+    def queue_depth(self) -> dict:
+        with self._lock:
+            en_parseo = self._en_parseo
+            recibidos = self.archivos_recibidos
+            con_error = self.archivos_con_error
+
+        estado = {
+            "en_parseo": en_parseo,
+            "lote_pendiente": self.batcher.pending(),
+            "archivos_recibidos": recibidos,
+            "archivos_con_error": con_error,
+            "lotes_subidos": self.batcher.lotes_subidos,
+            "lotes_fallidos": self.batcher.lotes_fallidos,
+            "ultimo_flush": self.batcher.ultimo_flush
+        }
+        if self.batcher.consolidated_load is not None:
+            # Con LOAD_CONSOLIDATE=true los lotes "subidos" esperan en disco hasta que se carga su ventana
+            estado["carga_consolidada"] = self.batcher.consolidated_load.pending()
+        return estado
+
+
+class IngestionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /upload?warehouse=KOBE&archivo=<nombre.xlsx>   cuerpo: bytes del libro
+        GET  /health
+        GET  /queue
+    """
+
+    service: IngestionService = None
+
+    def do_GET(self):
+        ruta = urlparse(self.path).path
+
+        if ruta == "/health":
+            self._responder(200, self.service.health())
+        elif ruta == "/queue":
+            self._responder(200, self.service.queue_depth())
+        else:
+            self._responder(404, {"error": f"Ruta no encontrada: {ruta}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/upload":
+            self._responder(404, {"error": f"Ruta no encontrada: {url.path}"})
+            return
+
+        params = parse_qs(url.query)
+        warehouse = (params.get("warehouse", [""])[0] or self.headers.get("X-Warehouse", "")).upper()
+        nombre = unquote(params.get("archivo", [""])[0] or self.headers.get("X-Archivo", ""))
+
+        if warehouse not in WAREHOUSES_VALIDOS:
+            self._responder(400, {"error": f"warehouse inválido: '{warehouse}'",
+                                  "validos": sorted(WAREHOUSES_VALIDOS)})
+            return
+
+        if not nombre.endswith(('.xlsx', '.xls')) or nombre.startswith('~$'):
+            self._responder(400, {"error": f"archivo inválido: '{nombre}'"})
+            return
+
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo <= 0:
+            self._responder(400, {"error": "El cuerpo de la petición está vacío"})
+            return
+        if largo > settings.http_max_upload_mb * 1024 * 1024:
+            self._responder(413, {"error": f"El libro supera {settings.http_max_upload_mb} MB"})
+            return
+
+        contenido = self.rfile.read(largo)
+        self.service.submit(nombre, contenido, warehouse)
+        self._responder(202, {"encolado": True, "archivo": nombre, "warehouse": warehouse})
+
+    def _responder(self, status: int, cuerpo: dict):
+        data = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def run_server(host: str = None, port: int = None):
+    """
+    Levanta el servicio HTTP de ingesta hasta recibir Ctrl+C
+
+    Args:
+        host: Interfaz donde escuchar (por defecto HTTP_HOST)
+        port: Puerto donde escuchar (por defecto HTTP_PORT)
+    """
+    host = host or settings.http_host
+    port = port or settings.http_port
+
+    service = IngestionService()
+    IngestionRequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), IngestionRequestHandler)
+
+    service.start()
+    logger.info(f"Servicio de ingesta escuchando en http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Deteniendo servicio de ingesta...")
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,204 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pyarrow.parquet as pq
+
+from src.config.settings import settings
+from src.infrastructure.dataframes.parsed_batch import ARCHIVO_SCHEMA, CAJA_SCHEMA, ParsedBatch
+
+logger = logging.getLogger(__name__)
+
+
+class LoadStagingArea:
+    """
+    Lotes parseados a la espera de una carga consolidada, en Parquet local
+
+    Cada lote es una carpeta con archivos.parquet y cajas.parquet. Se escribe
+    en tmp/ y se mueve con un rename a pendiente/, así nunca queda medio lote
+    visible. seal() mueve pendiente/ completa a ventanas/<id>/ (también con un
+    rename): esa ventana es la unidad de carga y lo que llegue después abre
+    una ventana nueva. Antes de cargarla, un proceso la toma moviéndola a
+    cargando/<id>.<pid> (otro rename), así dos procesos nunca cargan la misma
+    ventana; si la carga falla vuelve a ventanas/. Las ventanas que no se
+    pudieron cargar (o que dejó una ejecución anterior) siguen en ventanas/
+    hasta que una carga las confirme. Varios procesos pueden compartir la
+    carpeta: un lote termina en una sola ventana.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.load_staging_path
+        self._tmp = os.path.join(self.root, "tmp")
+        self._pendiente = os.path.join(self.root, "pendiente")
+        self._ventanas = os.path.join(self.root, "ventanas")
+        self._cargando = os.path.join(self.root, "cargando")
+        self._lock = threading.Lock()
+
+        os.makedirs(self._tmp, exist_ok=True)
+        os.makedirs(self._ventanas, exist_ok=True)
+        os.makedirs(self._cargando, exist_ok=True)
+
+    def stage(self, batch: ParsedBatch) -> Optional[str]:
+        """
+        Guarda un lote en la ventana abierta
+
+        Args:
+            batch: Archivos y cajas ya validados
+
+        Returns:
+            Id del lote o None si no se pudo escribir
+        """
+        # El prefijo con la hora ordena los lotes de una ventana por llegada
+        lote = f"{time.time_ns()}_{uuid.uuid4().hex[:8]}"
+        tmp = os.path.join(self._tmp, lote)
+
+        try:
+            os.makedirs(tmp)
+            pq.write_table(batch.archivos, os.path.join(tmp, "archivos.parquet"))
+            pq.write_table(batch.cajas, os.path.join(tmp, "cajas.parquet"))
+
+            with self._lock:
+                while True:
+                    os.makedirs(self._pendiente, exist_ok=True)
+                    try:
+                        os.rename(tmp, os.path.join(self._pendiente, lote))
+                        break
+                    except FileNotFoundError:
+                        # Otro proceso selló pendiente/ entre el makedirs y el rename
+                        continue
+
+            return lote
+
+        except Exception as e:
+            logger.error(f"Error guardando el lote en {self.root}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return None
+
+    def seal(self) -> Optional[str]:
+        """
+        Cierra la ventana abierta
+
+        Returns:
+            Ruta de la ventana cerrada o None si no había lotes pendientes
+        """
+        with self._lock:
+            if not os.path.isdir(self._pendiente) or not os.listdir(self._pendiente):
+                return None
+
+            ventana = os.path.join(self._ventanas, f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}")
+            try:
+                os.rename(self._pendiente, ventana)
+            except FileNotFoundError:
+                return None  # la selló otro proceso
+            return ventana
+
+    def windows(self) -> List[str]:
+        """Ventanas cerradas que esperan carga, de la más antigua a la más nueva"""
+        return [os.path.join(self._ventanas, nombre) for nombre in sorted(os.listdir(self._ventanas))]
+
+    def claim(self, ventana: str) -> Optional[str]:
+        """
+        Toma una ventana cerrada para cargarla
+
+        Args:
+            ventana: Ruta de la ventana en ventanas/
+
+        Returns:
+            Ruta de la ventana tomada (en cargando/) o None si otro proceso ya la tomó
+        """
+        tomada = os.path.join(self._cargando, f"{os.path.basename(ventana)}.{os.getpid()}")
+        try:
+            os.rename(ventana, tomada)
+        except FileNotFoundError:
+            return None
+        return tomada
+
+    def release(self, tomada: str):
+        """Devuelve a ventanas/ una ventana tomada que no se pudo cargar"""
+        nombre = os.path.basename(tomada).rsplit(".", 1)[0]
+        try:
+            os.rename(tomada, os.path.join(self._ventanas, nombre))
+        except FileNotFoundError:
+            pass
+
+    def recover(self) -> int:
+        """
+        Devuelve a ventanas/ las ventanas que tomó un proceso de esta máquina que ya no existe
+
+        Returns:
+            Cantidad de ventanas recuperadas
+        """
+        recuperadas = 0
+        for nombre in os.listdir(self._cargando):
+            pid = nombre.rsplit(".", 1)[-1]
+            if not pid.isdigit() or int(pid) == os.getpid() or _proceso_vivo(int(pid)):
+                continue
+            self.release(os.path.join(self._cargando, nombre))
+            logger.warning(f"Ventana {nombre} abandonada por el proceso {pid}; vuelve a la cola de carga")
+            recuperadas += 1
+        return recuperadas
+
+    @staticmethod
+    def batches(ventana: str) -> List[str]:
+        """Ids de los lotes de una ventana"""
+        return sorted(os.listdir(ventana))
+
+    @staticmethod
+    def files(ventana: str, tabla: str) -> List[str]:
+        """Parquet de una tabla en la ventana, uno por lote"""
+        return [os.path.join(ventana, lote, f"{tabla}.parquet") for lote in LoadStagingArea.batches(ventana)]
+
+    @staticmethod
+    def read_batch(ventana: str, lote: str) -> ParsedBatch:
+        """Un lote de la ventana"""
+        carpeta = os.path.join(ventana, lote)
+        return ParsedBatch(pq.read_table(os.path.join(carpeta, "archivos.parquet"), schema=ARCHIVO_SCHEMA),
+                           pq.read_table(os.path.join(carpeta, "cajas.parquet"), schema=CAJA_SCHEMA))
+
+    @staticmethod
+    def discard(ventana: str):
+        """Borra una ventana ya cargada"""
+        shutil.rmtree(ventana, ignore_errors=True)
+
+    def pending(self) -> Dict[str, float]:
+        """
+        Tamaño de lo que espera carga (ventana abierta y ventanas cerradas)
+
+        Returns:
+            Diccionario con lotes, archivos, cajas y la edad en segundos del lote más antiguo
+        """
+        carpetas = [self._pendiente] + self.windows() + [
+            os.path.join(self._cargando, nombre) for nombre in sorted(os.listdir(self._cargando))
+        ]
+        resumen = {"lotes": 0, "archivos": 0, "cajas": 0, "edad_s": 0.0}
+        mas_antiguo = None
+
+        for carpeta in carpetas:
+            if not os.path.isdir(carpeta):
+                continue
+            for lote in self.batches(carpeta):
+                ruta = os.path.join(carpeta, lote)
+                resumen["lotes"] += 1
+                resumen["archivos"] += pq.read_metadata(os.path.join(ruta, "archivos.parquet")).num_rows
+                resumen["cajas"] += pq.read_metadata(os.path.join(ruta, "cajas.parquet")).num_rows
+                mtime = os.stat(ruta).st_mtime
+                mas_antiguo = mtime if mas_antiguo is None else min(mas_antiguo, mtime)
+
+        if mas_antiguo is not None:
+            resumen["edad_s"] = round(time.time() - mas_antiguo, 1)
+        return resumen
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe pero es de otro usuario
+    return True
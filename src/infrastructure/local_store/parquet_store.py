@@ -0,0 +1,245 @@
+import logging
+import os
+import shutil
+import uuid
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.infrastructure.dataframes.model_frames import (
+    ARCHIVO_DTYPES, ARCHIVO_METADATA_COLUMNS, CAJA_DTYPES, archivos_to_dataframe, cajas_with_archivo_dataframe
+)
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - dependencia opcional
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMNS = ["warehouse", "annio", "semana"]
+TABLAS = ("archivos", "cajas")
+
+
+class LocalParquetStore:
+    """
+    Copia local columnar de lo que se sube a BigQuery
+
+    Guarda archivos y cajas como Parquet particionado warehouse=/annio=/semana=
+    bajo LOCAL_STORE_PATH. Las cajas llevan los metadatos de su archivo, así las
+    consultas por warehouse/semana/hacienda se resuelven leyendo solo las
+    particiones necesarias. Si duckdb está instalado también acepta SQL.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.local_store_path
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def _table_path(self, tabla: str) -> str:
+        if tabla not in TABLAS:
+            raise ValueError(f"Tabla local desconocida: {tabla}. Opciones: {', '.join(TABLAS)}")
+        return os.path.join(self.root, tabla)
+
+    def append(self, archivos: List[ArchivoModel], cajas: List[CajaModel]) -> bool:
+        """
+        Agrega archivos y cajas a la copia local
+
+        Args:
+            archivos: Archivos subidos
+            cajas: Cajas de esos archivos
+
+        Returns:
+            True si la escritura fue exitosa
+        """
+        if not self.enabled or not archivos:
+            return True
+
+        try:
+            self._write("archivos", archivos_to_dataframe(archivos))
+            if cajas:
+                self._write("cajas", cajas_with_archivo_dataframe(archivos, cajas))
+
+            logger.info(f"Copia local: {len(archivos)} archivos y {len(cajas)} cajas en {self.root}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error escribiendo la copia local en {self.root}: {e}")
+            return False
+
+    def append_batch(self, batch) -> bool:
+        """
+        Agrega un ParsedBatch a la copia local (sin pasar por pandas)
+
+        Args:
+            batch: ParsedBatch con los archivos y cajas subidos
+
+        Returns:
+            True si la escritura fue exitosa
+        """
+        if not self.enabled or not batch.num_archivos:
+            return True
+
+        try:
+            self._write("archivos", batch.archivos)
+            if batch.num_cajas:
+                metadatos = batch.archivos.select(["fp_archivo"] + ARCHIVO_METADATA_COLUMNS)
+                self._write("cajas", batch.cajas.join(metadatos, keys="fp_archivo", join_type="left outer"))
+
+            logger.info(f"Copia local: {batch.num_archivos} archivos y {batch.num_cajas} cajas en {self.root}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error escribiendo la copia local en {self.root}: {e}")
+            return False
+
+    def replace_weeks(self, warehouse: str, annio: int, semana_desde: int, semana_hasta: int, batch) -> bool:
+        """
+        Reemplaza las particiones de las semanas indicadas (recargas idempotentes)
+
+        Args:
+            warehouse: Warehouse a reemplazar
+            annio: Año de las semanas
+            semana_desde: Semana inicial (incluida)
+            semana_hasta: Semana final (incluida)
+            batch: ParsedBatch con los archivos y cajas de esas semanas
+
+        Returns:
+            True si la escritura fue exitosa
+        """
+        if not self.enabled:
+            return True
+
+        for tabla in TABLAS:
+            for semana in range(semana_desde, semana_hasta + 1):
+                particion = os.path.join(self._table_path(tabla), f"warehouse={warehouse.upper()}",
+                                         f"annio={annio}", f"semana={semana}")
+                shutil.rmtree(particion, ignore_errors=True)
+
+        return self.append_batch(batch)
+
+    def _write(self, tabla: str, datos):
+        table = datos if isinstance(datos, pa.Table) else pa.Table.from_pandas(datos, preserve_index=False)
+        # Un nombre único por escritura: nunca se sobrescriben partes de otras cargas
+        pq.write_to_dataset(
+            table,
+            root_path=self._table_path(tabla),
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def read(self, tabla: str, warehouse: Optional[str] = None, annio: Optional[int] = None,
+             semana_desde: Optional[int] = None, semana_hasta: Optional[int] = None,
+             nombre_hacienda: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Lee una tabla local filtrando por partición (solo se abren las carpetas necesarias)
+
+        Args:
+            tabla: "archivos" o "cajas"
+            warehouse: Filtrar por warehouse
+            annio: Filtrar por año
+            semana_desde: Semana inicial (incluida)
+            semana_hasta: Semana final (incluida)
+            nombre_hacienda: Filtrar por hacienda (solo cajas)
+            columns: Columnas a leer (None = todas)
+
+        Returns:
+            DataFrame con las filas que cumplen los filtros
+        """
+        path = self._table_path(tabla)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=columns or [])
+
+        dataset = ds.dataset(path, format="parquet", partitioning="hive")
+        filtro = None
+
+        def _and(expresion):
+            nonlocal filtro
+            filtro = expresion if filtro is None else filtro & expresion
+
+        if warehouse:
+            _and(ds.field("warehouse") == warehouse.upper())
+        if annio is not None:
+            _and(ds.field("annio") == annio)
+        if semana_desde is not None:
+            _and(ds.field("semana") >= semana_desde)
+        if semana_hasta is not None:
+            _and(ds.field("semana") <= semana_hasta)
+        if nombre_hacienda:
+            _and(ds.field("nombre_hacienda") == nombre_hacienda.upper())
+
+        df = dataset.to_table(columns=columns, filter=filtro).to_pandas()
+        dtypes = ARCHIVO_DTYPES if tabla == "archivos" else {**CAJA_DTYPES, **ARCHIVO_DTYPES}
+        return df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+
+    def summary(self, warehouse: Optional[str] = None, annio: Optional[int] = None,
+                semana: Optional[int] = None, nombre_hacienda: Optional[str] = None) -> pd.DataFrame:
+        """
+        Totales por warehouse/año/semana/hacienda, incluida la tasa de UW y OW
+
+        La tasa es uw (u ow) sobre el total de pesos leídos (spec por caja).
+        """
+        df = self.read("cajas", warehouse, annio, semana, semana, nombre_hacienda,
+                       columns=["warehouse", "annio", "semana", "nombre_hacienda",
+                                "peso_total_kg", "uw", "ow", "spec"])
+        if df.empty:
+            return df
+
+        resumen = df.groupby(["warehouse", "annio", "semana", "nombre_hacienda"], observed=True).agg(
+            total_cajas=("uw", "size"),
+            peso_total_kg=("peso_total_kg", "sum"),
+            total_uw=("uw", "sum"),
+            total_ow=("ow", "sum"),
+            total_pesos=("spec", "sum"),
+        ).reset_index()
+        resumen["tasa_uw"] = (resumen["total_uw"] / resumen["total_pesos"]).astype("float64").round(4)
+        resumen["tasa_ow"] = (resumen["total_ow"] / resumen["total_pesos"]).astype("float64").round(4)
+        return resumen
+
+    def sql(self, query: str) -> pd.DataFrame:
+        """
+        Ejecuta SQL sobre las vistas "archivos" y "cajas" (requiere duckdb)
+
+        Ejemplo: SELECT semana, SUM(uw) FROM cajas WHERE warehouse = 'KOBE' GROUP BY 1
+        """
+        if duckdb is None:
+            raise RuntimeError("Las consultas SQL locales requieren el paquete duckdb (pip install duckdb)")
+
+        con = duckdb.connect()
+        try:
+            for tabla in TABLAS:
+                path = self._table_path(tabla)
+                if os.path.exists(path):
+                    patron = os.path.join(path, "**", "*.parquet").replace("'", "''")
+                    con.execute(f"CREATE VIEW {tabla} AS SELECT * FROM "
+                                f"read_parquet('{patron}', hive_partitioning = true)")
+            return con.execute(query).df()
+        finally:
+            con.close()
+
+    def to_upload_frames(self, warehouse: str, annio: int, semana_desde: Optional[int] = None,
+                         semana_hasta: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Lee particiones locales con las columnas exactas de T1_ARCHIVOS y T2_CAJAS
+
+        Permite usar la copia local como staging para recargas masivas sin volver
+        a parsear los Excel.
+
+        Returns:
+            Tupla (DataFrame de archivos, DataFrame de cajas)
+        """
+        archivos = self.read("archivos", warehouse, annio, semana_desde, semana_hasta)
+        cajas = self.read("cajas", warehouse, annio, semana_desde, semana_hasta)
+        return (
+            archivos.reindex(columns=list(ARCHIVO_DTYPES)),
+            cajas.reindex(columns=list(CAJA_DTYPES)),
+        )
@@ -0,0 +1,81 @@
+import logging
+import os
+import uuid
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TABLAS = ("archivos", "cajas")
+
+
+class QuarantineStore:
+    """
+    Filas que no pasaron la validación de calidad, en Parquet local
+
+    Cada lote escribe una parte por tabla en <QUARANTINE_PATH>/<tabla>/fecha=AAAA-MM-DD/,
+    con las columnas originales más motivos y fecha_cuarentena, así se pueden
+    revisar, corregir y volver a cargar.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = settings.quarantine_path if root is None else root
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def write(self, archivos: pa.Table, cajas: pa.Table) -> bool:
+        """
+        Agrega las filas en cuarentena
+
+        Args:
+            archivos: Archivos en cuarentena (con motivos)
+            cajas: Cajas en cuarentena (con motivos)
+
+        Returns:
+            True si la escritura fue exitosa
+        """
+        if not self.enabled:
+            return True
+
+        try:
+            particion = f"fecha={date.today().isoformat()}"
+            for tabla, datos in zip(TABLAS, (archivos, cajas)):
+                if not datos.num_rows:
+                    continue
+                carpeta = os.path.join(self.root, tabla, particion)
+                os.makedirs(carpeta, exist_ok=True)
+                pq.write_table(datos, os.path.join(carpeta, f"part-{uuid.uuid4().hex}.parquet"))
+
+            logger.info("Cuarentena: %d archivos y %d cajas en %s", archivos.num_rows, cajas.num_rows, self.root)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error escribiendo la cuarentena en {self.root}: {e}")
+            return False
+
+    def read(self, tabla: str) -> pd.DataFrame:
+        """
+        Lee todas las filas en cuarentena de una tabla
+
+        Args:
+            tabla: "archivos" o "cajas"
+
+        Returns:
+            DataFrame con las filas, sus motivos y la fecha de la partición
+        """
+        if tabla not in TABLAS:
+            raise ValueError(f"Tabla de cuarentena desconocida: {tabla}. Opciones: {', '.join(TABLAS)}")
+
+        path = os.path.join(self.root, tabla)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        return ds.dataset(path, format="parquet", partitioning="hive").to_table().to_pandas()
@@ -0,0 +1,254 @@
+import atexit
+import contextlib
+import cProfile
+import csv
+import functools
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Union, BinaryIO
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MedicionEtapa:
+    """Tiempo y memoria de una ejecución de una etapa (por libro y hoja si se conocen)"""
+    etapa: str
+    archivo: str
+    tamano_bytes: int
+    segundos: float
+    memoria_pico_bytes: int
+    hoja: str = ""
+
+
+class _EtapaActiva:
+    def __init__(self, nombre: str, profile: Optional[cProfile.Profile]):
+        self.nombre = nombre
+        self.profile = profile
+        self.inicio = time.perf_counter()
+        self.memoria_inicial = tracemalloc.get_traced_memory()[0]
+        self.pico = 0
+
+
+def _tamano(ruta_archivo: Union[str, BinaryIO, None]) -> int:
+    from src.excel_bigquery.core.use_cases.interfaces.excel_reader import obtener_tamano_archivo
+
+    try:
+        if ruta_archivo is None:
+            return 0
+        if isinstance(ruta_archivo, str):
+            return obtener_tamano_archivo(ruta_archivo)
+        return len(ruta_archivo.getbuffer())
+    except Exception:
+        return 0
+
+
+class StageProfiler:
+    """
+    Perfilado opcional por etapa (procesar archivo, cajas, cargas)
+
+    Deshabilitado no agrega costo: stage() devuelve un contexto vacío. Habilitado
+    (PROFILE_ENABLED=true o python main.py --perfil ...) cada etapa corre con
+    su propio cProfile y con tracemalloc, y se guarda tiempo y pico de memoria
+    por archivo. Al terminar, dump() escribe un .prof por etapa (se abre con
+    pstats, snakeviz o gprof2dot), un CSV con las mediciones y un reporte con
+    los archivos más lentos y los que más memoria usaron.
+
+    Las etapas anidadas se miden de forma exclusiva en cProfile (se pausa el
+    perfil de la etapa externa). cProfile solo se activa en un hilo a la vez;
+    las etapas de otros hilos se miden sin perfil de funciones. Los procesos
+    del pool (programar, backfill, servidor) no se perfilan.
+    """
+
+    def __init__(self, directorio: Optional[str] = None, top_n: Optional[int] = None):
+        self.directorio = directorio or settings.profile_dir
+        self.top_n = top_n or settings.profile_top_n
+        self.enabled = False
+        self.mediciones: List[MedicionEtapa] = []
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hilo_perfil: Optional[int] = None
+        self._atexit = False
+
+    def enable(self):
+        """Activa el perfilado (tracemalloc arranca aquí) y escribe el reporte al salir"""
+        if self.enabled:
+            return
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if not self._atexit:
+            atexit.register(self.dump)
+            self._atexit = True
+        logger.info("Perfilado habilitado; resultados en %s", self.directorio)
+
+    def _pila(self) -> List[_EtapaActiva]:
+        if not hasattr(self._local, "pila"):
+            self._local.pila = []
+        return self._local.pila
+
+    def _profile_para(self, nombre: str) -> Optional[cProfile.Profile]:
+        hilo = threading.get_ident()
+        with self._lock:
+            if self._hilo_perfil is None:
+                self._hilo_perfil = hilo
+            if self._hilo_perfil != hilo:
+                return None
+            return self._profiles.setdefault(nombre, cProfile.Profile())
+
+    def stage(self, nombre: str, archivo: str = "", ruta_archivo: Union[str, BinaryIO, None] = None,
+              hoja: str = ""):
+        """
+        Contexto que mide una etapa
+
+        Args:
+            nombre: Nombre de la etapa (archivo, cajas, carga_archivos, ...)
+            archivo: Nombre del libro procesado (vacío para etapas de carga)
+            ruta_archivo: Ruta o stream del libro, para reportar su tamaño
+            hoja: Hoja del libro en libros con varias hojas
+
+        Returns:
+            Context manager (vacío si el perfilado está deshabilitado)
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._medir(nombre, archivo, ruta_archivo, hoja)
+
+    @contextlib.contextmanager
+    def _medir(self, nombre: str, archivo: str, ruta_archivo, hoja: str):
+        pila = self._pila()
+        externa = pila[-1] if pila else None
+
+        if externa is not None:
+            # La memoria de la etapa interna también cuenta para la externa
+            externa.pico = max(externa.pico, tracemalloc.get_traced_memory()[1])
+            if externa.profile is not None:
+                externa.profile.disable()
+
+        tracemalloc.reset_peak()
+        actual = _EtapaActiva(nombre, self._profile_para(nombre))
+        pila.append(actual)
+        if actual.profile is not None:
+            actual.profile.enable()
+
+        try:
+            yield
+        finally:
+            if actual.profile is not None:
+                actual.profile.disable()
+            pila.pop()
+
+            pico = max(actual.pico, tracemalloc.get_traced_memory()[1])
+            medicion = MedicionEtapa(
+                nombre, archivo, _tamano(ruta_archivo),
+                time.perf_counter() - actual.inicio, max(0, pico - actual.memoria_inicial), hoja
+            )
+            with self._lock:
+                self.mediciones.append(medicion)
+
+            if externa is not None:
+                externa.pico = max(externa.pico, pico)
+                if externa.profile is not None:
+                    externa.profile.enable()
+
+    def report(self, mediciones: Optional[List[MedicionEtapa]] = None) -> str:
+        """Texto con los top N archivos más lentos y con más memoria, y totales por etapa"""
+        if mediciones is None:
+            with self._lock:
+                mediciones = list(self.mediciones)
+
+        lineas = ["Totales por etapa:"]
+        etapas: Dict[str, List[MedicionEtapa]] = {}
+        for medicion in mediciones:
+            etapas.setdefault(medicion.etapa, []).append(medicion)
+        for etapa, lista in etapas.items():
+            lineas.append(f"  {etapa}: {len(lista)} ejecuciones, {sum(m.segundos for m in lista):.2f}s, "
+                          f"pico máx {max(m.memoria_pico_bytes for m in lista) / 1024 ** 2:.1f} MB")
+
+        # Un libro pasa por varias etapas (y hojas): se suman por libro; el tamaño lo reporta la etapa que lo abre
+        por_archivo: Dict[str, dict] = {}
+        for medicion in mediciones:
+            if not medicion.archivo:
+                continue
+            total = por_archivo.setdefault(medicion.archivo, {
+                "archivo": medicion.archivo, "tamano": 0, "segundos": 0.0, "pico": 0
+            })
+            total["tamano"] = max(total["tamano"], medicion.tamano_bytes)
+            total["segundos"] += medicion.segundos
+            total["pico"] = max(total["pico"], medicion.memoria_pico_bytes)
+
+        def _fila(total: dict) -> str:
+            return (f"  {total['archivo']}: {total['segundos']:.2f}s, pico {total['pico'] / 1024 ** 2:.1f} MB, "
+                    f"tamaño {total['tamano'] / 1024:.0f} KB")
+
+        lineas.append(f"\nTop {self.top_n} archivos más lentos:")
+        lineas.extend(_fila(t) for t in sorted(por_archivo.values(), key=lambda t: t["segundos"], reverse=True)[:self.top_n])
+        lineas.append(f"\nTop {self.top_n} archivos con más memoria:")
+        lineas.extend(_fila(t) for t in sorted(por_archivo.values(), key=lambda t: t["pico"], reverse=True)[:self.top_n])
+        return "\n".join(lineas)
+
+    def dump(self) -> Optional[str]:
+        """
+        Escribe los .prof por etapa, el CSV de mediciones y el reporte
+
+        Returns:
+            Carpeta con los resultados (None si no hubo mediciones)
+        """
+        if not self.mediciones:
+            return None
+
+        carpeta = os.path.join(self.directorio, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(carpeta, exist_ok=True)
+
+        with self._lock:
+            profiles = dict(self._profiles)
+            mediciones = list(self.mediciones)
+            self.mediciones = []
+            self._profiles = {}
+
+        for etapa, profile in profiles.items():
+            try:
+                pstats.Stats(profile).dump_stats(os.path.join(carpeta, f"{etapa}.prof"))
+            except TypeError:
+                # La etapa nunca llegó a ejecutar código perfilado
+                continue
+
+        with open(os.path.join(carpeta, "mediciones.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["etapa", "archivo", "hoja", "tamano_bytes", "segundos", "memoria_pico_bytes"])
+            for m in mediciones:
+                writer.writerow([m.etapa, m.archivo, m.hoja, m.tamano_bytes, round(m.segundos, 4),
+                                 m.memoria_pico_bytes])
+
+        reporte = self.report(mediciones)
+        with open(os.path.join(carpeta, "reporte.txt"), "w", encoding="utf-8") as f:
+            f.write(reporte + "\n")
+
+        logger.info("Perfil guardado en %s\n%s", carpeta, reporte)
+        return carpeta
+
+
+def profiled(nombre: str):
+    """Decorador que mide el método como una etapa (sin archivo asociado)"""
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_profiler.stage(nombre):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+# Compartido por todo el proceso
+stage_profiler = StageProfiler()
+if settings.profile_enabled:
+    stage_profiler.enable()
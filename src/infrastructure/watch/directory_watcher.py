@@ -0,0 +1,257 @@
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Callable, Optional
+
+from src.config.settings import settings
+from src.excel_bigquery.core.use_cases.interfaces.excel_reader import _es_archivo_excel, _limpiar_nombre_archivo
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # pragma: no cover - depende de la plataforma
+    INotify = None
+    inotify_flags = None
+
+logger = logging.getLogger(__name__)
+
+
+def procesar_archivo_asentado(ruta: str, warehouse: str) -> Tuple[bytes, bytes]:
+    """
+    Procesa un archivo (o bundle .zip) que terminó de escribirse
+
+    Se ejecuta en un proceso del pool.
+
+    Args:
+        ruta: Ruta del archivo .xlsx o .zip
+        warehouse: Warehouse de la carpeta vigilada
+
+    Returns:
+        Archivos y cajas como bytes Arrow IPC (ParsedBatch.to_ipc)
+    """
+    from src.excel_bigquery.core.services.excel_processor_service import ExcelProcessorService
+    from src.excel_bigquery.core.use_cases.interfaces.excel_reader import excel_reader
+
+    processor = ExcelProcessorService()
+
+    if ruta.lower().endswith('.zip'):
+        miembros, _ = excel_reader(ruta)
+    else:
+        miembros = [(_limpiar_nombre_archivo(os.path.basename(ruta)), ruta)]
+
+    resultados = []
+    for nombre_limpio, ruta_archivo in miembros:
+        resultados.extend(processor.process_workbook(nombre_limpio, ruta_archivo, warehouse))
+    return ParsedBatch.from_results(resultados).to_ipc()
+
+
+class DirectoryWatcher:
+    """
+    Vigila carpetas de warehouses y notifica los archivos nuevos o modificados
+    cuando dejan de cambiar
+
+    Usa inotify (paquete inotify_simple) si está disponible y, si no, sondea el
+    mtime/tamaño de las entradas de cada carpeta. Un archivo se considera
+    asentado cuando su tamaño y mtime no cambian durante settle_seconds y,
+    para .xlsx/.zip, cuando ya tiene un directorio zip válido (no está a medio escribir).
+    """
+
+    def __init__(self, carpetas: Dict[str, str], on_settled: Callable[[str, str], None],
+                 settle_seconds: Optional[float] = None, poll_seconds: Optional[float] = None,
+                 incluir_existentes: bool = False):
+        """
+        Args:
+            carpetas: Diccionario {warehouse: ruta de la carpeta}
+            on_settled: Callback (ruta, warehouse) para cada archivo asentado
+            settle_seconds: Segundos sin cambios para considerar el archivo terminado
+            poll_seconds: Intervalo de sondeo sin inotify
+            incluir_existentes: Si procesar los archivos que ya estaban al iniciar
+        """
+        self.carpetas = carpetas
+        self.on_settled = on_settled
+        self.settle_seconds = settle_seconds or settings.watch_settle_seconds
+        self.poll_seconds = poll_seconds or settings.watch_poll_seconds
+
+        # ruta -> (tamaño, mtime) de la última versión ya entregada
+        self._entregados: Dict[str, Tuple[int, float]] = {}
+        # ruta -> (warehouse, tamaño, mtime, instante del último cambio)
+        self._candidatos: Dict[str, Tuple[str, int, float, float]] = {}
+
+        self._inotify = None
+        self._wd_a_carpeta: Dict[int, Tuple[str, str]] = {}
+
+        for warehouse, carpeta in carpetas.items():
+            for ruta in self._listar(carpeta):
+                firma = self._firma(ruta)
+                if firma is None:
+                    continue
+                if incluir_existentes:
+                    self._marcar_candidato(ruta, warehouse, firma)
+                else:
+                    self._entregados[ruta] = firma
+
+    @property
+    def modo(self) -> str:
+        return "inotify" if self._inotify is not None else "polling"
+
+    def run(self, detener: Callable[[], bool] = lambda: False):
+        """
+        Ciclo principal de vigilancia
+
+        Args:
+            detener: Función que retorna True cuando se debe salir del ciclo
+        """
+        self._iniciar_inotify()
+        logger.info(f"Vigilando {len(self.carpetas)} carpetas en modo {self.modo}")
+
+        while not detener():
+            if self._inotify is not None:
+                self._leer_eventos_inotify()
+            else:
+                self._sondear()
+                time.sleep(self.poll_seconds)
+
+            self._entregar_asentados()
+
+    def _iniciar_inotify(self):
+        if INotify is None:
+            return
+
+        try:
+            self._inotify = INotify()
+            mascara = (inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO |
+                       inotify_flags.CREATE | inotify_flags.MODIFY)
+            for warehouse, carpeta in self.carpetas.items():
+                wd = self._inotify.add_watch(carpeta, mascara)
+                self._wd_a_carpeta[wd] = (warehouse, carpeta)
+        except OSError as e:
+            # Ej. carpetas de red (SMB/NFS) o límite de watches: sondear
+            logger.warning(f"inotify no disponible ({e}), usando sondeo por mtime")
+            self._inotify = None
+            self._wd_a_carpeta = {}
+
+    def _leer_eventos_inotify(self):
+        # El timeout permite revisar los candidatos aunque no lleguen eventos
+        timeout_ms = int(min(self.settle_seconds, self.poll_seconds) * 1000)
+        for evento in self._inotify.read(timeout=timeout_ms):
+            if evento.wd not in self._wd_a_carpeta or not evento.name:
+                continue
+            if not self._es_vigilable(evento.name):
+                continue
+
+            warehouse, carpeta = self._wd_a_carpeta[evento.wd]
+            ruta = os.path.join(carpeta, evento.name)
+            firma = self._firma(ruta)
+            if firma is not None:
+                self._marcar_candidato(ruta, warehouse, firma)
+
+    def _sondear(self):
+        for warehouse, carpeta in self.carpetas.items():
+            for ruta in self._listar(carpeta):
+                firma = self._firma(ruta)
+                if firma is None or self._entregados.get(ruta) == firma:
+                    continue
+                self._marcar_candidato(ruta, warehouse, firma)
+
+    def _marcar_candidato(self, ruta: str, warehouse: str, firma: Tuple[int, float]):
+        anterior = self._candidatos.get(ruta)
+        if anterior is None or (anterior[1], anterior[2]) != firma:
+            self._candidatos[ruta] = (warehouse, firma[0], firma[1], time.monotonic())
+
+    def _entregar_asentados(self):
+        ahora = time.monotonic()
+
+        for ruta, (warehouse, tamano, mtime, ultimo_cambio) in list(self._candidatos.items()):
+            firma = self._firma(ruta)
+            if firma is None:
+                # El archivo se borró o renombró antes de asentarse
+                del self._candidatos[ruta]
+                continue
+
+            if firma != (tamano, mtime):
+                self._candidatos[ruta] = (warehouse, firma[0], firma[1], ahora)
+                continue
+
+            if ahora - ultimo_cambio < self.settle_seconds:
+                continue
+
+            if ruta.lower().endswith(('.xlsx', '.zip')) and not zipfile.is_zipfile(ruta):
+                # Aún a medio escribir (o corrupto): esperar otro ciclo
+                self._candidatos[ruta] = (warehouse, tamano, mtime, ahora)
+                continue
+
+            del self._candidatos[ruta]
+            if self._entregados.get(ruta) == firma:
+                continue
+
+            self._entregados[ruta] = firma
+            try:
+                self.on_settled(ruta, warehouse)
+            except Exception as e:
+                logger.error(f"Error entregando {ruta}: {e}")
+
+    def _listar(self, carpeta: str) -> List[str]:
+        try:
+            return [entrada.path for entrada in os.scandir(carpeta)
+                    if entrada.is_file() and self._es_vigilable(entrada.name)]
+        except OSError as e:
+            logger.warning(f"No se pudo listar {carpeta}: {e}")
+            return []
+
+    @staticmethod
+    def _es_vigilable(nombre: str) -> bool:
+        # _es_archivo_excel ya descarta los archivos de bloqueo ~$ de Excel
+        return _es_archivo_excel(nombre) or (nombre.lower().endswith('.zip') and not nombre.startswith('~$'))
+
+    @staticmethod
+    def _firma(ruta: str) -> Optional[Tuple[int, float]]:
+        try:
+            stat = os.stat(ruta)
+            return stat.st_size, stat.st_mtime
+        except OSError:
+            return None
+
+
+class WatchIngestionDaemon:
+    """Une el DirectoryWatcher con el parseo en procesos y la carga en micro-lotes"""
+
+    def __init__(self, carpetas: Dict[str, str], upload_service=None, workers: int = None,
+                 incluir_existentes: bool = False):
+        from src.excel_bigquery.core.services.micro_batch_service import MicroBatchUploader
+
+        if upload_service is None:
+            from src.excel_bigquery.core.services.upload_service import UploadService
+            upload_service = UploadService()
+
+        self.executor = ProcessPoolExecutor(max_workers=workers or settings.ingest_workers)
+        self.batcher = MicroBatchUploader(upload_service)
+        self.watcher = DirectoryWatcher(carpetas, self._on_settled, incluir_existentes=incluir_existentes)
+
+    def _on_settled(self, ruta: str, warehouse: str):
+        logger.info(f"Archivo listo para procesar: {ruta} ({warehouse})")
+        future = self.executor.submit(procesar_archivo_asentado, ruta, warehouse)
+        future.add_done_callback(lambda f: self._on_parseado(ruta, f))
+
+    def _on_parseado(self, ruta: str, future):
+        try:
+            self.batcher.add_batch(ParsedBatch.from_ipc(future.result()))
+        except Exception as e:
+            logger.error(f"Error procesando {ruta}: {e}")
+
+    def run(self):
+        """Vigila hasta recibir Ctrl+C; al salir carga el último lote"""
+        self.batcher.start()
+        try:
+            self.watcher.run()
+        except KeyboardInterrupt:
+            logger.info("Deteniendo vigilancia...")
+        finally:
+            self.executor.shutdown(wait=True)
+            self.batcher.stop()
+
+
+def get_carpetas_vigiladas() -> Dict[str, str]:
+    """Retorna {warehouse: ruta} para NITTSU_PATH, KOBE_PATH y HAKATA_PATH existentes"""
+    return {nombre.upper(): ruta for nombre, ruta in settings.get_available_paths().items()}
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+
+import pyarrow as pa
+import pytest
+
+# Settings lee el entorno al importarse y configura el log en archivo: los
+# archivos que escribe la aplicación van a una carpeta temporal, no a logs/
+_SALIDA = tempfile.mkdtemp(prefix="upload_banano_tests_")
+for _variable, _nombre in (("LOG_FILE", "app.log"), ("QUARANTINE_PATH", "cuarentena"),
+                           ("COST_LOG_FILE", "bigquery_costos.jsonl"), ("LOAD_STAGING_PATH", "staging_cargas"),
+                           ("BATCH_SPOOL_PATH", "lotes_sin_cargar"), ("PROFILE_DIR", "perfiles")):
+    os.environ[_variable] = os.path.join(_SALIDA, _nombre)
+
+# Los módulos se importan como src.* desde la raíz del repositorio (igual que main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.infrastructure.dataframes.parsed_batch import ARCHIVO_SCHEMA, CAJA_SCHEMA, ParsedBatch  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _salida_temporal(tmp_path, monkeypatch):
+    """Cuarentena, costos, staging y spool de cada test en su propio tmp_path"""
+    from src.config.settings import settings
+    from src.infrastructure.bigquery.cost_log import cost_log
+
+    monkeypatch.setattr(settings, "quarantine_path", str(tmp_path / "cuarentena"))
+    monkeypatch.setattr(settings, "cost_log_file", str(tmp_path / "bigquery_costos.jsonl"))
+    monkeypatch.setattr(settings, "load_staging_path", str(tmp_path / "staging_cargas"))
+    monkeypatch.setattr(settings, "batch_spool_path", str(tmp_path / "lotes_sin_cargar"))
+    monkeypatch.setattr(cost_log, "archivo", settings.cost_log_file)
+
+
+def _fila(schema: pa.Schema, valores: dict) -> dict:
+    return {campo.name: valores.get(campo.name) for campo in schema}
+
+
+@pytest.fixture
+def hacer_lote():
+    """Arma un ParsedBatch: archivos como {fp_archivo: warehouse}, n cajas válidas por archivo"""
+    def _hacer(archivos: dict, cajas_por_archivo: int = 2, **caja) -> ParsedBatch:
+        filas_archivos, filas_cajas = [], []
+        for fp, warehouse in archivos.items():
+            filas_archivos.append(_fila(ARCHIVO_SCHEMA, {
+                "id_archivo": f"A{fp}", "archivo": f"libro_{fp}.xlsx", "warehouse": warehouse,
+                "annio": 2024, "semana": 10, "fp_archivo": fp,
+            }))
+            for i in range(cajas_por_archivo):
+                filas_cajas.append(_fila(CAJA_SCHEMA, {
+                    "id_caja": f"C{fp}_{i}", "id_archivo": f"A{fp}", "codigo_container": "CONT1",
+                    "codigo_hacienda": 5, "codigo_trazabilidad": "1024A", "nombre_hacienda": "HDA",
+                    "dedos_totales": 100, "peso_bruto_kg": 20.0, "peso_total_kg": 18.5, "peso_promedio": 500.0,
+                    "week_code": 10, "year_code": 2024, "fp_caja": fp * 1000 + i, "fp_archivo": fp, **caja,
+                }))
+        return ParsedBatch(pa.Table.from_pylist(filas_archivos, schema=ARCHIVO_SCHEMA),
+                           pa.Table.from_pylist(filas_cajas, schema=CAJA_SCHEMA))
+    return _hacer
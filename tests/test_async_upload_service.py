@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.config.settings import settings
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.services.async_upload_service import AsyncUploadService
+from src.excel_bigquery.core.services.rollup_service import WeeklyRollup
+from src.excel_bigquery.core.services.upload_service import UploadService
+from src.infrastructure.bigquery.cost_log import cost_log
+
+
+def _archivo(n: int) -> ArchivoModel:
+    return ArchivoModel(id_archivo=f"A{n}", archivo=f"libro_{n}.xlsx", warehouse="W1", puerto="PTO",
+                        buque="BUQUE", annio=2024, semana=10, spec=1, tipo="T")
+
+
+def _caja(archivo: ArchivoModel, i: int) -> CajaModel:
+    return CajaModel(id_caja=f"C{archivo.id_archivo}_{i}", id_archivo=archivo.id_archivo, nombre_caja=f"caja {i}",
+                     codigo_container="CONT1", codigo_hacienda=5, codigo_trazabilidad="1024A",
+                     nombre_hacienda="HDA", temperatura=13.0, dedos_totales=100, peso_bruto_kg=20.0,
+                     peso_total_kg=18.5, cantidad_observaciones=0, dedos_afectados_totales=0,
+                     peso_promedio=500.0, week_code=10, year_code=2024, spec=1, uw=1, ow=0)
+
+
+class _JobFalso:
+    job_id = "job_falso"
+    error_result = None
+
+    def done(self):
+        return True
+
+    def result(self):
+        return []
+
+
+class _ClienteFalso:
+    """Cliente de BigQuery en memoria: registra los load jobs iniciados"""
+
+    def __init__(self, table_id: str):
+        self.dataset_id = "DS"
+        self.table_id = table_id
+        self.cargados = []
+
+    def create_dataset_if_not_exists(self):
+        pass
+
+    def create_table_if_not_exists(self):
+        pass
+
+    def _models_to_dataframe(self, modelos):
+        return list(modelos)
+
+    def _use_storage_write(self, filas):
+        return False
+
+    def _start_upload_dataframe(self, df):
+        self.cargados.append(df)
+        return _JobFalso()
+
+
+class _Registro:
+    """Registra las llamadas a sus métodos"""
+
+    def __init__(self, **retornos):
+        self.llamadas = []
+        self._retornos = retornos
+
+    def __getattr__(self, nombre):
+        def _metodo(*args, **kwargs):
+            self.llamadas.append((nombre, args))
+            return self._retornos.get(nombre)
+        return _metodo
+
+
+class _CalidadFalsa:
+    def apply_models(self, archivos, cajas):
+        # Las cajas sin peso quedan en cuarentena
+        return archivos, [caja for caja in cajas if caja.peso_promedio > 0]
+
+
+@pytest.fixture
+def servicio(monkeypatch):
+    monkeypatch.setattr(settings, "rollup_enabled", True)
+    monkeypatch.setattr(settings, "cajas_dimensional", False)
+    monkeypatch.setattr(cost_log, "record", lambda job, etiqueta: None)
+
+    upload_service = UploadService.__new__(UploadService)
+    upload_service.bigquery_client = _ClienteFalso("T1_ARCHIVOS")
+    upload_service.caja_bigquery_client = _ClienteFalso("T2_CAJAS")
+    upload_service.rollup_client = _Registro(record_files=True, rebuild_weeks=True)
+    upload_service.local_store = _Registro()
+    upload_service.data_quality = _CalidadFalsa()
+    upload_service.excel_processor = None
+    upload_service.consolidated_load = None
+    return AsyncUploadService(upload_service, poll_interval=0)
+
+
+def test_sube_archivos_y_cajas_con_la_logica_de_upload_service(servicio):
+    archivos = [_archivo(1), _archivo(2)]
+    cajas = [_caja(archivo, i) for archivo in archivos for i in range(3)]
+    cajas[0].peso_promedio = 0.0
+
+    assert asyncio.run(servicio.upload_models(archivos, cajas, check_duplicates=False))
+
+    upload_service = servicio.upload_service
+    assert upload_service.bigquery_client.cargados == [archivos]
+    assert upload_service.caja_bigquery_client.cargados == [cajas[1:]]
+    # Rollup calculado sin la caja en cuarentena: totales por archivo y luego la semana
+    (registro, (filas,)), recalculo = upload_service.rollup_client.llamadas
+    assert registro == "record_files"
+    assert sorted((fila["fp_archivo"], fila["total_cajas"]) for fila in filas) == sorted(
+        [(archivos[0].fp_archivo, 2), (archivos[1].fp_archivo, 3)])
+    assert recalculo == ("rebuild_weeks", ([("W1", 2024, 10)],))
+    assert upload_service.local_store.llamadas == [("append", (archivos, cajas[1:]))]
+
+
+def test_con_carga_consolidada_deja_el_lote_en_la_ventana_y_la_carga(servicio, monkeypatch):
+    archivos = [_archivo(1)]
+    cajas = [_caja(archivos[0], 0)]
+    upload_service = servicio.upload_service
+    upload_service.consolidated_load = _Registro(stage=True, flush=True)
+    monkeypatch.setattr(upload_service, "parse_path",
+                        lambda path, include_cajas: (archivos, cajas, WeeklyRollup.from_models(archivos, cajas)))
+
+    assert asyncio.run(servicio.process_and_upload_excel_files("libros", diferir_carga=True))
+    assert [nombre for nombre, _ in upload_service.consolidated_load.llamadas] == ["stage"]
+
+    assert asyncio.run(servicio.process_and_upload_excel_files("libros"))
+    assert [nombre for nombre, _ in upload_service.consolidated_load.llamadas] == ["stage", "stage", "flush"]
+    # Nada se cargó directo: los load jobs los hace la ventana consolidada
+    assert upload_service.bigquery_client.cargados == []
+    batch = upload_service.consolidated_load.llamadas[0][1][0]
+    assert (batch.num_archivos, batch.num_cajas) == (1, 1)
@@ -0,0 +1,37 @@
+from openpyxl import Workbook
+
+from src.excel_bigquery.core.services.backfill_service import (
+    leer_cabecera, leer_cabeceras, procesar_fuente_en_rango,
+)
+
+
+def _libro(tmp_path, semanas: dict, activa: str) -> str:
+    wb = Workbook()
+    wb.remove(wb.active)
+    for titulo, semana in semanas.items():
+        ws = wb.create_sheet(titulo)
+        ws["B2"] = "CAJA 1"
+        ws["T1"] = semana
+        ws["A2"] = "Year 2024"
+    wb.active = wb[activa]
+    ruta = str(tmp_path / "libro.xlsx")
+    wb.save(ruta)
+    return ruta
+
+
+def test_lee_la_cabecera_de_todas_las_hojas_con_formato(tmp_path):
+    ruta = _libro(tmp_path, {"S10": 10, "S12": 12}, activa="S10")
+    assert leer_cabeceras(ruta) == [(2024, 10), (2024, 12)]
+    assert leer_cabecera(ruta) == (2024, 12)
+
+
+def test_libro_fuera_del_rango_no_se_procesa(tmp_path):
+    ruta = _libro(tmp_path, {"S10": 10, "S12": 12}, activa="S10")
+    assert procesar_fuente_en_rango("libro.xlsx", ruta, "W1", 2024, 20, 30) is None
+    assert procesar_fuente_en_rango("libro.xlsx", ruta, "W1", 2023, 10, 12) is None
+
+
+def test_hoja_no_activa_en_el_rango_se_procesa(tmp_path):
+    ruta = _libro(tmp_path, {"S10": 10, "S12": 12}, activa="S10")
+    resultados = procesar_fuente_en_rango("libro.xlsx", ruta, "W1", 2024, 12, 12)
+    assert [archivo.archivo for archivo, _ in resultados] == ["libro.xlsx#S12"]
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from benchmarks import parser_benchmarks
+from benchmarks.parser_benchmarks import N_CODIGOS, comparar, construir_benchmarks, medir
+
+
+@pytest.fixture(scope="module")
+def benchmarks(tmp_path_factory):
+    return construir_benchmarks(str(tmp_path_factory.mktemp("bench")))
+
+
+def test_todos_los_benchmarks_se_ejecutan(benchmarks):
+    for funcion in benchmarks.values():
+        funcion()
+
+
+def test_decodificador_en_lote_mas_rapido_que_el_escalar(benchmarks):
+    # Relación en la misma máquina: no depende de una baseline
+    lote = medir(benchmarks[f"trazabilidad_lote_x{N_CODIGOS}"], repeticiones=5)["min"]
+    escalar = medir(benchmarks[f"trazabilidad_escalar_x{N_CODIGOS}"], repeticiones=5)["min"]
+    assert lote * 2 < escalar, f"lote {lote * 1e6:.0f} µs vs escalar {escalar * 1e6:.0f} µs"
+
+
+def test_comparar_usa_el_tiempo_relativo_y_el_umbral_de_cada_benchmark():
+    baseline = {"peso_columna": {"min": 1.0, "relativo": 0.01, "umbral": 0.2},
+                "archivo_libro": {"min": 1.0, "relativo": 4.0, "umbral": 0.3}}
+    # Máquina el doble de lenta: los segundos no importan, solo la relación con la referencia
+    resultados = {"peso_columna": {"min": 2.0, "relativo": 0.0125},
+                  "archivo_libro": {"min": 2.0, "relativo": 5.0}}
+
+    regresiones = comparar(resultados, baseline, umbral=0.2)
+    assert [r.split(":")[0] for r in regresiones] == ["peso_columna"]
+    assert resultados["archivo_libro"]["estado"] == "ok"
+
+
+def test_la_baseline_esta_versionada():
+    assert os.path.exists(parser_benchmarks.BASELINE_FILE)
+
+
+def test_sin_regresiones_contra_la_baseline():
+    assert parser_benchmarks.main(["--repeticiones", "5"]) == 0
@@ -0,0 +1,33 @@
+import pytest
+from google.api_core import exceptions
+
+from src.infrastructure.bigquery.bigquery_client import BigQueryClient
+from src.infrastructure.bigquery.cost_log import QueryCostExceeded, cost_log
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    # Sin bigquery.Client: las consultas se reemplazan en cada test
+    cliente = BigQueryClient.__new__(BigQueryClient)
+    cliente.client = None
+    cliente.dataset_id = "DS"
+    cliente.table_id = "T1_ARCHIVOS"
+    monkeypatch.setattr(cliente, "create_dataset_if_not_exists", lambda: None)
+    monkeypatch.setattr(cliente, "create_table_if_not_exists", lambda: None)
+    return cliente
+
+
+@pytest.mark.parametrize("error", [
+    QueryCostExceeded("duplicados procesaría 10 GB"),
+    exceptions.BadRequest("Query exceeded limit for bytes billed: 1000000 (bytesBilledLimitExceeded)"),
+    exceptions.ServiceUnavailable("backend error"),
+])
+def test_la_verificacion_de_duplicados_fallida_cancela_la_carga(cliente, monkeypatch, error):
+    def _falla(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(cost_log, "run_query", _falla)
+
+    with pytest.raises(type(error)):
+        cliente.check_existing_fingerprints([1, 2])
+    with pytest.raises(type(error)):
+        cliente.check_existing_files([type("Archivo", (), {"fp_archivo": 1})()])
@@ -0,0 +1,86 @@
+import pyarrow as pa
+
+from src.config.settings import settings
+from src.excel_bigquery.core.services.data_quality_service import DataQualityService, validate_batch
+from src.infrastructure.dataframes.parsed_batch import ParsedBatch
+
+
+def _reemplazar(tabla: pa.Table, columna: str, valores: list) -> pa.Table:
+    indice = tabla.schema.get_field_index(columna)
+    return tabla.set_column(indice, columna, pa.array(valores, tabla.schema.field(columna).type))
+
+
+def test_lote_valido_no_genera_cuarentena(hacer_lote):
+    resultado = validate_batch(hacer_lote({1: "W1", 2: "W2"}), peso_min=300, peso_max=1500, tolerancia_semanas=1)
+    assert resultado.cantidad == 0
+    assert resultado.limpio.num_archivos == 2 and resultado.limpio.num_cajas == 4
+
+
+def test_una_caja_invalida_pone_en_cuarentena_todo_su_archivo(hacer_lote):
+    lote = hacer_lote({1: "W1", 2: "W2"})
+    cajas = _reemplazar(lote.cajas, "peso_promedio", [500.0, 5000.0, 500.0, 500.0])
+
+    resultado = validate_batch(ParsedBatch(lote.archivos, cajas), peso_min=300, peso_max=1500,
+                               tolerancia_semanas=1)
+
+    assert resultado.limpio.fps_archivos() == [2]
+    assert resultado.limpio.num_cajas == 2
+    assert resultado.archivos_cuarentena.column("motivos").to_pylist() == ["cajas en cuarentena"]
+    assert resultado.cajas_cuarentena.column("motivos").to_pylist() == [
+        "archivo en cuarentena", "archivo en cuarentena; peso fuera de rango"
+    ]
+    assert resultado.conteo_motivos() == {"cajas en cuarentena": 1, "archivo en cuarentena": 2,
+                                          "peso fuera de rango": 1}
+
+
+def test_reglas_de_archivo_y_de_cajas(hacer_lote):
+    lote = hacer_lote({1: "W1", 2: "W2", 3: "W3"}, cajas_por_archivo=1)
+    archivos = _reemplazar(lote.archivos, "annio", [0, 2024, 2024])
+    cajas = _reemplazar(lote.cajas, "week_code", [10, 14, 11])
+    cajas = _reemplazar(cajas, "codigo_container", ["CONT1", "CONT1", ""])
+
+    resultado = validate_batch(ParsedBatch(archivos, cajas), peso_min=300, peso_max=1500, tolerancia_semanas=1)
+
+    assert resultado.limpio.num_archivos == 0
+    motivos = dict(zip(resultado.cajas_cuarentena.column("fp_archivo").to_pylist(),
+                       resultado.cajas_cuarentena.column("motivos").to_pylist()))
+    assert motivos == {
+        1: "archivo en cuarentena",
+        2: "archivo en cuarentena; semana de trazabilidad distinta",
+        3: "archivo en cuarentena; container vacío",
+    }
+    assert resultado.archivos_cuarentena.column("motivos").to_pylist() == [
+        "año 0", "cajas en cuarentena", "cajas en cuarentena"
+    ]
+
+
+def test_semana_circular_entre_fin_y_comienzo_de_anio(hacer_lote):
+    lote = hacer_lote({1: "W1"}, cajas_por_archivo=1, week_code=52)
+    archivos = _reemplazar(lote.archivos, "semana", [1])
+
+    resultado = validate_batch(ParsedBatch(archivos, lote.cajas), peso_min=300, peso_max=1500,
+                               tolerancia_semanas=1)
+    assert resultado.cantidad == 0
+
+
+def _lote_con_una_caja_invalida(hacer_lote) -> ParsedBatch:
+    lote = hacer_lote({1: "W1", 2: "W2"})
+    return ParsedBatch(lote.archivos, _reemplazar(lote.cajas, "codigo_hacienda", [5, 0, 5, 5]))
+
+
+def test_sin_dq_excluir_solo_registra_la_cuarentena(hacer_lote, monkeypatch):
+    monkeypatch.setattr(settings, "quarantine_bigquery", False)
+    monkeypatch.setattr(settings, "dq_excluir", False)
+
+    lote = _lote_con_una_caja_invalida(hacer_lote)
+    servicio = DataQualityService()
+    assert servicio.apply(lote) is lote
+    assert len(servicio.store.read("cajas")) == 2
+
+
+def test_con_dq_excluir_no_carga_el_archivo_en_cuarentena(hacer_lote, monkeypatch):
+    monkeypatch.setattr(settings, "quarantine_bigquery", False)
+    monkeypatch.setattr(settings, "dq_excluir", True)
+
+    limpio = DataQualityService().apply(_lote_con_una_caja_invalida(hacer_lote))
+    assert limpio.fps_archivos() == [2] and limpio.num_cajas == 2
@@ -0,0 +1,57 @@
+import logging
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from src.excel_bigquery.core.utils import date_utils
+from src.excel_bigquery.core.utils.date_utils import decode_trazabilidad_batch, extract_week_and_year_from_trazabilidad
+
+
+@pytest.fixture(autouse=True)
+def _sin_avisos(monkeypatch):
+    # El decodificador escalar registra un aviso por código malformado
+    monkeypatch.setattr(logging.getLogger(date_utils.__name__), "disabled", True)
+
+
+def _ddmmyy(fecha: date) -> str:
+    return f"{fecha.day:02d}{fecha.month:02d}{fecha.year % 100:02d}"
+
+
+def _assert_paridad(codigos):
+    lote = decode_trazabilidad_batch(codigos)
+    escalar = [extract_week_and_year_from_trazabilidad(codigo) for codigo in codigos]
+    assert list(zip(lote.semanas, lote.annios)) == escalar
+    assert lote.validos == [resultado != (0, 0) for resultado in escalar]
+
+
+def test_paridad_en_todas_las_fechas_admitidas():
+    inicio = date(1931, 1, 1)
+    codigos = [f"020214{_ddmmyy(inicio + timedelta(days=i))}" for i in range((date(2030, 12, 31) - inicio).days + 1)]
+    _assert_paridad(codigos)
+
+
+def test_paridad_en_bordes_de_semana_iso():
+    # 29/12/2025 es semana 1 de 2026 en ISO; el año del código sigue siendo el calendario
+    assert extract_week_and_year_from_trazabilidad("020214291225") == (1, 2025)
+    assert extract_week_and_year_from_trazabilidad("020214010121") == (53, 2021)
+    _assert_paridad(["020214291225", "020214010121", "020214311230", "020214010131"])
+
+
+def test_paridad_con_codigos_malformados():
+    codigos = [None, "", "123", "12345", "020214320125", "020214290223", "020214ab0625",
+               "020214+10625", "020214 10625", "0202142606２５", "2606 25", "020214260625"]
+    _assert_paridad(codigos)
+
+    lote = decode_trazabilidad_batch(codigos)
+    assert lote.malformados["vacío"] == 2
+    assert lote.malformados["menos de 6 caracteres"] == 2
+    assert lote.cantidad_malformados == sum(not valido for valido in lote.validos)
+    assert all(len(ejemplos) <= 3 for ejemplos in lote.ejemplos.values())
+
+
+def test_paridad_con_codigos_aleatorios():
+    azar = random.Random(41)
+    alfabeto = "0123456789 +-x"
+    codigos = ["".join(azar.choice(alfabeto) for _ in range(azar.randint(0, 14))) for _ in range(5000)]
+    _assert_paridad(codigos)
@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+
+from src.infrastructure.coordination.lease_queue import FileLeaseQueue
+
+
+@pytest.fixture
+def nodos(tmp_path):
+    a = FileLeaseQueue(str(tmp_path), nodo="a", ttl=1, heartbeat=60)
+    b = FileLeaseQueue(str(tmp_path), nodo="b", ttl=1, heartbeat=60)
+    return a, b, FileLeaseQueue.clave("W1", "libro.xlsx")
+
+
+def _envejecer(ruta: str, segundos: float = 5):
+    t = time.time() - segundos
+    os.utime(ruta, (t, t))
+
+
+def test_claim_es_exclusivo(nodos):
+    a, b, clave = nodos
+    assert a.claim(clave)
+    assert not b.claim(clave)
+    assert a.held() == 1
+
+
+def test_release_permite_que_otro_nodo_lo_tome(nodos):
+    a, b, clave = nodos
+    assert a.claim(clave)
+    a.release(clave)
+    assert b.claim(clave)
+
+
+def test_complete_impide_reprocesar(nodos):
+    a, b, clave = nodos
+    assert a.claim(clave)
+    assert a.complete(clave)
+    assert a.is_done(clave)
+    assert not b.claim(clave)
+
+
+def test_lease_vencido_se_reasigna_y_el_dueno_lo_pierde(nodos):
+    a, b, clave = nodos
+    perdidos = []
+    a.al_perder = perdidos.append
+
+    assert a.claim(clave)
+    _envejecer(a._ruta_lease(clave))
+    assert b.claim(clave)
+
+    a.renew()
+    assert perdidos == [clave]
+    assert a.held() == 0
+
+    # El release del dueño anterior no borra el lease nuevo
+    a.release(clave)
+    assert os.path.exists(b._ruta_lease(clave))
+
+
+def test_renew_mantiene_vigente_el_lease(nodos):
+    a, b, clave = nodos
+    assert a.claim(clave)
+    _envejecer(a._ruta_lease(clave))
+    a.renew()
+    assert not b.claim(clave)
+
+
+def test_lease_vacio_vence_por_su_mtime(nodos):
+    a, b, clave = nodos
+    # Un nodo que cayó justo después de crear el lease lo deja vacío
+    open(a._ruta_lease(clave), "w").close()
+    assert not b.claim(clave)
+
+    _envejecer(a._ruta_lease(clave))
+    assert b.claim(clave)
+    assert not a.claim(clave)
+
+
+def test_lease_renovado_entre_la_lectura_y_el_retiro_se_restaura(nodos, monkeypatch):
+    a, b, clave = nodos
+    assert a.claim(clave)
+    ruta = a._ruta_lease(clave)
+    _envejecer(ruta)
+    vencido = b._leer(ruta)
+
+    # Sin hard links (SMB): la restauración no debe depender de os.link
+    def _sin_link(*args):
+        raise OSError("link no soportado")
+    monkeypatch.setattr(os, "link", _sin_link)
+
+    # Otro nodo retira el lease vencido y toma uno nuevo antes del rename de b
+    os.remove(ruta)
+    assert FileLeaseQueue._crear(ruta, {"nodo": "c", "token": "nuevo"})
+
+    assert not b._retirar_vencido(ruta, vencido[0]["token"], vencido[1])
+    assert b._leer(ruta)[0]["token"] == "nuevo"
+    assert [n for n in os.listdir(os.path.dirname(ruta)) if n.endswith(".vencido")] == []
@@ -0,0 +1,81 @@
+import os
+
+from src.excel_bigquery.core.services.consolidated_load_service import ConsolidatedLoadService
+from src.infrastructure.local_store.load_staging import LoadStagingArea
+
+
+def test_stage_y_seal_agrupan_los_lotes_en_una_ventana(tmp_path, hacer_lote):
+    area = LoadStagingArea(str(tmp_path))
+    assert area.seal() is None
+
+    primero = area.stage(hacer_lote({1: "W1"}))
+    segundo = area.stage(hacer_lote({2: "W2"}, cajas_por_archivo=3))
+    pendiente = area.pending()
+    assert (pendiente["lotes"], pendiente["archivos"], pendiente["cajas"]) == (2, 2, 5)
+
+    ventana = area.seal()
+    assert area.windows() == [ventana]
+    assert area.batches(ventana) == sorted([primero, segundo])
+    assert area.read_batch(ventana, segundo).fps_archivos() == [2]
+
+    # Lo que llega después del seal abre otra ventana
+    area.stage(hacer_lote({3: "W1"}))
+    assert area.seal() != ventana
+    assert len(area.windows()) == 2
+
+
+def test_claim_es_exclusivo_y_release_devuelve_la_ventana(tmp_path, hacer_lote):
+    area = LoadStagingArea(str(tmp_path))
+    otro_proceso = LoadStagingArea(str(tmp_path))
+    area.stage(hacer_lote({1: "W1"}))
+    ventana = area.seal()
+
+    tomada = area.claim(ventana)
+    assert tomada is not None and os.path.isdir(tomada)
+    assert otro_proceso.claim(ventana) is None
+    assert area.windows() == []
+    assert area.pending()["lotes"] == 1
+
+    area.release(tomada)
+    assert area.windows() == [ventana]
+
+
+def test_recover_devuelve_ventanas_de_procesos_muertos(tmp_path, hacer_lote):
+    area = LoadStagingArea(str(tmp_path))
+    area.stage(hacer_lote({1: "W1"}))
+    ventana = area.seal()
+    os.rename(ventana, os.path.join(str(tmp_path), "cargando", f"{os.path.basename(ventana)}.999999999"))
+
+    assert area.recover() == 1
+    assert area.windows() == [ventana]
+
+
+class _ClienteFalso:
+    def __init__(self, falla: bool = False):
+        self.falla = falla
+        self.cargadas = []
+
+    def load_window(self, ventana, archivos, cajas):
+        self.cargadas.append((ventana, len(archivos)))
+        return None if self.falla else set()
+
+
+def test_flush_carga_cada_ventana_una_vez(tmp_path, hacer_lote):
+    cliente = _ClienteFalso()
+    servicio = ConsolidatedLoadService(None, LoadStagingArea(str(tmp_path)), cliente)
+    servicio.area.stage(hacer_lote({1: "W1"}))
+    servicio.area.seal()
+    servicio.area.stage(hacer_lote({2: "W2"}))
+
+    assert servicio.flush()
+    assert [lotes for _, lotes in cliente.cargadas] == [1, 1]
+    assert servicio.area.windows() == [] and servicio.area.pending()["lotes"] == 0
+
+
+def test_flush_fallido_deja_la_ventana_para_reintentarla(tmp_path, hacer_lote):
+    servicio = ConsolidatedLoadService(None, LoadStagingArea(str(tmp_path)), _ClienteFalso(falla=True))
+    servicio.area.stage(hacer_lote({1: "W1"}))
+
+    assert not servicio.flush()
+    assert len(servicio.area.windows()) == 1
+    assert servicio.ventanas_fallidas == 1
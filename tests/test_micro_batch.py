@@ -0,0 +1,71 @@
+import os
+
+from src.config.settings import settings
+from src.excel_bigquery.core.services.micro_batch_service import MicroBatchUploader
+
+
+class _UploadFalso:
+    def __init__(self, falla: bool = False):
+        self.falla = falla
+        self.cargados = []
+
+    def upload_batch(self, batch, check_duplicates=True, include_cajas=True):
+        if self.falla:
+            return False
+        self.cargados.append(batch.fps_archivos())
+        return True
+
+
+def _uploader(upload_service, spool):
+    return MicroBatchUploader(upload_service, max_seconds=3600, spool_path=str(spool))
+
+
+def test_stop_guarda_el_lote_sin_cargar_con_nombre_final(tmp_path, hacer_lote):
+    spool = tmp_path / "spool"
+    uploader = _uploader(_UploadFalso(falla=True), spool)
+    uploader.add_batch(hacer_lote({1: "W1", 2: "W2"}))
+    uploader.stop()
+
+    guardados = os.listdir(spool)
+    assert len(guardados) == 1
+    assert not guardados[0].startswith(".") and not guardados[0].endswith(".tomado")
+
+
+def test_el_spool_recuperado_se_borra_recien_al_cargar(tmp_path, hacer_lote):
+    spool = tmp_path / "spool"
+    anterior = _uploader(_UploadFalso(falla=True), spool)
+    anterior.add_batch(hacer_lote({1: "W1"}))
+    anterior.stop()
+
+    upload = _UploadFalso(falla=True)
+    uploader = _uploader(upload, spool)
+    uploader._recuperar_spool()
+    assert uploader.pending()["archivos"] == 1
+    assert not uploader.flush()
+    # Falló la carga: el lote sigue en disco, tomado por este proceso
+    assert [nombre.endswith(".tomado") for nombre in os.listdir(spool)] == [True]
+
+    upload.falla = False
+    uploader._proximo_intento = 0.0
+    assert uploader.flush()
+    assert upload.cargados == [[1]]
+    assert os.listdir(spool) == []
+
+
+def test_reclama_spool_tomado_vencido_y_borra_escrituras_a_medias(tmp_path, hacer_lote, monkeypatch):
+    spool = tmp_path / "spool"
+    hacer_lote({1: "W1"}).write_parquet(str(spool / "123_abcd.999999999.tomado"))
+    hacer_lote({2: "W1"}).write_parquet(str(spool / ".456_ef01.tmp"))
+    hacer_lote({3: "W1"}).write_parquet(str(spool / "789_2345.999999998.tomado"))
+    viejo = 1_000_000_000
+    os.utime(spool / "123_abcd.999999999.tomado", (viejo, viejo))
+    os.utime(spool / ".456_ef01.tmp", (viejo, viejo))
+    monkeypatch.setattr(settings, "batch_spool_stale_seconds", 3600)
+
+    uploader = _uploader(_UploadFalso(), spool)
+    uploader._recuperar_spool()
+
+    # El vencido vuelve a tomarse; el reciente sigue siendo del otro proceso
+    assert uploader.pending()["archivos"] == 1
+    assert uploader.flush()
+    assert sorted(os.listdir(spool)) == ["789_2345.999999998.tomado"]
@@ -0,0 +1,80 @@
+import pytest
+from google.api_core import exceptions
+
+from src.excel_bigquery.core.domain.models.archivo_model import ArchivoModel
+from src.excel_bigquery.core.domain.models.caja_model import CajaModel
+from src.excel_bigquery.core.services.rollup_service import WeeklyRollup
+from src.infrastructure.bigquery import rollup_bigquery_client
+from src.infrastructure.bigquery.cost_log import QueryCostExceeded, cost_log
+from src.infrastructure.bigquery.rollup_bigquery_client import RollupBigQueryClient
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    # Sin bigquery.Client: las consultas se reemplazan en cada test
+    cliente = RollupBigQueryClient.__new__(RollupBigQueryClient)
+    cliente.client = None
+    cliente.dataset_id = "DS"
+    cliente.table_id = "T3_RESUMEN_SEMANAL"
+    cliente.totales_table_id = "T3_TOTALES_ARCHIVO"
+    cliente.archivos_table_id = "T1_ARCHIVOS"
+    monkeypatch.setattr(cliente, "create_table_if_not_exists", lambda: None)
+    monkeypatch.setattr(rollup_bigquery_client.time, "sleep", lambda segundos: None)
+    return cliente
+
+
+def _consultas(monkeypatch, error=None):
+    consultas = []
+
+    def _run_query(client, query, job_config=None, etiqueta="consulta"):
+        consultas.append(query)
+        if error is not None:
+            raise error
+    monkeypatch.setattr(cost_log, "run_query", _run_query)
+    return consultas
+
+
+def test_file_totals_por_archivo_y_hacienda():
+    archivos = [ArchivoModel(id_archivo=f"A{n}", archivo=f"libro_{n}.xlsx", warehouse="W1", puerto="PTO",
+                             buque="BUQUE", annio=2024, semana=10 + n, spec=1, tipo="T") for n in (1, 2)]
+    cajas = [CajaModel(id_caja=f"C{archivo.id_archivo}_{hacienda}", id_archivo=archivo.id_archivo,
+                       nombre_caja="caja", codigo_container="CONT1", codigo_hacienda=5,
+                       codigo_trazabilidad="1024A", nombre_hacienda=hacienda, temperatura=13.0,
+                       dedos_totales=100, peso_bruto_kg=20.0, peso_total_kg=18.5, cantidad_observaciones=0,
+                       dedos_afectados_totales=0, peso_promedio=500.0, week_code=10, year_code=2024,
+                       spec=1, uw=1, ow=0)
+             for archivo in archivos for hacienda in ("HDA1", "HDA2")]
+    rollup = WeeklyRollup.from_models(archivos, cajas)
+
+    filas = rollup.file_totals([archivos[0].fp_archivo])
+    assert sorted((f["fp_archivo"], f["semana"], f["nombre_hacienda"], f["total_cajas"]) for f in filas) == [
+        (archivos[0].fp_archivo, 11, "HDA1", 1), (archivos[0].fp_archivo, 11, "HDA2", 1)
+    ]
+    assert len(rollup.file_totals()) == 4
+
+
+def test_rebuild_weeks_lee_los_totales_por_archivo_no_las_cajas(cliente, monkeypatch):
+    consultas = _consultas(monkeypatch)
+
+    assert cliente.rebuild_weeks([("W1", 2024, 10), ("W1", 2024, 10)])
+    assert len(consultas) == 1
+    assert "T3_TOTALES_ARCHIVO" in consultas[0]
+    assert "T2_CAJAS" not in consultas[0] and "T1_ARCHIVOS" not in consultas[0]
+
+
+@pytest.mark.parametrize("error", [
+    QueryCostExceeded("merge T3_RESUMEN_SEMANAL procesaría 10 GB"),
+    exceptions.BadRequest("Query exceeded limit for bytes billed: 1000000 (bytesBilledLimitExceeded)"),
+])
+def test_rebuild_weeks_no_reintenta_si_supera_el_limite_de_bytes(cliente, monkeypatch, error):
+    consultas = _consultas(monkeypatch, error)
+
+    assert not cliente.rebuild_weeks([("W1", 2024, 10)])
+    assert len(consultas) == 1
+
+
+def test_rebuild_weeks_reintenta_conflictos(cliente, monkeypatch):
+    consultas = _consultas(monkeypatch, exceptions.BadRequest("Could not serialize access to table"))
+
+    assert not cliente.rebuild_weeks([("W1", 2024, 10)], intentos=3)
+    assert len(consultas) == 3
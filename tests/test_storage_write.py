@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+
+from src.infrastructure.bigquery.bigquery_client import BigQueryClient
+from src.infrastructure.bigquery.storage_write import (
+    STREAM_COMMITTED, CommitUncertain, FakeStorageWriteTransport, StorageWriteWriter
+)
+
+SCHEMA = [bigquery.SchemaField("nombre", "STRING"), bigquery.SchemaField("cajas", "INTEGER")]
+DF = pd.DataFrame({"nombre": ["a.xlsx", "b.xlsx", None], "cajas": [3, 4, 5]})
+
+
+def _escribir(transport, **kwargs):
+    writer = StorageWriteWriter(transport, max_rows=100, **kwargs)
+    return writer, writer.write_dataframe("P", "DS", "T1", SCHEMA, DF)
+
+
+def test_stream_pending_confirma_las_filas_al_final():
+    transport = FakeStorageWriteTransport()
+    _, filas = _escribir(transport)
+
+    assert filas == 3
+    assert transport.rows("P", "DS", "T1") == [
+        {"nombre": "a.xlsx", "cajas": 3}, {"nombre": "b.xlsx", "cajas": 4}, {"nombre": None, "cajas": 5}
+    ]
+
+
+def test_fallo_en_append_no_deja_filas_y_permite_load_job():
+    transport = FakeStorageWriteTransport(fallar_en_append=1)
+    writer = StorageWriteWriter(transport, max_rows=100)
+    with pytest.raises(ConnectionError) as error:
+        writer.write_dataframe("P", "DS", "T1", SCHEMA, DF)
+
+    assert transport.rows("P", "DS", "T1") == []
+    assert writer.fallback_safe(error.value)
+
+
+def test_fallo_en_append_de_stream_committed_no_permite_load_job():
+    transport = FakeStorageWriteTransport(fallar_en_append=1)
+    writer = StorageWriteWriter(transport, max_rows=100, stream_type=STREAM_COMMITTED)
+    with pytest.raises(ConnectionError) as error:
+        writer.write_dataframe("P", "DS", "T1", SCHEMA, DF)
+
+    assert not writer.fallback_safe(error.value)
+
+
+def test_commit_fallido_antes_de_aplicarse_permite_load_job():
+    transport = FakeStorageWriteTransport(fallar_en_commit="antes")
+    writer = StorageWriteWriter(transport, max_rows=100)
+    with pytest.raises(ConnectionError) as error:
+        writer.write_dataframe("P", "DS", "T1", SCHEMA, DF)
+
+    assert transport.rows("P", "DS", "T1") == []
+    assert writer.fallback_safe(error.value)
+
+
+def test_commit_aplicado_con_respuesta_perdida_cuenta_como_exito():
+    transport = FakeStorageWriteTransport(fallar_en_commit="despues")
+    _, filas = _escribir(transport)
+
+    assert filas == 3
+    assert len(transport.rows("P", "DS", "T1")) == 3
+
+
+def test_commit_sin_estado_conocido_no_permite_load_job(monkeypatch):
+    transport = FakeStorageWriteTransport(fallar_en_commit="despues")
+    writer = StorageWriteWriter(transport, max_rows=100)
+
+    def _sin_respuesta(stream_name):
+        raise ConnectionError("GetWriteStream sin respuesta")
+    monkeypatch.setattr(transport, "committed", _sin_respuesta)
+
+    with pytest.raises(CommitUncertain) as error:
+        writer.write_dataframe("P", "DS", "T1", SCHEMA, DF)
+    assert not writer.fallback_safe(error.value)
+
+
+@pytest.mark.parametrize("fallar_en_commit, load_jobs, filas", [
+    ("antes", 1, 0),
+    ("despues", 0, 3),
+])
+def test_upload_dataframe_no_duplica_filas_tras_un_commit_fallido(monkeypatch, fallar_en_commit, load_jobs, filas):
+    transport = FakeStorageWriteTransport(fallar_en_commit=fallar_en_commit)
+    cliente = BigQueryClient.__new__(BigQueryClient)
+    cliente.dataset_id = "DS"
+    cliente.table_id = "T1"
+    cliente.storage_writer = StorageWriteWriter(transport, max_rows=100)
+    cliente._schema = SCHEMA
+
+    jobs = []
+    monkeypatch.setattr(cliente, "_start_upload_dataframe", lambda df: jobs.append(df))
+    monkeypatch.setattr("src.infrastructure.bigquery.bigquery_client.cost_log.wait", lambda job, etiqueta: None)
+    monkeypatch.setattr("src.infrastructure.bigquery.bigquery_client.settings.project_id", "P")
+
+    assert cliente._upload_dataframe(DF)
+    assert len(jobs) == load_jobs
+    assert len(transport.rows("P", "DS", "T1")) == filas